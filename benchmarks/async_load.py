@@ -0,0 +1,89 @@
+# benchmarks/async_load.py
+"""Prueba de carga: latencia p50/p99 de los modos síncrono (pool de hilos) y asíncrono (DB_ASYNC)
+
+Cada modo corre en un proceso propio porque el modo se elige al importar la aplicación.
+
+Uso:
+    python -m benchmarks.async_load --requests 5000 --concurrency 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+from benchmarks.common import message_payload, percentile, use_temp_database
+
+
+async def run_load(total: int, concurrency: int, read_ratio: float) -> dict:
+    import httpx
+    from src.main import app
+
+    session_id = f"load-{uuid.uuid4().hex}"
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    reads_every = int(1 / read_ratio) if read_ratio else 0
+
+    async def one(client, index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            if reads_every and index % reads_every == 0:
+                response = await client.get(f"/api/messages/{session_id}", params={"limit": 50})
+                ok = response.status_code == 200
+            else:
+                response = await client.post("/api/messages", json=message_payload(f"{session_id}-{index}", session_id, index))
+                ok = response.status_code == 201
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client: # ASGITransport no ejecuta el lifespan
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": "async" if os.environ.get("DB_ASYNC") == "true" else "sync",
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--read-ratio", type=float, default=0.2, help="Fracción de peticiones GET")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        use_temp_database()
+        print(json.dumps(asyncio.run(run_load(args.requests, args.concurrency, args.read_ratio))))
+        return
+
+    results = []
+    for mode in ("false", "true"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_load", "--worker",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+             "--read-ratio", str(args.read_ratio)],
+            env={**os.environ, "DB_ASYNC": mode},
+            check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
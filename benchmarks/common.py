@@ -0,0 +1,42 @@
+# benchmarks/common.py
+"""Utilidades compartidas por los benchmarks (base temporal, cargas de prueba y percentiles)"""
+import os
+import tempfile
+
+
+def use_temp_database(name: str = "bench.db") -> str:
+    """Apunta DATABASE_URL a un archivo temporal. Debe llamarse antes de importar src"""
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+
+def message_payload(message_id: str, session_id: str, index: int = 0) -> dict:
+    """Mensaje válido para POST /api/messages"""
+    return {
+        "message_id": message_id,
+        "session_id": session_id,
+        "content": f"Hola, este es el mensaje número {index} de la sesión",
+        "timestamp": f"2023-06-15T14:{(index // 60) % 60:02d}:{index % 60:02d}Z",
+        "sender": "user" if index % 2 else "system"
+    }
+
+
+def percentile(values: list, pct: float) -> float:
+    """Percentil por rango más cercano (pct entre 0 y 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """Throughput y percentiles de una corrida (latencias en segundos)"""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+    }
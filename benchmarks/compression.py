@@ -0,0 +1,99 @@
+# benchmarks/compression.py
+"""Compresión de messages.content: bytes ahorrados contra CPU en escritura y lectura
+
+Guarda la misma carga (mensajes de chat con una fracción de textos largos pegados) en bases temporales sin
+compresión, con zlib y con zlib + diccionario entrenado, y reporta el tamaño de la tabla messages, el costo
+por mensaje del INSERT y de leer todos los contenidos, y el de codificar/decodificar solo los contenidos largos.
+
+Uso:
+    python -m benchmarks.compression --messages 20000 --pasted 0.2
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--pasted", type=float, default=0.2, help="Fracción de mensajes largos pegados")
+    args = parser.parse_args()
+
+    from sqlalchemy import insert, select, text
+
+    from benchmarks.datasets import message_contents, pasted_contents
+    from src.database.compression import codec_of, content_text, train_dictionary
+    from src.database.database import build_engine
+    from src.database.models import MessageModel
+    from src.database.schema import ensure_schema
+
+    contents = message_contents(args.messages)
+    positions = random.Random(7).sample(range(args.messages), int(args.messages * args.pasted))
+    for position, content in zip(positions, pasted_contents(len(positions))):
+        contents[position] = content
+    start = datetime(2023, 6, 15, 14, 30)
+    rows = [
+        {"message_id": f"msg-{i}", "session_id": f"session-{i % 200}", "content": content, "timestamp": start + timedelta(seconds=i), "sender": "user"}
+        for i, content in enumerate(contents)
+    ]
+    zdict = train_dictionary(pasted_contents(500, seed=11) + message_contents(2000, seed=11)) # Muestra distinta de la carga medida
+    long_contents = [content for content in contents if len(content.encode("utf-8")) >= 1024]
+
+    configurations = [
+        ("sin_compresion", 0, None),
+        ("zlib", 1024, None),
+        ("zlib_diccionario", 1024, zdict),
+        ("zlib_diccionario_256", 256, zdict),
+    ]
+    results = []
+    for name, min_bytes, dictionary in configurations:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "compression.db")
+        engine = build_engine(f"sqlite:///{path}")
+        content_codec = codec_of(engine.dialect) # Cada base temporal tiene su propio codec
+        content_codec.min_bytes = min_bytes
+        content_codec.dictionaries = {1: dictionary} if dictionary else {}
+        content_codec.current = 1 if dictionary else 0
+        ensure_schema(engine)
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            for index in range(0, len(rows), 1000):
+                conn.execute(insert(MessageModel), rows[index:index + 1000])
+        insert_seconds = time.perf_counter() - started
+
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+            table_bytes = conn.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name = 'messages'")).scalar()
+            started = time.perf_counter()
+            [content_text(value) for value in conn.execute(select(MessageModel.content)).scalars()]
+            read_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        encoded = [content_codec.encode(content) for content in long_contents]
+        encode_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for value in encoded:
+            content_codec.decode(value)
+        decode_seconds = time.perf_counter() - started
+        engine.dispose()
+
+        results.append({
+            "configuration": name,
+            "messages": len(rows),
+            "long_messages": len(long_contents),
+            "messages_table_bytes": table_bytes,
+            "database_file_bytes": os.path.getsize(path),
+            "insert_us_per_message": round(insert_seconds / len(rows) * 1e6, 2),
+            "read_all_us_per_message": round(read_seconds / len(rows) * 1e6, 2),
+            "encode_us_per_long_message": round(encode_seconds / len(long_contents) * 1e6, 2),
+            "decode_us_per_long_message": round(decode_seconds / len(long_contents) * 1e6, 2),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
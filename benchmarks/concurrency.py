@@ -0,0 +1,74 @@
+# benchmarks/concurrency.py
+"""Throughput de POST /api/messages según el número de hilos del pool de Starlette
+
+Uso:
+    python -m benchmarks.concurrency --threads 1 2 4 8 16 32 --requests 2000 --concurrency 64
+    python -m benchmarks.concurrency --write-behind   # mismos POST con group commit (WRITE_BEHIND_ENABLED)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from benchmarks.common import message_payload, percentile, use_temp_database
+
+
+async def run_level(app, threads: int, total: int, concurrency: int) -> dict:
+    import httpx
+    from anyio import to_thread
+
+    to_thread.current_default_thread_limiter().total_tokens = threads # Mismo ajuste que hace la app con THREADPOOL_SIZE
+    session_id = f"bench-{uuid.uuid4().hex}"
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(client, index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/messages", json=message_payload(f"{session_id}-{index}", session_id, index))
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "threads": threads,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--write-behind", action="store_true", help="Activa la cola de escritura con group commit")
+    args = parser.parse_args()
+
+    use_temp_database()
+    if args.write_behind:
+        os.environ["WRITE_BEHIND_ENABLED"] = "true"
+    from src.main import app
+
+    async def run_levels():
+        async with app.router.lifespan_context(app): # ASGITransport no ejecuta el lifespan (esquema y cola de escritura)
+            return [await run_level(app, t, args.requests, args.concurrency) for t in args.threads]
+
+    print(json.dumps(asyncio.run(run_levels()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
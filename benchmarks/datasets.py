@@ -0,0 +1,68 @@
+# benchmarks/datasets.py
+"""Generadores de datos realistas para los benchmarks"""
+import random
+from datetime import datetime, timedelta, timezone
+
+PHRASES = [
+    "Hola, ¿cómo puedo ayudarte hoy?",
+    "Necesito ayuda con mi tarjeta, no me deja hacer pagos",
+    "Claro, ¿me confirmas el número de tu celular?",
+    "Mi correo es cliente{n}@example.com y mi número es +57 300 555 {n:04d}",
+    "Puedes revisar la guía en https://ayuda.example.com/pagos/{n}",
+    "Gracias, ya funciona",
+    "Hello, I can't log into my account",
+    "Transferí 50.000 pesos y no llegaron, esto es una mierda",
+    "Te comparto el comprobante de la operación número {n}",
+]
+
+
+def message_contents(count: int, seed: int = 7) -> list:
+    """Contenidos de chat variados (español/inglés, enlaces, datos personales, mensajes largos)"""
+    rng = random.Random(seed)
+    contents = []
+    for n in range(count):
+        content = rng.choice(PHRASES).format(n=n)
+        if rng.random() < 0.05: # Algunos mensajes largos (texto pegado)
+            content = " ".join([content] * rng.randint(10, 60))
+        contents.append(content)
+    return contents
+
+
+def pasted_contents(count: int, seed: int = 7, min_bytes: int = 1024, max_bytes: int = 8192) -> list:
+    """Textos largos pegados (historiales, comprobantes): frases distintas con números, correos y enlaces variables"""
+    rng = random.Random(seed)
+    contents = []
+    for _ in range(count):
+        parts, size, target = [], 0, rng.randint(min_bytes, max_bytes)
+        while size < target:
+            parts.append(rng.choice(PHRASES).format(n=rng.randint(0, 999_999)))
+            size += len(parts[-1].encode("utf-8")) + 1
+        contents.append(" ".join(parts))
+    return contents
+
+
+SESSION_SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000) # Tamaños de sesión cubiertos por la suite
+
+
+def session_messages(session_id: str, count: int, seed: int = 7, start: datetime = datetime(2023, 6, 15, 14, 30, tzinfo=timezone.utc)):
+    """Genera (sin cargarlos en memoria) los mensajes de una sesión de chat: turnos alternados,
+    respuestas del sistema más largas y pausas variables entre mensajes"""
+    rng = random.Random(f"{seed}-{session_id}")
+    timestamp = start
+    sender = "user"
+    for n in range(count):
+        content = rng.choice(PHRASES).format(n=n)
+        if sender == "system" and rng.random() < 0.3: # Respuestas del sistema con varias frases
+            content = " ".join([content] + [rng.choice(PHRASES).format(n=n) for _ in range(rng.randint(1, 4))])
+        elif rng.random() < 0.02: # Texto pegado por el usuario
+            content = " ".join([content] * rng.randint(10, 60))
+        yield {
+            "message_id": f"{session_id}-{n:07d}",
+            "session_id": session_id,
+            "content": content,
+            "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+            "sender": sender
+        }
+        timestamp += timedelta(seconds=rng.choice((1, 2, 5, 15, 40, 120)))
+        if rng.random() < 0.8: # A veces el mismo remitente envía varios mensajes seguidos
+            sender = "system" if sender == "user" else "user"
@@ -0,0 +1,53 @@
+# benchmarks/pipeline.py
+"""Costo del pipeline de procesamiento para lotes de 1, 100 y 10.000 mensajes
+
+Compara procesar el lote completo (una pasada por etapa) contra llamar al pipeline mensaje por mensaje,
+y reporta los tiempos por etapa.
+
+Uso:
+    python -m benchmarks.pipeline --sizes 1 100 10000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.datasets import message_contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    from src.services.processing_pipeline import build_pipeline
+
+    results = []
+    for size in args.sizes:
+        contents = message_contents(size)
+
+        per_message = build_pipeline()
+        started = time.perf_counter()
+        for content in contents:
+            per_message.run([content])
+        loop_seconds = time.perf_counter() - started
+
+        batched = build_pipeline()
+        batched.run(contents) # Calentamiento: mide el costo de cada etapa (decide si usa el pool de procesos)
+        started = time.perf_counter()
+        batched.run(contents)
+        batch_seconds = time.perf_counter() - started
+
+        results.append({
+            "messages": size,
+            "per_message_us": round(loop_seconds / size * 1e6, 2),
+            "batched_us": round(batch_seconds / size * 1e6, 2),
+            "stages": batched.timings()
+        })
+        per_message.shutdown()
+        batched.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/serialization.py
+"""Costo de serialización por mensaje de las respuestas (1 y 1.000 mensajes)
+
+Compara el camino anterior (dict -> jsonable_encoder -> JSONResponse) con el actual
+(response_model serializado por pydantic-core -> ORJSONResponse / JSONResponse).
+
+Uso:
+    python -m benchmarks.serialization --repeat 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+
+def build_payloads(count: int) -> tuple:
+    messages = [
+        {
+            "message_id": f"msg-{i}",
+            "session_id": "session-bench",
+            "content": f"Hola, este es el mensaje número {i} de la sesión",
+            "timestamp": datetime(2023, 6, 15, 14, 30, i % 60, tzinfo=timezone.utc),
+            "sender": "user" if i % 2 else "system",
+            "message_metadata": {"word_count": 9, "character_count": 48, "processed_at": "2023-06-15T14:30:01Z"}
+        }
+        for i in range(count)
+    ]
+    page = {
+        "status": "success",
+        "data": {
+            "session_id": "session-bench",
+            "messages": messages,
+            "pagination": {"limit": count, "offset": 0, "has_more": False, "next_cursor": None}
+        }
+    }
+    single = {"status": "success", "data": messages[0]}
+    return single, page
+
+
+def measure(fn, repeat: int) -> float:
+    fn() # Calentamiento
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from src.api.responses import DefaultJSONResponse
+    from src.domain.schemas import MessageEnvelope, MessagePageEnvelope
+
+    results = []
+    for count in (1, 1000):
+        single, page = build_payloads(count)
+        payload, model = (single, MessageEnvelope) if count == 1 else (page, MessagePageEnvelope)
+        adapter = TypeAdapter(model)
+
+        paths = {
+            "before_jsonable_encoder": lambda: JSONResponse(jsonable_encoder(payload)).body,
+            "after_response_model_json": lambda: JSONResponse(adapter.dump_python(adapter.validate_python(payload), mode="json")).body,
+            "after_response_model_default": lambda: DefaultJSONResponse(adapter.dump_python(adapter.validate_python(payload), mode="json")).body
+        }
+        for name, fn in paths.items():
+            seconds = measure(fn, max(1, args.repeat // (10 if count > 1 else 1)))
+            results.append({
+                "messages": count,
+                "path": name,
+                "response_class": DefaultJSONResponse.__name__ if name.endswith("default") else "JSONResponse",
+                "us_per_message": round(seconds / count * 1e6, 2)
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
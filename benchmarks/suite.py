@@ -0,0 +1,254 @@
+# benchmarks/suite.py
+"""Suite reproducible de benchmarks de escritura y lectura con salida JSON y comparación contra una línea base
+
+Escenarios (en proceso contra src.main:app y una base SQLite temporal):
+- single_post: POST /api/messages, un mensaje por petición
+- batch_post: POST /api/messages/batch
+- read_depth: GET /api/messages/{session_id} al inicio, a la mitad y al final de sesiones de --sizes mensajes
+- mixed: lecturas y escrituras concurrentes sobre la misma sesión
+
+Uso:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --sizes 10 1000 100000 1000000 --output bench.json
+    python -m benchmarks.suite --output baseline.json                            # línea base propia (depende de la máquina: no se versiona)
+    python -m benchmarks.suite --baseline baseline.json --tolerance 0.25        # sale con código 1 si hay regresiones
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+
+from benchmarks.common import summarize, use_temp_database
+from benchmarks.datasets import SESSION_SIZES, session_messages
+
+SCENARIOS = ("single_post", "batch_post", "read_depth", "mixed")
+
+
+async def run_requests(client, request, total: int, concurrency: int) -> dict:
+    """Ejecuta total peticiones con a lo sumo concurrency en vuelo; request(client, i) retorna True si la respuesta es correcta"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await request(client, index)
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def seed_session(session_id: str, count: int) -> None:
+    """Carga una sesión generada por el mismo camino que POST /api/messages/batch (validación, pipeline e INSERT multi-fila)"""
+    from src.core.config import settings
+    from src.database.database import get_sessionmaker
+    from src.repositories.message_repository import MessageRepository
+    from src.services.message_service import MessageService
+
+    messages = session_messages(session_id, count)
+    db = get_sessionmaker()()
+    try:
+        service = MessageService(MessageRepository(db))
+        while chunk := list(islice(messages, settings.batch_max_items)):
+            service.process_batch(chunk)
+    finally:
+        db.close()
+
+
+def cursor_at(session_id: str, position: int):
+    """Cursor de paginación que apunta a la fila position de la sesión (None para la primera página)"""
+    if position == 0:
+        return None
+    from sqlalchemy import text
+    from src.database.database import get_engine
+    from src.services.message_service import encode_cursor
+
+    with get_engine().connect() as connection:
+        timestamp, message_id = connection.execute(text(
+            "SELECT timestamp, message_id FROM messages WHERE session_id = :session_id "
+            "ORDER BY timestamp, message_id LIMIT 1 OFFSET :offset"
+        ), {"session_id": session_id, "offset": position - 1}).one()
+    return encode_cursor(datetime.fromisoformat(str(timestamp)), message_id)
+
+
+async def single_post(client, args) -> list:
+    session_id = f"bench-{uuid.uuid4().hex}"
+    messages = list(session_messages(session_id, args.requests))
+
+    async def request(client, index):
+        return (await client.post("/api/messages", json=messages[index])).status_code == 201
+
+    stats = await run_requests(client, request, args.requests, args.concurrency)
+    return [{"scenario": "single_post", "params": {"concurrency": args.concurrency}, **stats}]
+
+
+async def batch_post(client, args) -> list:
+    results = []
+    for batch_size in args.batch_sizes:
+        session_id = f"bench-{uuid.uuid4().hex}"
+        batches = max(1, args.requests // batch_size)
+        messages = list(session_messages(session_id, batches * batch_size))
+
+        async def request(client, index):
+            response = await client.post("/api/messages/batch", json={"messages": messages[index * batch_size:(index + 1) * batch_size]})
+            return response.status_code == 200 and response.json()["data"]["created"] == batch_size
+
+        stats = await run_requests(client, request, batches, args.concurrency)
+        stats["messages_per_s"] = round(stats["throughput_rps"] * batch_size, 1)
+        results.append({"scenario": "batch_post", "params": {"batch_size": batch_size, "concurrency": args.concurrency}, **stats})
+    return results
+
+
+async def read_depth(client, args, sessions: dict) -> list:
+    results = []
+    for size, session_id in sessions.items():
+        for depth in ("start", "middle", "end"):
+            position = {"start": 0, "middle": max(0, (size - args.page_size) // 2), "end": max(0, size - args.page_size)}[depth]
+            params = {"limit": args.page_size}
+            cursor = cursor_at(session_id, position)
+            if cursor:
+                params["cursor"] = cursor
+
+            async def request(client, index):
+                response = await client.get(f"/api/messages/{session_id}", params=params)
+                return response.status_code == 200
+
+            stats = await run_requests(client, request, args.reads, args.concurrency)
+            results.append({"scenario": "read_depth", "params": {"session_size": size, "depth": depth, "limit": args.page_size}, **stats})
+    return results
+
+
+async def mixed(client, args) -> list:
+    session_id = f"bench-{uuid.uuid4().hex}"
+    seed_session(session_id, 1000)
+    new_messages = list(session_messages(f"{session_id}-new", args.requests))
+    write_every = int(1 / (1 - args.read_ratio)) if args.read_ratio < 1 else 0 # Una escritura cada N peticiones (0 = solo lecturas)
+
+    async def request(client, index):
+        if write_every and index % write_every == 0:
+            message = dict(new_messages[index], session_id=session_id)
+            return (await client.post("/api/messages", json=message)).status_code == 201
+        return (await client.get(f"/api/messages/{session_id}", params={"limit": args.page_size})).status_code == 200
+
+    stats = await run_requests(client, request, args.requests, args.concurrency)
+    return [{"scenario": "mixed", "params": {"read_ratio": args.read_ratio, "concurrency": args.concurrency}, **stats}]
+
+
+async def run_suite(args) -> list:
+    from src.main import app
+
+    async with app.router.lifespan_context(app): # ASGITransport no ejecuta el lifespan (esquema y pool de hilos)
+        return await run_scenarios(app, args)
+
+
+async def run_scenarios(app, args) -> list:
+    import httpx
+
+    sessions = {}
+    if "read_depth" in args.scenarios:
+        for size in args.sizes:
+            sessions[size] = f"seed-{size}"
+            seed_session(sessions[size], size)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in args.scenarios:
+            if scenario == "read_depth":
+                results += await read_depth(client, args, sessions)
+            else:
+                results += await globals()[scenario](client, args)
+    return results
+
+
+def result_key(result: dict) -> tuple:
+    return result["scenario"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Regresiones frente a la línea base: throughput menor o p99 mayor que la tolerancia relativa"""
+    previous = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        name = " ".join(result_key(result))
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {result['throughput_rps']} rps")
+        if result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']} -> {result['p99_ms']} ms")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errores {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000], help=f"Tamaños de sesión para read_depth (hasta {SESSION_SIZES[-1]:,})")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones de single_post y mixed; mensajes por tamaño en batch_post")
+    parser.add_argument("--reads", type=int, default=500, help="Peticiones por profundidad en read_depth")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--read-ratio", type=float, default=0.8)
+    parser.add_argument("--cache", action="store_true", help="Mantiene el caché de páginas (por defecto se desactiva para medir la base de datos)")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto se imprime)")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Variación relativa permitida frente a la línea base")
+    args = parser.parse_args()
+
+    use_temp_database()
+    os.environ["CACHE_ENABLED"] = "true" if args.cache else "false"
+    report = {
+        "environment": environment(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": asyncio.run(run_suite(args))
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/validation.py
+"""Costo de validación por mensaje (µs): validación por pasos contra la validación consolidada
+
+Por pasos (camino anterior): MessageSchema y luego ValidationService revisando campos sobre message.dict(),
+contenido y timestamp; en lotes, además, json.loads y MessageBatchSchema antes de validar cada elemento.
+Consolidada: una sola validación por mensaje (ValidMessageSchema incluye la regla de contenido); en lotes,
+el cuerpo crudo se valida desde los bytes con un validador compilado una sola vez.
+
+Uso:
+    python -m benchmarks.validation --repeat 200
+"""
+import argparse
+import json
+import time
+import warnings
+
+
+def build_messages(count: int) -> list:
+    return [
+        {
+            "message_id": f"msg-{i}",
+            "session_id": "session-bench",
+            "content": f"Hola, este es el mensaje número {i} de la sesión",
+            "timestamp": f"2023-06-15T14:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "sender": "user" if i % 2 else "system"
+        }
+        for i in range(count)
+    ]
+
+
+def measure(fn, repeat: int) -> float:
+    fn() # Calentamiento
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    from src.domain.schemas import MessageBatchSchema, MessageSchema
+    from src.services.validation_service import ValidationService
+
+    validator = ValidationService()
+    warnings.simplefilter("ignore", DeprecationWarning) # El camino anterior usa message.dict()
+
+    def stepwise(item): # Validación anterior de un elemento: esquema y tres revisiones de ValidationService
+        message = MessageSchema.model_validate(item)
+        validator.validate_message_format(message.dict())
+        validator.validate_content(message.content)
+        validator.validate_timestamp(message.timestamp)
+        return message
+
+    def consolidated(item):
+        message = MessageSchema.model_validate(item)
+        validator.validate_message(message)
+        return message
+
+    results = []
+    single = build_messages(1)[0]
+    for name, fn in (("por_pasos", lambda: stepwise(single)), ("consolidada", lambda: consolidated(single))):
+        results.append({"messages": 1, "path": name, "us_per_message": round(measure(fn, args.repeat * 10) * 1e6, 2)})
+
+    for count in (100, 1000):
+        messages = build_messages(count)
+        body = json.dumps({"messages": messages}).encode("utf-8")
+        paths = {
+            "por_pasos": lambda: [stepwise(item) for item in MessageBatchSchema.model_validate(json.loads(body)).messages],
+            "consolidada_dicts": lambda: validator.validate_batch(messages), # Elementos ya decodificados (ej: src.tools.bulk)
+            "consolidada_cuerpo_crudo": lambda: validator.validate_batch(validator.parse_batch(body)) # POST /api/messages/batch
+        }
+        for name, fn in paths.items():
+            seconds = measure(fn, max(1, args.repeat // (count // 100)))
+            results.append({"messages": count, "path": name, "us_per_message": round(seconds / count * 1e6, 2)})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
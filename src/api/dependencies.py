@@ -0,0 +1,34 @@
+# src/api/dependencies.py
+import inspect # Importa inspect para distinguir métodos síncronos de corutinas
+from fastapi import Depends # Importa Depends para encadenar dependencias
+from starlette.concurrency import run_in_threadpool # Ejecuta código bloqueante fuera del event loop
+
+from src.core.config import settings # Importa la configuración (modo síncrono o asíncrono)
+from src.core.profiling import current_profile, run_profiled, await_profiled # Perfil de la petición actual (si se pidió)
+from src.database.database import get_db, get_async_db # Dependencias que entregan una sesión por petición
+from src.repositories.message_repository import MessageRepository, AsyncMessageRepository
+from src.services.message_service import MessageService, AsyncMessageService
+from src.services import write_behind # Cola de escritura opcional (WRITE_BEHIND_ENABLED)
+from src.services import duplicate_guard # Guard en memoria de message_id repetidos (DUPLICATE_GUARD_ENABLED)
+from src.services import pubsub # Hub de suscriptores SSE/WebSocket por sesión
+from src.repositories import cache # Caché de páginas de sesión compartido por todas las peticiones
+from src.database import partitions # Particiones mensuales archivadas que completan las lecturas por sesión
+
+
+if settings.db_async: # Modo asíncrono: AsyncSession + aiosqlite, no ocupa hilos del pool por petición
+    def get_message_service(db=Depends(get_async_db)) -> MessageService:
+        return AsyncMessageService(AsyncMessageRepository(db, cache.message_cache, partitions.archive_store), write_behind.write_behind_queue, settings.write_behind_ack_timeout_s, duplicate_guard.duplicate_guard, pubsub.session_hub)
+else: # Modo síncrono: Session clásica, el trabajo bloqueante corre en el pool de hilos
+    def get_message_service(db=Depends(get_db)) -> MessageService:
+        return MessageService(MessageRepository(db, cache.message_cache, partitions.archive_store), write_behind.write_behind_queue, settings.write_behind_ack_timeout_s, duplicate_guard.duplicate_guard, pubsub.session_hub)
+
+
+async def call_service(method, *args, **kwargs): # Ejecuta un método del servicio sin bloquear el event loop
+    profile = current_profile.get() # Activo solo si ProfilingMiddleware decidió perfilar esta petición
+    if inspect.iscoroutinefunction(method): # AsyncMessageService: se espera directamente
+        if profile is not None:
+            return await await_profiled(profile, method, *args, **kwargs)
+        return await method(*args, **kwargs)
+    if profile is not None: # El perfil se activa dentro del hilo que ejecuta el servicio y el repositorio
+        return await run_in_threadpool(run_profiled, profile, method, *args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs) # MessageService: se ejecuta en el pool de hilos
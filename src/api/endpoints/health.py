@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from src.database.database import get_db
+from src.repositories import cache
 
 router = APIRouter(tags=["health"])
 
@@ -12,6 +13,13 @@ async def health_check():
     """Endpoint de verificación de salud de la API"""
     return {"status": "healthy", "service": "chat-message-api"}
 
+@router.get("/health/cache")
+async def cache_stats():
+    """Contadores del caché de páginas de sesión (aciertos, fallos, desalojos)"""
+    if cache.message_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.message_cache.stats()}
+
 @router.get("/ready")
 async def readiness_check(db: Session = Depends(get_db)):
     """Endpoint de verificación de preparación (incluye DB)"""
@@ -1,23 +1,49 @@
-from fastapi import APIRouter, HTTPException, status # Importa APIRouter para crear rutas, HTTPException para errores HTTP, status para códigos HTTP
-from src.domain.schemas import MessageSchema # Importa el esquema Pydantic para validación y serialización
-from src.services.message_service import MessageService # Importa el servicio que contiene la lógica de negocio
-from src.repositories.message_repository import MessageRepository # Importa el repositorio para acceso a base de datos
-from src.database.database import SessionLocal # Importa la sesión de base de datos
+import logging # Importa logging para registrar errores no controlados
+from datetime import datetime # Importa datetime para los límites de tiempo de la exportación
+from typing import Literal, Optional # Importa tipos para los parámetros de consulta opcionales
+from fastapi.exceptions import RequestValidationError # Importa RequestValidationError para responder 422 cuando el cuerpo del lote no es válido
+from fastapi.responses import StreamingResponse # Importa StreamingResponse para enviar la exportación por partes
+from pydantic import ValidationError # Importa ValidationError para los errores del cuerpo crudo del lote
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status # Importa APIRouter para crear rutas, Depends para inyectar dependencias, HTTPException para errores HTTP, status para códigos HTTP
+from src.domain.schemas import MessageSchema, MessageBatchSchema, MessageEnvelope, MessagePageEnvelope, BatchEnvelope, SearchEnvelope # Importa los esquemas Pydantic para validación y serialización
+from src.services.message_service import MessageService, page_etag # Importa el servicio que contiene la lógica de negocio y el cálculo de ETag
+from src.api.dependencies import get_message_service, call_service # Importa la inyección del servicio (síncrono o asíncrono según DB_ASYNC)
+from src.repositories.message_repository import MessageRepository # Importa el repositorio síncrono usado por la exportación
+from src.database.database import get_sessionmaker # Importa la fábrica de sesiones: la exportación abre su propia sesión
+from src.database import partitions # Importa las particiones archivadas (la exportación también las recorre)
+from src.core.config import settings # Importa la configuración (límite de tamaño de lote)
+from src.api.idempotency import run_idempotent, fingerprint # Importa el manejo de Idempotency-Key (respuesta guardada y peticiones agrupadas)
+from src.api.responses import DefaultJSONResponse # Importa la clase de respuesta JSON usada para guardar la respuesta idempotente
 
 router = APIRouter() # Crea un router para agrupar endpoints relacionados
-
-db = SessionLocal() # Crear sesión de base de datos
-
-# Inyectar dependencias
-repository = MessageRepository(db) # Repositorio con la sesión global
-service = MessageService(repository) # Servicio con el repositorio global
+logger = logging.getLogger(__name__)
 
 # Define endpoint POST para crear mensajes
 # status_code=201: Código HTTP "Created" para éxito
-@router.post("/api/messages", status_code=status.HTTP_201_CREATED)
-def create_message(message: MessageSchema): # message ya validado por Pydantic
+# response_model: FastAPI serializa con pydantic-core (sin jsonable_encoder) y documenta la respuesta
+# Idempotency-Key: los reintentos con la misma clave (y el mismo cuerpo) reciben la primera respuesta sin volver a escribir
+@router.post("/api/messages", status_code=status.HTTP_201_CREATED, response_model=MessageEnvelope)
+async def create_message(
+    message: MessageSchema, # message ya validado por Pydantic
+    request: Request, # Cuerpo crudo para la huella de Idempotency-Key (FastAPI ya lo leyó y lo guardó)
+    service: MessageService = Depends(get_message_service),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    if idempotency_key is None:
+        return await _create_message(message, service)
+
+    async def respond(): # La respuesta se serializa aquí para guardarla y repetirla byte a byte
+        try:
+            envelope = MessageEnvelope.model_validate(await _create_message(message, service))
+            return DefaultJSONResponse(envelope.model_dump(mode="json", by_alias=True), status_code=status.HTTP_201_CREATED)
+        except HTTPException as e: # Los errores 4xx también se repiten (ej: 409 si el message_id ya existía antes del primer intento)
+            return DefaultJSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+
+    return await run_idempotent(f"POST /api/messages:{idempotency_key}", fingerprint(await request.body()), respond) # Como el lote: la huella es del cuerpo recibido, no del modelo (que ignora campos extra)
+
+async def _create_message(message: MessageSchema, service: MessageService) -> dict: # Procesa y guarda un mensaje, retorna el cuerpo de la respuesta
     try:
-        data = service.process_message(message)   # Procesa el mensaje a través de toda la cadena de servicios
+        data = await call_service(service.process_message, message)   # Procesa el mensaje a través de toda la cadena de servicios
         return {  # Retorna respuesta exitosa con formato consistente
             "status": "success",
             "data": data
@@ -33,7 +59,141 @@ def create_message(message: MessageSchema): # message ya validado por Pydantic
                 }
             }
         )
-    except Exception as e:
-        print("ERROR REAL DEL SERVIDOR", e)
+    except HTTPException: # Errores esperados (400, 409, 503) generados por el servicio
+        raise
+    except Exception:
+        logger.exception("Error no controlado procesando el mensaje") # Registra el traceback completo
         raise
 
+# Define endpoint POST para crear mensajes en lote
+# Todo el lote se valida, procesa y guarda en una sola transacción; el resultado se reporta por mensaje
+# El cuerpo se lee crudo y pydantic-core lo valida directamente desde los bytes: sin json.loads ni dict intermedio por mensaje
+# openapi_extra documenta el cuerpo con MessageBatchSchema, como si se declarara como parámetro
+@router.post(
+    "/api/messages/batch", status_code=status.HTTP_200_OK, response_model=BatchEnvelope,
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": MessageBatchSchema.model_json_schema()}}}}
+)
+async def create_messages_batch(request: Request, service: MessageService = Depends(get_message_service)):
+    try:
+        messages = service.validator.parse_batch(await request.body(), settings.batch_max_items) # Un lote demasiado grande falla sin validar sus elementos
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        if not any(error["type"] == "too_long" and error["loc"] == ("messages",) for error in errors): # Cuerpo que no es un lote: 422 con el mismo formato que la validación de FastAPI
+            raise RequestValidationError([dict(error, loc=("body", *error["loc"])) for error in errors])
+        raise HTTPException(
+            status_code=413, # Payload Too Large
+            detail={
+                "status": "error",
+                "error": {
+                    "code": "BATCH_TOO_LARGE",
+                    "message": f"El lote supera el máximo de {settings.batch_max_items} mensajes"
+                }
+            }
+        )
+
+    results = await call_service(service.process_batch, messages)
+    created = sum(1 for result in results if result["status"] == "created")
+    return {
+        "status": "success",
+        "data": {
+            "total": len(results),
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }
+    }
+
+# Define endpoint GET para buscar texto en los mensajes de todas las sesiones (índice FTS5)
+# Debe declararse antes de /api/messages/{session_id} para que "search" no se interprete como un session_id
+@router.get("/api/messages/search", response_model=SearchEnvelope)
+async def search_messages(
+    q: str = Query(..., min_length=1), # Frase a buscar
+    raw: bool = False, # True: q usa la sintaxis de consultas de FTS5 (AND, OR, NEAR, prefijo*)
+    session_id: Optional[str] = None, # Filtros opcionales
+    sender: Optional[Literal["user", "system"]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None, # Valor next_cursor de la página anterior
+    service: MessageService = Depends(get_message_service)
+):
+    try:
+        data = await call_service(
+            service.search_messages, q, limit, raw=raw, cursor=cursor,
+            session_id=session_id, sender=sender, since=since, until=until
+        )
+        return {
+            "status": "success",
+            "data": data
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e)
+                }
+            }
+        )
+
+# Define endpoint GET para exportar una sesión completa como NDJSON (un mensaje JSON por línea)
+# La respuesta se genera fila a fila desde un cursor de la base de datos, la memoria no depende del tamaño de la sesión
+@router.get("/api/messages/{session_id}/export")
+def export_messages(
+    session_id: str,
+    since: Optional[datetime] = None, # Solo mensajes con timestamp >= since
+    until: Optional[datetime] = None, # Solo mensajes con timestamp < until
+    sender: Optional[Literal["user", "system"]] = None # Filtro opcional por remitente
+):
+    def generate(): # La sesión vive mientras dura el streaming y se cierra al terminar o si el cliente se desconecta
+        db = get_sessionmaker()()
+        try:
+            yield from MessageService(MessageRepository(db, archive=partitions.archive_store)).export_messages(session_id, since=since, until=until, sender=sender)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.ndjson"'}
+    )
+
+# Define endpoint GET para obtener los mensajes de una sesión
+# Usa paginación por cursor (next_cursor) para que cualquier página cueste lo mismo; offset se mantiene por compatibilidad
+# Responde con ETag: si el cliente envía If-None-Match con el mismo valor se responde 304 sin cuerpo
+@router.get("/api/messages/{session_id}", response_model=MessagePageEnvelope)
+async def get_messages(
+    session_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000), # Número máximo de mensajes por página
+    offset: int = Query(0, ge=0), # Desplazamiento (ignorado si se envía cursor)
+    sender: Optional[Literal["user", "system"]] = None, # Filtro opcional por remitente
+    cursor: Optional[str] = None, # Valor next_cursor de la página anterior
+    service: MessageService = Depends(get_message_service)
+):
+    try:
+        data = await call_service(service.get_messages, session_id, limit, offset=offset, sender=sender, cursor=cursor)
+        etag = page_etag(data)
+        if request.headers.get("if-none-match") == etag: # La página no cambió desde la última consulta del cliente
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache" # El cliente debe revalidar en cada consulta
+        return {
+            "status": "success",
+            "data": data
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e)
+                }
+            }
+        )
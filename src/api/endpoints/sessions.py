@@ -0,0 +1,43 @@
+# src/api/endpoints/sessions.py
+from typing import Literal # Importa Literal para el criterio de orden
+
+from fastapi import APIRouter, Depends, HTTPException, Query # Importa APIRouter para crear rutas, Depends para inyectar el servicio
+from src.domain.schemas import SessionStatsEnvelope, SessionListEnvelope # Importa los esquemas de respuesta
+from src.services.message_service import MessageService # Importa el servicio que contiene la lógica de negocio
+from src.api.dependencies import get_message_service, call_service # Importa la inyección del servicio (síncrono o asíncrono según DB_ASYNC)
+
+router = APIRouter()
+
+# Define endpoint GET con las estadísticas de una sesión
+# Se leen de session_stats (una fila por sesión, actualizada con cada INSERT): el costo no depende del tamaño de la sesión
+@router.get("/api/sessions/{session_id}/stats", response_model=SessionStatsEnvelope)
+async def get_session_stats(session_id: str, service: MessageService = Depends(get_message_service)):
+    data = await call_service(service.get_session_stats, session_id)
+    if data is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status": "error",
+                "error": {
+                    "code": "SESSION_NOT_FOUND",
+                    "message": "La sesión no tiene mensajes"
+                }
+            }
+        )
+    return {
+        "status": "success",
+        "data": data
+    }
+
+# Define endpoint GET con las sesiones más activas
+# order=messages: más mensajes primero; order=recent: último mensaje más reciente primero
+@router.get("/api/sessions", response_model=SessionListEnvelope)
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=1000), # Número de sesiones
+    order: Literal["messages", "recent"] = "messages",
+    service: MessageService = Depends(get_message_service)
+):
+    return {
+        "status": "success",
+        "data": await call_service(service.list_sessions, limit, order)
+    }
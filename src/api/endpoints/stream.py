@@ -0,0 +1,122 @@
+# src/api/endpoints/stream.py
+import asyncio # Importa asyncio para detectar la desconexión del WebSocket mientras se esperan mensajes
+from typing import Optional # Importa Optional para el cursor opcional
+
+from fastapi import APIRouter, Header, HTTPException, WebSocket, status # Importa APIRouter para crear rutas y WebSocket para el endpoint bidireccional
+from fastapi.responses import StreamingResponse # Importa StreamingResponse para enviar los eventos SSE a medida que llegan
+from starlette.concurrency import run_in_threadpool # Las páginas para reanudar se leen con el repositorio síncrono
+
+from src.core.config import settings # Importa la configuración (intervalo de keep-alive)
+from src.database.database import get_sessionmaker # Importa la fábrica de sesiones: cada página abre y cierra su propia sesión
+from src.database import partitions # Importa las particiones archivadas (la reanudación también las lee)
+from src.repositories import cache # Importa el caché de páginas de sesión
+from src.repositories.message_repository import MessageRepository # Importa el repositorio síncrono usado para reanudar
+from src.services.message_service import MessageService, decode_cursor # Importa el servicio (páginas por cursor) y la validación del cursor
+from src.services import pubsub # Importa el hub global de suscriptores (create_app puede reemplazarlo)
+from src.services.pubsub import stream_event # Importa el formato de los eventos
+
+router = APIRouter()
+
+RESUME_PAGE_SIZE = 1000 # Mensajes por página al reanudar desde un cursor
+
+
+def _resume_page(session_id: str, cursor: str) -> dict: # Una página posterior al cursor; la sesión de base de datos no se mantiene abierta durante el streaming
+    db = get_sessionmaker()()
+    try:
+        return MessageService(MessageRepository(db, cache.message_cache, partitions.archive_store)).get_messages(session_id, RESUME_PAGE_SIZE, cursor=cursor)
+    finally:
+        db.close()
+
+
+async def session_events(subscription, cursor: Optional[str], timeout: float = None): # Mensajes posteriores al cursor y luego los nuevos; None = sin mensajes durante timeout
+    replayed = set() # message_id enviados al reanudar: un mensaje guardado durante la reanudación llega también por el hub
+    while cursor:
+        page = await run_in_threadpool(_resume_page, subscription.session_id, cursor)
+        for message in page["messages"]:
+            replayed.add(message["message_id"])
+            yield stream_event(message)
+        cursor = page["pagination"]["next_cursor"]
+
+    while True:
+        event = await subscription.next(timeout)
+        if subscription.closed is not None: # Desalojado o desconectado
+            return
+        if event is None or event.message_id not in replayed:
+            yield event
+
+
+def _validate_cursor(cursor: Optional[str]): # Lanza ValueError si el cursor es inválido
+    if cursor:
+        decode_cursor(cursor)
+
+
+# Define endpoint GET de Server-Sent Events con los mensajes nuevos de una sesión
+# Cada evento lleva como id el cursor del mensaje: al reconectar, el navegador lo envía en Last-Event-ID y se reanuda desde ahí
+@router.get("/api/messages/{session_id}/stream")
+async def stream_messages(
+    session_id: str,
+    cursor: Optional[str] = None, # Reanuda después de este cursor (alternativa a Last-Event-ID)
+    last_event_id: Optional[str] = Header(None)
+):
+    cursor = cursor or last_event_id
+    try:
+        _validate_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "error": {
+                    "code": "VALIDATION_ERROR",
+                    "message": str(e)
+                }
+            }
+        )
+
+    async def generate(): # Termina al desalojar al suscriptor o cuando Starlette cancela el generador porque el cliente se desconectó
+        subscription = pubsub.session_hub.subscribe(session_id) # Antes de leer las páginas: no se pierde ningún mensaje entre la reanudación y el hub
+        try:
+            yield b": connected\n\n"
+            async for event in session_events(subscription, cursor, settings.stream_heartbeat_s):
+                if event is None:
+                    yield b": ping\n\n" # Keep-alive para proxies y balanceadores
+                else:
+                    yield f"id: {event.id}\nevent: message\ndata: {event.data}\n\n".encode("utf-8")
+            yield f'event: closed\ndata: {{"reason": "{subscription.closed}"}}\n\n'.encode("utf-8") # El cliente reconecta con Last-Event-ID
+        finally:
+            pubsub.session_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Sin buffering en nginx
+    )
+
+
+# Define endpoint WebSocket equivalente: un frame de texto JSON {"id", "data"} por mensaje
+@router.websocket("/api/messages/{session_id}/ws")
+async def websocket_messages(websocket: WebSocket, session_id: str, cursor: Optional[str] = None):
+    try:
+        _validate_cursor(cursor)
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Cursor de paginación inválido")
+        return
+
+    await websocket.accept()
+    subscription = pubsub.session_hub.subscribe(session_id)
+
+    async def watch_disconnect(): # Sin un hilo por conexión: una tarea espera el cierre del cliente
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscription.close("disconnected")
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async for event in session_events(subscription, cursor):
+            if event is not None:
+                await websocket.send_text(f'{{"id": "{event.id}", "data": {event.data}}}')
+        if subscription.closed != "disconnected":
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=subscription.closed) # Desalojado: el cliente reconecta con el último id
+    finally:
+        watcher.cancel()
+        pubsub.session_hub.unsubscribe(subscription)
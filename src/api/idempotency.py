@@ -0,0 +1,70 @@
+# src/api/idempotency.py
+import asyncio # Importa asyncio para agrupar las peticiones concurrentes con la misma clave
+import hashlib # Importa hashlib para la huella del cuerpo de la petición
+
+from fastapi import HTTPException, Response # Importa HTTPException para la clave reutilizada y Response para repetir la respuesta
+from starlette.concurrency import run_in_threadpool # El almacén SQLite opcional es bloqueante
+
+from src.repositories import idempotency # Importa el almacén global de respuestas
+from src.repositories.idempotency import StoredResponse
+
+REPLAY_HEADER = "Idempotent-Replayed" # Marca las respuestas repetidas desde el almacén
+
+_in_flight = {} # key -> asyncio.Future de la primera petición que aún se está procesando (por proceso)
+
+
+SKIPPED_HEADERS = ("content-length", "content-type") # Response los vuelve a calcular a partir del cuerpo y media_type
+
+
+def fingerprint(body: bytes) -> str: # Huella del cuerpo crudo: la misma clave con otro cuerpo es un error del cliente
+    return hashlib.sha256(body).hexdigest()
+
+
+async def _call(method, *args): # Llama al almacén sin bloquear el event loop si hace E/S
+    if method.__self__.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+def replay(stored: StoredResponse) -> Response: # Repite la respuesta guardada byte a byte
+    return Response(
+        content=stored.body, status_code=stored.status_code, media_type=stored.media_type,
+        headers={**(stored.headers or {}), REPLAY_HEADER: "true"}
+    )
+
+
+async def run_idempotent(key: str, body_fingerprint: str, handler) -> Response: # Ejecuta handler una sola vez por clave durante el TTL
+    store = idempotency.get_idempotency_store()
+    while True:
+        stored = await _call(store.get, key)
+        if stored is not None:
+            if stored.fingerprint != body_fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail={
+                        "status": "error",
+                        "error": {
+                            "code": "IDEMPOTENCY_KEY_REUSED",
+                            "message": "La Idempotency-Key ya se usó con un cuerpo distinto"
+                        }
+                    }
+                )
+            return replay(stored)
+
+        pending = _in_flight.get(key)
+        if pending is None:
+            break
+        await asyncio.shield(pending) # Otra petición con la misma clave está en curso: se espera su resultado y se vuelve a consultar
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        response = await handler()
+        if response.status_code < 500: # Los errores del servidor (incluido 503 por backpressure) se pueden reintentar
+            headers = {name: value for name, value in response.headers.items() if name not in SKIPPED_HEADERS}
+            stored = StoredResponse(body_fingerprint, response.status_code, bytes(response.body), response.media_type, headers)
+            await _call(store.set, key, stored)
+        return response
+    finally:
+        del _in_flight[key]
+        future.set_result(None)
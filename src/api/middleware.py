@@ -0,0 +1,76 @@
+# src/api/middleware.py
+import cProfile # Perfilador usado cuando se pide perfilar una petición
+import time # Importa time para medir la latencia de cada petición
+from urllib.parse import parse_qs # Lee el flag ?profile= de la query
+
+from starlette.concurrency import run_in_threadpool # Escribe el archivo del perfil fuera del event loop
+
+from src.core.config import settings # Importa la configuración del perfilado
+from src.core.metrics import REQUEST_LATENCY # Histograma de latencia por ruta
+from src.core import profiling # Decisión de perfilado y guardado de archivos .pstats
+
+
+class MetricsMiddleware: # Middleware ASGI: registra la latencia de cada petición HTTP por método, ruta y código de estado
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500 # Si la aplicación falla antes de responder se cuenta como 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route") # El router de FastAPI agrega la ruta encontrada al scope
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"), # Plantilla de la ruta (ej: /api/messages/{session_id}), no la URL concreta
+                status_code
+            )
+
+
+class ProfilingMiddleware: # Middleware ASGI: perfila con cProfile las peticiones marcadas (X-Profile / ?profile=) o 1 de cada PROFILE_SAMPLE_RATE
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (settings.profile_token or settings.profile_sample_rate):
+            return await self.app(scope, receive, send)
+
+        provided = dict(scope["headers"]).get(b"x-profile", b"").decode("latin-1") # Token de administración en el header
+        if not provided:
+            provided = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [""])[0] # O en la query
+        if not profiling.should_profile(settings.profile_token, provided, settings.profile_sample_rate):
+            return await self.app(scope, receive, send)
+
+        profile = cProfile.Profile()
+        filename = profiling.profile_filename(scope["method"], scope["path"])
+        saved = None
+
+        async def send_wrapper(message):
+            nonlocal saved
+            if message["type"] == "http.response.start": # El servicio ya terminó: se guarda el perfil y el cliente recibe el nombre del archivo
+                saved = await run_in_threadpool(profiling.save_profile, profile, settings.profile_dir, filename)
+                if saved:
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", filename.encode())]
+            await send(message)
+
+        token = profiling.current_profile.set(profile) # call_service lo activa alrededor de cada llamada al servicio
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiling.current_profile.reset(token)
+            if saved is None: # La petición falló antes de responder: el perfil se guarda igual
+                await run_in_threadpool(profiling.save_profile, profile, settings.profile_dir, filename)
@@ -0,0 +1,8 @@
+# src/api/responses.py
+from fastapi.responses import JSONResponse # Respuesta JSON estándar (json de la librería estándar)
+
+try: # orjson es opcional: si está instalado, la serialización final de las respuestas usa orjson
+    import orjson # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
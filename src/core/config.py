@@ -0,0 +1,62 @@
+from typing import List # Importa List para opciones con varios valores
+from pydantic_settings import BaseSettings, SettingsConfigDict # Importa BaseSettings para leer configuración desde variables de entorno / .env
+
+
+class Settings(BaseSettings): # Configuración de la aplicación, cada campo se puede sobreescribir con una variable de entorno del mismo nombre
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    database_url: str = "sqlite:///./messages.db" # URL de conexión a la base de datos
+    db_pool_size: int = 20 # Conexiones permanentes del pool (bases de datos en archivo)
+    db_max_overflow: int = 20 # Conexiones extra permitidas en picos de carga
+    db_pool_timeout: float = 30.0 # Segundos de espera por una conexión libre antes de fallar
+    sqlite_busy_timeout_ms: int = 5000 # PRAGMA busy_timeout: espera por el bloqueo de escritura en lugar de fallar con "database is locked"
+    sqlite_cache_size_kib: int = 65536 # PRAGMA cache_size (en KiB) por conexión
+    sqlite_synchronous: str = "NORMAL" # PRAGMA synchronous: NORMAL es seguro en modo WAL y evita un fsync por commit
+    schema_auto_migrate: bool = True # True: al iniciar se aplican las migraciones pendientes; False: el arranque falla si el esquema está atrasado
+
+    db_async: bool = False # True: la ruta de las peticiones usa AsyncEngine/AsyncSession (aiosqlite) en lugar del pool de hilos
+
+    threadpool_size: int = 40 # Hilos disponibles para endpoints síncronos (límite de anyio usado por Starlette)
+
+    write_behind_enabled: bool = False # True: los POST se encolan y un hilo escritor los guarda en grupos (group commit)
+    write_behind_max_queue: int = 10000 # Mensajes en espera antes de responder 503 (backpressure)
+    write_behind_max_batch: int = 500 # Tamaño máximo de un grupo de commit
+    write_behind_max_delay_ms: float = 5.0 # Espera máxima para completar un grupo
+    write_behind_ack_timeout_s: float = 30.0 # Espera máxima de una petición por el commit de su grupo
+
+    cache_enabled: bool = True # Caché en proceso de las páginas de GET /api/messages/{session_id}
+    cache_ttl_s: float = 10.0 # Vigencia máxima de una página en caché (cubre escrituras hechas por otros procesos)
+    cache_max_bytes: int = 64 * 1024 * 1024 # Tamaño máximo aproximado del caché
+
+    pipeline_stages: List[str] = ["metrics", "filter", "language", "links"] # Etapas incluidas del pipeline de procesamiento, en orden (JSON en la variable de entorno)
+    pipeline_offload_threshold_ms: float = 50.0 # Costo estimado de una etapa para un lote a partir del cual se ejecuta en el pool de procesos
+    pipeline_workers: int = 0 # Procesos del pool (0 = uno por CPU)
+
+    batch_max_items: int = 5000 # Máximo de mensajes aceptados en una sola petición de POST /api/messages/batch
+    batch_chunk_size: int = 500 # Filas por sentencia INSERT multi-fila dentro de la transacción del lote
+
+    duplicate_guard_enabled: bool = True # Filtro de Bloom + LRU para rechazar message_id repetidos sin abrir una transacción
+    duplicate_guard_capacity: int = 1_000_000 # Capacidad inicial del filtro de Bloom (crece por capas)
+    duplicate_guard_error_rate: float = 0.001 # Tasa de falsos positivos (cada uno cuesta una consulta por clave primaria)
+    duplicate_guard_recent_size: int = 100_000 # message_id recientes recordados de forma exacta
+
+    idempotency_ttl_s: float = 86400.0 # Ventana durante la que se repite la respuesta de una Idempotency-Key
+    idempotency_max_bytes: int = 32 * 1024 * 1024 # Tamaño máximo del almacén en memoria
+    idempotency_sqlite: bool = False # True: las respuestas también se guardan en la tabla idempotency_keys (compartida entre procesos)
+
+    stream_buffer_size: int = 256 # Eventos pendientes por suscriptor de SSE/WebSocket antes de desalojarlo (slow consumer)
+    stream_heartbeat_s: float = 15.0 # Intervalo del comentario keep-alive de SSE en conexiones sin mensajes
+
+    content_compress_min_bytes: int = 1024 # Contenidos de al menos este tamaño (UTF-8) se guardan comprimidos con zlib (0 = sin compresión)
+    content_compress_level: int = 6 # Nivel de zlib (1 = más rápido, 9 = más compacto)
+
+    archive_dir: str = "./archive" # Particiones mensuales archivadas (archivos SQLite de solo lectura y comprimidos)
+    archive_after_months: int = 3 # Meses completos que se mantienen en la tabla principal antes de archivarse
+    retention_months: int = 0 # Meses que se conservan en total (0 = sin límite); las particiones más antiguas se eliminan
+
+    profile_token: str = "" # Token de administración para perfilar una petición (header X-Profile o ?profile=); vacío lo desactiva
+    profile_sample_rate: int = 0 # Perfila automáticamente 1 de cada N peticiones (0 = desactivado)
+    profile_dir: str = "./profiles" # Directorio de los archivos .pstats
+
+
+settings = Settings() # Instancia global de configuración
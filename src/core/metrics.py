@@ -0,0 +1,147 @@
+# src/core/metrics.py
+"""Métricas en formato de exposición de Prometheus (texto), sin dependencias externas"""
+import functools # Importa functools para conservar el nombre de las funciones decoradas
+import inspect # Importa inspect para instrumentar métodos síncronos y asíncronos
+import threading # Importa threading: las métricas se actualizan desde varios hilos
+import time # Importa time para medir duraciones
+from bisect import bisect_left # Ubica el bucket de un histograma
+from contextlib import contextmanager # Importa contextmanager para el hook timed()
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str: # Escapa un valor de etiqueta según el formato de texto de Prometheus
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str: # {a="x",b="y"} en formato Prometheus
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter: # Contador monotónico con etiquetas
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name, self.documentation, self.labels = name, documentation, labels
+        self.type = "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Histogram: # Histograma acumulativo con etiquetas (buckets fijos)
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labels = name, documentation, labels
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._values = {} # etiquetas -> [conteos por bucket..., +Inf], suma
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, f'le="{le}"'), cumulative))
+                samples.append((f"{self.name}_sum", _format_labels(self.labels, key), total))
+                samples.append((f"{self.name}_count", _format_labels(self.labels, key), cumulative))
+        return samples
+
+
+class Gauge: # Valor instantáneo leído al momento de exponer las métricas (callback)
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), callback=None, type: str = "gauge"):
+        self.name, self.documentation, self.labels = name, documentation, labels
+        self.type = type # "counter" para valores monotónicos mantenidos por otro componente (ej: aciertos del caché)
+        self.callback = callback # callback() -> {tupla de etiquetas: valor}
+
+    def samples(self) -> list:
+        try:
+            values = self.callback() or {}
+        except Exception: # Una métrica que falla no debe romper /metrics
+            return []
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in values.items()]
+
+
+class Registry: # Conjunto de métricas expuestas en /metrics
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str: # Formato de exposición de texto de Prometheus (version 0.0.4)
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta", ("method", "route", "status")
+))
+LAYER_LATENCY = REGISTRY.register(Histogram(
+    "layer_duration_seconds", "Tiempo por capa (validation, pipeline, service, repository) y operación", ("layer", "operation")
+))
+LAYER_ERRORS = REGISTRY.register(Counter(
+    "layer_errors_total", "Excepciones por capa y operación", ("layer", "operation")
+))
+
+
+@contextmanager
+def timed(layer: str, operation: str): # Hook de tiempo que llaman las capas: with timed("repository", "save_message"): ...
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        LAYER_ERRORS.inc(layer, operation)
+        raise
+    finally:
+        LAYER_LATENCY.observe(time.perf_counter() - started, layer, operation)
+
+
+def instrument(layer: str): # Decorador equivalente a timed() usando el nombre del método como operación
+    def decorator(func):
+        operation = func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(layer, operation):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(layer, operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
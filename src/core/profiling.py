@@ -0,0 +1,57 @@
+# src/core/profiling.py
+"""Perfilado opcional de peticiones individuales con cProfile (archivos .pstats)"""
+import cProfile # Perfilador determinista de la librería estándar
+import hmac # Importa hmac para comparar el token de administración en tiempo constante
+import itertools # Importa itertools para el contador del muestreo 1 de cada N
+import os # Importa os para crear el directorio de perfiles
+import threading # Importa threading: en modo asíncrono solo se perfila una corutina a la vez en el event loop
+import time # Importa time para el nombre de los archivos
+import uuid # Importa uuid para nombres de archivo únicos
+from contextvars import ContextVar # El perfil activo viaja con la petición (contexto de la tarea ASGI)
+from typing import Optional
+
+current_profile: ContextVar[Optional[cProfile.Profile]] = ContextVar("current_profile", default=None)
+
+_sample_counter = itertools.count(1)
+_loop_lock = threading.Lock() # sys.setprofile es por hilo: dos perfiles a la vez en el event loop se pisarían
+
+
+def should_profile(token: str, provided: Optional[str], sample_rate: int) -> bool: # Flag de administración (header o query) o muestreo automático
+    if token and provided and hmac.compare_digest(token.encode(), provided.encode()):
+        return True
+    return sample_rate > 0 and next(_sample_counter) % sample_rate == 0
+
+
+def profile_filename(method: str, path: str) -> str: # Ej: 20240101T120000-GET-api_messages_session-1-1a2b3c4d.pstats
+    slug = path.strip("/").replace("/", "_")[:80] or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{uuid.uuid4().hex[:8]}.pstats"
+
+
+def run_profiled(profile: cProfile.Profile, func, *args, **kwargs): # Ejecuta func con el perfil activo en el hilo actual (hilo del pool)
+    profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+
+
+async def await_profiled(profile: cProfile.Profile, func, *args, **kwargs): # Corutinas: el perfil también registra otras tareas del event loop mientras está activo
+    if not _loop_lock.acquire(blocking=False): # Ya hay otra petición perfilándose en el event loop: se ejecuta sin perfil
+        return await func(*args, **kwargs)
+    try:
+        profile.enable()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profile.disable()
+    finally:
+        _loop_lock.release()
+
+
+def save_profile(profile: cProfile.Profile, directory: str, filename: str) -> bool: # Guarda el perfil si registró algo; compatible con pstats, snakeviz y flameprof
+    profile.create_stats()
+    if not profile.stats: # La petición no llegó a la capa de servicio (ej: 422, 404)
+        return False
+    os.makedirs(directory, exist_ok=True)
+    profile.dump_stats(os.path.join(directory, filename))
+    return True
@@ -0,0 +1,269 @@
+# src/database/compression.py
+"""Compresión transparente de messages.content
+
+Los contenidos de al menos CONTENT_COMPRESS_MIN_BYTES se guardan como BLOB comprimido con zlib (deflate sin
+encabezado); los demás quedan como texto y se leen sin costo extra. El primer byte del BLOB es el id del
+diccionario usado (0 = sin diccionario). Los diccionarios se entrenan con los contenidos de la propia base y
+se guardan en content_dictionaries: nunca se modifican, así que un BLOB siempre se lee con el diccionario con
+que se escribió. Los ids solo valen dentro de su base: cada archivo tiene su propio ContentCodec (codec_for),
+que build_engine asocia al dialecto del engine. Las escrituras usan el diccionario más reciente de esa base (se
+cargan al abrir cada conexión del pool). Si una lectura encuentra un diccionario que aún no conoce (train y
+compact con la API en marcha), vuelve a leer content_dictionaries de la base antes de descomprimir: no hace
+falta reiniciar la API.
+
+Las lecturas no descomprimen: la columna devuelve un CompressedContent y el texto se obtiene con
+content_text() solo donde se usa (páginas, exportación, particiones).
+
+La función SQL message_text(content), registrada en cada conexión, devuelve el texto: los triggers de FTS5 la
+usan para indexar el texto y no el BLOB.
+
+Uso como comando:
+    python -m src.database.compression train      # entrena un diccionario nuevo con una muestra de la base
+    python -m src.database.compression compact    # comprime los contenidos largos guardados como texto o con un diccionario anterior
+    python -m src.database.compression stats      # filas comprimidas y bytes ahorrados en la base
+"""
+import sqlite3 # Importa sqlite3 para releer los diccionarios desde el archivo de la base
+import sys # Importa sys para leer los argumentos del comando
+import weakref # Importa weakref para asociar cada dialecto (engine) a su codec sin retenerlo
+import zlib # Importa zlib (incluido en Python): deflate con diccionario preestablecido
+from collections import Counter # Importa Counter para elegir los fragmentos más repetidos del corpus
+from functools import partial # Importa partial para fijar la base de la que se releen los diccionarios
+from os.path import abspath # Importa abspath para que rutas distintas del mismo archivo compartan codec
+
+from sqlalchemy import event # Importa event para registrar prepare_connection en cada engine
+
+from src.core.config import settings # Importa la configuración de la compresión
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer los bytes ahorrados
+
+WBITS = -zlib.MAX_WBITS # Deflate sin encabezado ni checksum zlib: 6 bytes menos por fila
+ZDICT_MAX_BYTES = 32 * 1024 # zlib solo usa los últimos 32 KiB del diccionario
+TRAIN_SAMPLE_ROWS = 5000 # Contenidos de la base usados para entrenar un diccionario
+
+
+class ContentCodec: # Conversión entre el texto de un mensaje y lo que se guarda en la columna content
+
+    def __init__(self, min_bytes: int = 1024, level: int = 6, loader=None):
+        self.min_bytes = min_bytes # 0 = sin compresión (los BLOB existentes se siguen leyendo)
+        self.level = level
+        self.dictionaries = {} # id -> diccionario (bytes) de una sola base
+        self.current = 0 # Diccionario usado en las escrituras (0 = ninguno)
+        self.counters = {"compressed": 0, "raw_bytes": 0, "stored_bytes": 0, "decompressed": 0}
+        self.loader = loader # Función que devuelve las filas (id, zdict) de content_dictionaries de la misma base
+
+    def add_dictionaries(self, rows): # Registra diccionarios (id, zdict) leídos de content_dictionaries
+        for dictionary_id, zdict in rows:
+            self.dictionaries[dictionary_id] = bytes(zdict)
+        self.current = max(self.dictionaries, default=0)
+
+    def encode(self, value): # Texto -> valor de la columna: BLOB comprimido solo si supera el umbral y ocupa menos
+        if value is None or not self.min_bytes or len(value) * 4 < self.min_bytes: # UTF-8 usa a lo sumo 4 bytes por carácter: descarta sin codificar
+            return value
+        raw = value.encode("utf-8")
+        if len(raw) < self.min_bytes:
+            return value
+        zdict = self.dictionaries.get(self.current)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS, zdict=zdict) if zdict else zlib.compressobj(self.level, zlib.DEFLATED, WBITS)
+        blob = bytes((self.current,)) + compressor.compress(raw) + compressor.flush()
+        if len(blob) >= len(raw): # Incompresible (ej: texto ya comprimido o aleatorio)
+            return value
+        self.counters["compressed"] += 1
+        self.counters["raw_bytes"] += len(raw)
+        self.counters["stored_bytes"] += len(blob)
+        return blob
+
+    def decode(self, value): # Valor de la columna -> texto; el texto guardado sin comprimir se devuelve tal cual
+        if not isinstance(value, bytes):
+            return value
+        dictionary_id = value[0]
+        if dictionary_id:
+            zdict = self.dictionaries.get(dictionary_id)
+            if zdict is None: # Entrenado después de abrir esta conexión (train con la API en marcha)
+                zdict = self.reload(dictionary_id)
+            decompressor = zlib.decompressobj(WBITS, zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj(WBITS)
+        self.counters["decompressed"] += 1
+        return (decompressor.decompress(memoryview(value)[1:]) + decompressor.flush()).decode("utf-8")
+
+    def reload(self, dictionary_id: int) -> bytes: # Relee content_dictionaries de la base y devuelve el diccionario pedido; LookupError si no existe
+        if self.loader is not None:
+            self.add_dictionaries(self.loader())
+        zdict = self.dictionaries.get(dictionary_id)
+        if zdict is None:
+            raise LookupError(f"Diccionario de compresión {dictionary_id} desconocido: no está en content_dictionaries")
+        return zdict
+
+    def stats(self) -> dict: # Escrituras comprimidas por este proceso y bytes ahorrados
+        return dict(self.counters, bytes_saved=self.counters["raw_bytes"] - self.counters["stored_bytes"], dictionary=self.current)
+
+
+def train_dictionary(samples, max_bytes: int = ZDICT_MAX_BYTES) -> bytes: # Diccionario con las palabras y pares de palabras que más bytes ahorrarían
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        counts.update(words)
+        counts.update(f"{first} {second}" for first, second in zip(words, words[1:])) # Frases frecuentes (saludos, respuestas tipo)
+    ranked = sorted((piece for piece, count in counts.items() if count > 1), key=lambda piece: counts[piece] * len(piece), reverse=True)
+    pieces, size = [], 0
+    for piece in ranked:
+        data = piece.encode("utf-8") + b" "
+        if size + len(data) > max_bytes:
+            break
+        pieces.append(data)
+        size += len(data)
+    return b"".join(reversed(pieces)) # Los más valiosos al final: deflate los alcanza con distancias más cortas
+
+
+class CompressedContent: # Contenido comprimido leído de la columna: se descomprime la primera vez que se pide el texto
+    __slots__ = ("blob", "codec", "text")
+
+    def __init__(self, blob: bytes, codec: ContentCodec):
+        self.blob = blob
+        self.codec = codec # El de la base de la que se leyó (los ids de diccionario son por base)
+        self.text = None
+
+    def __str__(self):
+        if self.text is None:
+            self.text = self.codec.decode(self.blob)
+        return self.text
+
+
+def content_text(value): # Valor leído de messages.content -> texto (descomprime solo los CompressedContent)
+    return str(value) if isinstance(value, CompressedContent) else value
+
+
+def read_dictionaries(path: str) -> list: # Filas (id, zdict) de content_dictionaries con una conexión propia (sirve desde cualquier hilo, también con aiosqlite)
+    if not path: # Una base en memoria no se puede releer desde otra conexión
+        return []
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT id, zdict FROM content_dictionaries").fetchall()
+    finally:
+        connection.close()
+
+
+content_codec = ContentCodec(settings.content_compress_min_bytes, settings.content_compress_level) # Codec de los engines creados sin build_engine (no conoce diccionarios)
+codecs = {} # Archivo de la base -> su ContentCodec (los engines sobre el mismo archivo lo comparten)
+dialect_codecs = weakref.WeakKeyDictionary() # Dialecto de cada engine -> codec de su base (la columna solo recibe el dialecto)
+
+
+def codec_for(path: str = None) -> ContentCodec: # Codec de una base; path = None para una base en memoria (codec propio, no se puede releer)
+    if not path:
+        return ContentCodec(settings.content_compress_min_bytes, settings.content_compress_level)
+    path = abspath(path)
+    if path not in codecs:
+        codecs[path] = ContentCodec(settings.content_compress_min_bytes, settings.content_compress_level, loader=partial(read_dictionaries, path))
+    return codecs[path]
+
+
+def codec_of(dialect) -> ContentCodec: # Codec de la base del engine al que pertenece el dialecto
+    return dialect_codecs.get(dialect, content_codec)
+
+
+def attach_codec(engine, path: str = None) -> ContentCodec: # build_engine: asocia el engine (síncrono) al codec de su base y registra prepare_connection
+    codec = codec_for(path)
+    dialect_codecs[engine.dialect] = codec
+    event.listen(engine, "connect", partial(prepare_connection, codec=codec))
+    return codec
+
+
+def prepare_connection(dbapi_connection, connection_record, codec: ContentCodec = content_codec): # Evento "connect": función message_text() y diccionarios guardados
+    dbapi_connection.create_function("message_text", 1, codec.decode, deterministic=True) # Los triggers releen los diccionarios de esta misma base
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content_dictionaries'")
+        if cursor.fetchone() is not None: # Una base nueva aún no tiene la tabla (se crea al migrar)
+            cursor.execute("SELECT id, zdict FROM content_dictionaries")
+            codec.add_dictionaries(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def compact(engine) -> tuple: # Comprime los contenidos largos guardados como texto o con otro diccionario; retorna (revisados, reescritos)
+    from sqlalchemy import text # Imports diferidos: models importa este módulo
+    from src.database.models import MessageModel
+
+    codec = codec_of(engine.dialect)
+    pending = text( # Por bloques de rowid; content llega como texto o CompressedContent
+        "SELECT rowid, message_id, content FROM messages WHERE rowid > :last AND ("
+        "(typeof(content) = 'text' AND length(CAST(content AS BLOB)) >= :min_bytes) OR "
+        "(typeof(content) = 'blob' AND hex(substr(content, 1, 1)) <> :current)) ORDER BY rowid LIMIT 1000"
+    ).columns(content=MessageModel.content.type)
+    rewrite = text("UPDATE messages SET content = :content WHERE message_id = :message_id") # Valor ya codificado: no se vuelve a comprimir al guardar
+    reviewed, rewritten, last = 0, 0, 0
+    while True:
+        with engine.begin() as conn: # Una transacción por bloque: no bloquea a los escritores durante todo el recorrido
+            rows = conn.execute(pending, {"last": last, "min_bytes": codec.min_bytes, "current": f"{codec.current:02X}"}).all()
+            changed = []
+            for row in rows:
+                encoded = codec.encode(content_text(row.content))
+                if encoded != row.content: # Un texto incompresible sigue igual: no se reescribe (ni dispara el trigger de FTS) en cada compact
+                    changed.append({"message_id": row.message_id, "content": encoded})
+            if changed:
+                conn.execute(rewrite, changed)
+        if not rows:
+            break
+        reviewed += len(rows)
+        rewritten += len(changed)
+        last = rows[-1].rowid
+    return reviewed, rewritten
+
+
+def compression_counters() -> dict: # Bytes comprimidos por este proceso en todas las bases (métrica content_compression_bytes_total)
+    instances = {id(codec): codec for codec in (content_codec, *codecs.values(), *dialect_codecs.values())}.values()
+    return {
+        ("raw", ): sum(codec.counters["raw_bytes"] for codec in instances),
+        ("stored", ): sum(codec.counters["stored_bytes"] for codec in instances)
+    }
+
+
+REGISTRY.register(Gauge(
+    "content_compression_bytes_total", "Bytes de contenido comprimidos por este proceso (raw = originales, stored = guardados)", ("kind",), type="counter",
+    callback=compression_counters
+))
+
+
+if __name__ == "__main__":
+    command = sys.argv[1:]
+    if command not in (["train"], ["compact"], ["stats"]):
+        print(__doc__)
+        sys.exit(1)
+
+    from sqlalchemy import func, select, text # Imports diferidos: solo para el comando
+
+    from src.database.compression import codec_of, compact, content_text # Las funciones que usan el engine y los modelos (este archivo se ejecuta como __main__)
+    from src.database.database import get_engine, DATABASE_URL
+    from src.database.models import ContentDictionaryModel, MessageModel
+    from src.database.schema import ensure_schema
+
+    engine = get_engine()
+    ensure_schema(engine)
+    codec = codec_of(engine.dialect)
+
+    if command == ["train"]:
+        with engine.begin() as conn:
+            samples = [content_text(value) for value in conn.scalars(select(MessageModel.content).order_by(func.random()).limit(TRAIN_SAMPLE_ROWS))]
+            if not samples:
+                print("La base no tiene mensajes para entrenar un diccionario")
+                sys.exit(1)
+            zdict = train_dictionary(samples)
+            dictionary_id = conn.execute(ContentDictionaryModel.__table__.insert().values(zdict=zdict)).inserted_primary_key[0]
+            if dictionary_id > 255: # El id se guarda en el primer byte de cada BLOB
+                raise RuntimeError("No quedan ids de diccionario libres (máximo 255)")
+            codec.add_dictionaries([(dictionary_id, zdict)])
+        print(f"Diccionario {dictionary_id} ({len(zdict)} bytes, {len(samples)} mensajes de muestra) en {DATABASE_URL}")
+
+    elif command == ["compact"]:
+        if not codec.min_bytes:
+            print("CONTENT_COMPRESS_MIN_BYTES=0: la compresión está desactivada")
+            sys.exit(1)
+        reviewed, rewritten = compact(engine)
+        print(f"{rewritten} de {reviewed} contenidos revisados reescritos en {DATABASE_URL}")
+
+    else:
+        with engine.connect() as conn:
+            row = conn.execute(text(
+                "SELECT count(*) AS rows, coalesce(sum(length(content)), 0) AS stored, "
+                "coalesce(sum(length(CAST(message_text(content) AS BLOB))), 0) AS raw FROM messages WHERE typeof(content) = 'blob'"
+            )).one()
+        print(f"{row.rows} contenidos comprimidos: {row.raw} bytes -> {row.stored} bytes ({row.raw - row.stored} bytes ahorrados) en {DATABASE_URL}")
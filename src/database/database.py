@@ -1,26 +1,157 @@
-from sqlalchemy import create_engine # Importa create_engine para crear conexión a base de datos
+from functools import partial # Importa partial para fijar la configuración de los PRAGMA en el evento de conexión
+from sqlalchemy import create_engine, event # Importa create_engine para crear conexión a base de datos, event para configurar cada conexión nueva
+from sqlalchemy.engine import make_url # Importa make_url para obtener el archivo de la base de una URL
 from sqlalchemy.orm import sessionmaker, declarative_base # Importa sessionmaker para crear fábrica de sesiones, declarative_base para crear clase base de modelos
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool # Pool con cola para el motor asíncrono, pool de una sola conexión para SQLite en memoria
+from src.core.config import Settings, settings # Importa la configuración de la aplicación
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer el uso del pool
+from src.database.compression import attach_codec # Asocia cada engine al codec de compresión de su base (message_text() y diccionarios en cada conexión)
 
-DATABASE_URL = "sqlite:///./messages.db" # URL de conexión a SQLite. "sqlite:///./messages.db" significa: # - sqlite: motor de base de datos
+DATABASE_URL = settings.database_url # URL de conexión a SQLite. "sqlite:///./messages.db" significa: # - sqlite: motor de base de datos
 # - ///: ruta relativa
 # - ./messages.db: archivo en directorio actual
+ENGINE_SETTINGS = settings # Configuración del pool y de los PRAGMA de los engines globales (create_app puede cambiarla)
 
-engine = create_engine( # Crea el motor (engine) de SQLAlchemy
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} # Necesario para SQLite con FastAPI
-)
 
-SessionLocal = sessionmaker( # Crea una fábrica de sesiones (SessionLocal)
-    autocommit=False,
-    autoflush=False,
-    bind=engine
-)
+def is_memory_database(url: str) -> bool: # Indica si la URL apunta a una base SQLite en memoria
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def build_engine(url: str, app_settings: Settings = None): # Crea el motor de SQLAlchemy ajustado para SQLite (por defecto con ENGINE_SETTINGS)
+    app_settings = app_settings or ENGINE_SETTINGS
+    if is_memory_database(url): # En memoria: una sola conexión compartida, si no cada conexión vería una base distinta
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+        attach_codec(engine)
+        return engine
+
+    engine = create_engine( # En archivo: pool de conexiones para que las peticiones concurrentes no compartan una sola conexión
+        url,
+        connect_args={"check_same_thread": False}, # Necesario para SQLite con FastAPI
+        pool_size=app_settings.db_pool_size,
+        max_overflow=app_settings.db_max_overflow,
+        pool_timeout=app_settings.db_pool_timeout
+    )
+
+    event.listen(engine, "connect", partial(set_sqlite_pragmas, app_settings=app_settings))
+    attach_codec(engine, make_url(url).database)
+    return engine
+
+
+def build_async_engine(url: str, app_settings: Settings = None): # Crea el motor asíncrono (aiosqlite) con el mismo ajuste que build_engine
+    app_settings = app_settings or ENGINE_SETTINGS
+    from sqlalchemy.ext.asyncio import create_async_engine # Import diferido: aiosqlite solo es necesario en modo asíncrono
+
+    async_url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if is_memory_database(url):
+        engine = create_async_engine(async_url, poolclass=StaticPool)
+        attach_codec(engine.sync_engine)
+        return engine
+
+    engine = create_async_engine( # aiosqlite usa NullPool por defecto: se pide un pool explícito para reutilizar conexiones
+        async_url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=app_settings.db_pool_size,
+        max_overflow=app_settings.db_max_overflow,
+        pool_timeout=app_settings.db_pool_timeout
+    )
+    event.listen(engine.sync_engine, "connect", partial(set_sqlite_pragmas, app_settings=app_settings)) # Los eventos de conexión se registran en el motor síncrono subyacente
+    attach_codec(engine.sync_engine, make_url(url).database)
+    return engine
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record, app_settings: Settings = settings): # Se ejecuta una vez por conexión nueva del pool
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL") # Lectores no bloquean al escritor y viceversa
+    cursor.execute(f"PRAGMA synchronous={app_settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(app_settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(app_settings.sqlite_cache_size_kib)}") # Valor negativo = tamaño en KiB
+    cursor.close()
+
+
+_engine = None # Motor síncrono, se crea en el primer uso: importar la aplicación no abre ni crea la base de datos
+_session_factory = None # Fábrica de sesiones asociada a _engine
+
+
+def configure(url: str, app_settings: Settings = None) -> None: # Cambia la URL y la configuración del pool/PRAGMA (create_app con otra configuración), solo antes del primer uso
+    global DATABASE_URL, ENGINE_SETTINGS
+    app_settings = app_settings or ENGINE_SETTINGS
+    if url != DATABASE_URL or app_settings is not ENGINE_SETTINGS:
+        if _engine is not None or async_engine is not None:
+            raise RuntimeError("La base de datos ya está en uso: configure() debe llamarse antes de crear el engine")
+        DATABASE_URL, ENGINE_SETTINGS = url, app_settings
+
+
+def get_engine(): # Crea (una sola vez) el motor de SQLAlchemy
+    global _engine
+    if _engine is None:
+        _engine = build_engine(DATABASE_URL)
+    return _engine
+
+
+def get_sessionmaker(): # Crea (una sola vez) la fábrica de sesiones (SessionLocal)
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=get_engine()
+        )
+    return _session_factory
+
+
+def __getattr__(name): # Compatibilidad: database.engine y database.SessionLocal se crean al primer acceso
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pool_usage() -> dict: # Conexiones del pool por estado (métrica db_pool_connections)
+    values = {}
+    pools = [("sync", _engine.pool)] if _engine is not None else []
+    if async_engine is not None:
+        pools.append(("async", async_engine.sync_engine.pool))
+    for name, pool in pools:
+        for state in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, state): # StaticPool (memoria) no expone estos contadores
+                values[(name, state)] = getattr(pool, state)()
+    return values
+
+
+REGISTRY.register(Gauge("db_pool_connections", "Conexiones del pool de base de datos por estado", ("engine", "state"), callback=pool_usage))
 
 Base = declarative_base() # Crea la clase base para todos los modelos SQLAlchemy, Todos los modelos heredarán de esta clase
 
 def get_db(): # Función de dependencia para FastAPI
-    db = SessionLocal() # Crea una nueva sesión
+    db = get_sessionmaker()() # Crea una nueva sesión
     try:   # Entrega la sesión al endpoint
         yield db
     finally:
         db.close() # Cierra la sesión siempre, incluso si hay error
+
+
+async_engine = None # Motor asíncrono, se crea en el primer uso (solo en modo DB_ASYNC)
+AsyncSessionLocal = None # Fábrica de AsyncSession asociada a async_engine
+
+
+def get_async_sessionmaker(): # Crea (una sola vez) el motor asíncrono y su fábrica de sesiones
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        async_engine = build_async_engine(DATABASE_URL)
+        AsyncSessionLocal = async_sessionmaker(
+            bind=async_engine,
+            autoflush=False,
+            expire_on_commit=False # Evita recargas implícitas (I/O) al leer atributos después del commit
+        )
+    return AsyncSessionLocal
+
+
+async def get_async_db(): # Función de dependencia para FastAPI en modo asíncrono
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,141 @@
+# src/database/fts.py
+"""Índice de texto completo (FTS5) sobre messages.content
+
+Los mensajes de los meses archivados siguen en el índice: archive_month los registra en archived_messages antes
+de borrarlos de messages y el trigger de borrado no los quita; la retención los elimina junto con el mes.
+
+Uso como comando (reconstruye el índice de una base existente, ej: messages.db):
+    python -m src.database.fts rebuild
+"""
+import sys # Importa sys para leer los argumentos del comando
+from sqlalchemy import bindparam, text # Importa text para ejecutar DDL de SQLite
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f" # Formato en que SQLAlchemy guarda DateTime en SQLite
+
+# Tabla FTS5 con su propia copia del texto: no depende del rowid de messages (que VACUUM puede cambiar)
+# messages_fts_rowids relaciona cada message_id con su rowid en messages_fts: borrar o actualizar un mensaje
+# no recorre todo el índice (message_id es UNINDEXED y una búsqueda por esa columna lee la tabla completa)
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        message_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages_fts_rowids (
+        message_id TEXT PRIMARY KEY,
+        fts_rowid INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+    # Los triggers mantienen el índice en la misma transacción que la escritura en messages (incluye lotes y cola de escritura)
+    # message_text() (src.database.compression) indexa el texto de los contenidos guardados comprimidos
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (content, message_id) VALUES (message_text(new.content), new.message_id);
+        INSERT INTO messages_fts_rowids (message_id, fts_rowid) VALUES (new.message_id, last_insert_rowid());
+    END""",
+    # Archivar un mes registra sus mensajes en archived_messages antes de borrarlos: siguen en el índice y en la búsqueda
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages
+    WHEN NOT EXISTS (SELECT 1 FROM archived_messages WHERE message_id = old.message_id) BEGIN
+        DELETE FROM messages_fts WHERE rowid = (SELECT fts_rowid FROM messages_fts_rowids WHERE message_id = old.message_id);
+        DELETE FROM messages_fts_rowids WHERE message_id = old.message_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = (SELECT fts_rowid FROM messages_fts_rowids WHERE message_id = old.message_id);
+        DELETE FROM messages_fts_rowids WHERE message_id = old.message_id;
+        INSERT INTO messages_fts (content, message_id) VALUES (message_text(new.content), new.message_id);
+        INSERT INTO messages_fts_rowids (message_id, fts_rowid) VALUES (new.message_id, last_insert_rowid());
+    END""",
+]
+
+
+def ensure_fts(engine): # Crea la tabla FTS5 y sus triggers si no existen
+    with engine.begin() as conn:
+        create_fts(conn)
+
+
+def replace_triggers(conn): # Vuelve a crear los triggers con la definición actual de FTS_DDL
+    for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    create_fts(conn)
+
+
+def create_fts(conn): # Igual que ensure_fts dentro de una transacción ya abierta (migraciones de src.database.schema)
+    has_index = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'")).first()
+    has_rowids = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts_rowids'")).first()
+    if has_index and not has_rowids: # Base creada con la versión anterior: se reemplazan los triggers y se llena la relación message_id -> rowid
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    if has_index and not has_rowids:
+        conn.execute(text("INSERT OR REPLACE INTO messages_fts_rowids (message_id, fts_rowid) SELECT message_id, rowid FROM messages_fts"))
+
+
+def index_messages(conn) -> int: # Indexa los mensajes de messages que aún no están en el índice (ej: base creada antes de FTS5)
+    # messages_fts guarda su propia copia del texto (no es external content): 'rebuild' no la llenaría desde messages
+    indexed = conn.execute(text(
+        "INSERT INTO messages_fts (content, message_id) SELECT message_text(content), message_id FROM messages "
+        "WHERE message_id NOT IN (SELECT message_id FROM messages_fts_rowids)"
+    )).rowcount
+    conn.execute(text(
+        "INSERT INTO messages_fts_rowids (message_id, fts_rowid) SELECT message_id, rowid FROM messages_fts "
+        "WHERE message_id NOT IN (SELECT message_id FROM messages_fts_rowids)"
+    ))
+    return indexed
+
+
+INDEX_CHUNK_ROWS = 500 # Mensajes archivados por consulta al indexar
+KNOWN_IDS = text("SELECT message_id FROM messages_fts_rowids WHERE message_id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+
+def index_rows(conn, rows) -> int: # Indexa (message_id, texto) que no están en la tabla messages (ej: mensajes archivados), con rowid explícito
+    next_rowid = conn.execute(text("SELECT coalesce(max(rowid), 0) FROM messages_fts")).scalar() + 1
+    batch = []
+    for message_id, content in rows:
+        batch.append({"rowid": next_rowid, "content": content, "message_id": message_id})
+        next_rowid += 1
+    if batch:
+        conn.execute(text("INSERT INTO messages_fts (rowid, content, message_id) VALUES (:rowid, :content, :message_id)"), batch)
+        conn.execute(text("INSERT INTO messages_fts_rowids (message_id, fts_rowid) VALUES (:message_id, :rowid)"), batch)
+    return len(batch)
+
+
+def index_archive(conn, archive) -> int: # Indexa los mensajes de las particiones archivadas y los registra en archived_messages
+    indexed = 0
+    for month in sorted(archive.months()):
+        rows = list(archive.iter_month(month))
+        conn.execute(text(
+            "INSERT OR REPLACE INTO archived_messages (message_id, month, session_id, timestamp, sender) "
+            "VALUES (:message_id, :month, :session_id, :timestamp, :sender)"
+        ), [dict(row, month=month, timestamp=row["timestamp"].strftime(TIMESTAMP_FORMAT)) for row in rows]) # Mismo texto que guarda la columna DateTime
+        for index in range(0, len(rows), INDEX_CHUNK_ROWS): # Un mensaje que ya está en el índice no se vuelve a agregar
+            chunk = rows[index:index + INDEX_CHUNK_ROWS]
+            known = set(conn.scalars(KNOWN_IDS, {"ids": [row["message_id"] for row in chunk]}))
+            indexed += index_rows(conn, ((row["message_id"], row["content"]) for row in chunk if row["message_id"] not in known))
+    return indexed
+
+
+def rebuild_fts(engine, archive=None) -> int: # Vuelve a indexar todos los mensajes (y los archivados, con archive), retorna cuántos quedaron indexados
+    ensure_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM messages_fts"))
+        conn.execute(text("DELETE FROM messages_fts_rowids"))
+        conn.execute(text("INSERT INTO messages_fts (content, message_id) SELECT message_text(content), message_id FROM messages"))
+        conn.execute(text("INSERT INTO messages_fts_rowids (message_id, fts_rowid) SELECT message_id, rowid FROM messages_fts"))
+        if archive is not None:
+            conn.execute(text("DELETE FROM archived_messages"))
+            index_archive(conn, archive)
+        conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")) # Fusiona los segmentos del índice
+        return conn.execute(text("SELECT count(*) FROM messages_fts")).scalar()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print(__doc__)
+        sys.exit(1)
+
+    from src.database.database import get_engine, DATABASE_URL
+    from src.database.partitions import archive_store
+    from src.database.schema import ensure_schema
+
+    engine = get_engine()
+    ensure_schema(engine)
+    print(f"{rebuild_fts(engine, archive_store)} mensajes indexados en {DATABASE_URL}")
@@ -1,12 +1,165 @@
-from sqlalchemy import Column, String, DateTime, JSON # Importa tipos de columnas SQLAlchemy
+from datetime import datetime # Importa datetime para convertir processed_at entre texto ISO 8601 y columna DateTime
+from sqlalchemy import Boolean, Column, String, DateTime, JSON, Index, Integer, Float, LargeBinary, TypeDecorator # Importa tipos de columnas SQLAlchemy e Index para índices compuestos
+from src.database.compression import CompressedContent, codec_of # Importa el codec de compresión del contenido de cada base
 from src.database.database import Base # Importa la clase base para modelos
 
+def _plain(kind): # Valor que la columna guarda tal cual (solo si es exactamente de ese tipo)
+    return (lambda value: value if type(value) is kind else None), (lambda value: value)
+
+
+def _joined(separator: str): # Lista de textos -> un solo texto ("" = lista vacía); solo si ningún elemento contiene el separador
+    def encode(value):
+        if isinstance(value, list) and all(isinstance(item, str) and item and separator not in item for item in value):
+            return separator.join(value)
+        return None
+    return encode, (lambda value: value.split(separator) if value else [])
+
+
+def _encode_processed_at(value): # "2023-06-15T14:30:01.123456Z" -> datetime, solo si se reconstruye el mismo texto
+    if not isinstance(value, str) or not value.endswith("Z"):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1])
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is None and parsed.isoformat() + "Z" == value else None
+
+
+# Claves fijas de las etapas incluidas del pipeline -> (a columna, desde columna). Un valor que la columna no puede
+# representar exactamente (a columna retorna None) se guarda en metadata_extra con el resto de la salida de etapas propias
+METADATA_CODECS = {
+    "word_count": _plain(int),
+    "character_count": _plain(int),
+    "is_filtered": _plain(bool),
+    "pii_types": _joined(","),
+    "language": _plain(str),
+    "links": _joined(" "), # Los enlaces no contienen espacios (LINK_RE)
+    "processed_at": (_encode_processed_at, lambda value: value.isoformat() + "Z"),
+}
+
+
+def metadata_columns(metadata) -> dict: # Metadata del pipeline (diccionario) -> columnas de messages
+    extra = dict(metadata or {})
+    columns = dict.fromkeys(METADATA_CODECS)
+    for name, (encode, _) in METADATA_CODECS.items():
+        if name in extra:
+            value = encode(extra[name])
+            if value is not None:
+                columns[name] = value
+                del extra[name]
+    columns["metadata_extra"] = extra or None
+    return columns
+
+
+def column_metadata(row) -> dict: # Columnas de messages (objeto o fila con atributos) -> metadata como la generó el pipeline (None si no tiene)
+    metadata = {}
+    for name, (_, decode) in METADATA_CODECS.items():
+        value = getattr(row, name)
+        if value is not None and name != "processed_at":
+            metadata[name] = decode(value)
+    if row.metadata_extra:
+        metadata.update(row.metadata_extra)
+    if row.processed_at is not None: # El pipeline agrega processed_at después de todas las etapas
+        metadata["processed_at"] = row.processed_at.isoformat() + "Z"
+    return metadata or None
+
+
+class CompressedText(TypeDecorator): # Texto guardado como BLOB comprimido a partir de CONTENT_COMPRESS_MIN_BYTES (ver src/database/compression.py)
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect): # Con los diccionarios de la base del engine (dialect)
+        return codec_of(dialect).encode(value)
+
+    def process_result_value(self, value, dialect): # Las filas comprimidas se descomprimen recién al pedir el texto (content_text)
+        return CompressedContent(value, codec_of(dialect)) if isinstance(value, bytes) else value
+
+
 class MessageModel(Base): # Define el modelo de mensaje (mapeo objeto-relacional)
     __tablename__ = "messages"     # Nombre de la tabla en la base de datos
+    __table_args__ = (
+        Index("ix_messages_session_timestamp", "session_id", "timestamp", "message_id"), # Lectura por sesión en orden cronológico y paginación por cursor (timestamp, message_id)
+        Index("ix_messages_session_sender_timestamp", "session_id", "sender", "timestamp", "message_id"), # Igual que el anterior pero cubre el filtro por sender
+        Index("ix_messages_word_count", "word_count"), # Filtros por longitud (ej: word_count > N) sin leer la tabla completa
+    )
 
     message_id = Column(String, primary_key=True, index=True)  # message_id: String, clave primaria, con índice para búsquedas rápidas
-    session_id = Column(String, index=True) # session_id: String, con índice para búsquedas por sesión
-    content = Column(String) # content: String, contenido del mensaje (sin longitud máxima definida)
+    session_id = Column(String) # session_id: String, las búsquedas por sesión usan los índices compuestos de __table_args__
+    content = Column(CompressedText) # content: texto del mensaje (sin longitud máxima definida); los contenidos largos se guardan comprimidos
     timestamp = Column(DateTime) # timestamp: DateTime, fecha/hora del mensaje
     sender = Column(String) # sender: String, remitente del mensaje
-    message_metadata = Column(JSON) # message_metadata: JSON, datos adicionales/metadata, JSON permite estructura flexible (diccionario Python)
+    word_count = Column(Integer) # Metadata de las etapas incluidas del pipeline en columnas tipadas: enteros de 1-3 bytes en vez de claves JSON repetidas en cada fila
+    character_count = Column(Integer)
+    is_filtered = Column(Boolean)
+    pii_types = Column(String) # Tipos separados por comas ("" = ninguno)
+    language = Column(String)
+    links = Column(String) # Enlaces separados por espacios ("" = ninguno)
+    processed_at = Column(DateTime)
+    metadata_extra = Column(JSON(none_as_null=True)) # Solo la salida de etapas propias del pipeline; NULL de SQL (no el texto "null") en las demás filas
+
+    @property
+    def message_metadata(self): # Metadata completa como diccionario (misma forma que genera el pipeline)
+        return column_metadata(self)
+
+    @message_metadata.setter
+    def message_metadata(self, metadata): # Permite MessageModel(message_metadata={...})
+        for name, value in metadata_columns(metadata).items():
+            setattr(self, name, value)
+
+class ArchivedSessionModel(Base): # Catálogo de particiones archivadas: en qué meses archivados tiene mensajes cada sesión
+    __tablename__ = "archived_sessions"
+
+    session_id = Column(String, primary_key=True) # Las lecturas de una sesión consultan solo los archivos de sus meses
+    month = Column(String, primary_key=True) # Mes de la partición (YYYY-MM), corresponde a archive/messages_YYYY-MM.db
+    message_count = Column(Integer, nullable=False, default=0) # Agregados de la sesión en el mes (mismas columnas que session_stats): la retención los resta sin leer la partición
+    word_count = Column(Integer, nullable=False, default=0)
+    character_count = Column(Integer, nullable=False, default=0)
+    user_count = Column(Integer, nullable=False, default=0)
+    system_count = Column(Integer, nullable=False, default=0)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+
+class ArchivedMessageModel(Base): # Mensajes archivados que siguen en el índice FTS5: la búsqueda toma de aquí sesión, timestamp y sender
+    __tablename__ = "archived_messages"
+    __table_args__ = (
+        Index("ix_archived_messages_month", "month"), # La retención quita del índice los mensajes del mes eliminado
+    )
+
+    message_id = Column(String, primary_key=True) # Mismo message_id que messages_fts (el trigger de borrado no quita estos mensajes del índice)
+    month = Column(String, nullable=False)
+    session_id = Column(String)
+    timestamp = Column(DateTime)
+    sender = Column(String)
+
+class IdempotencyKeyModel(Base): # Respuestas guardadas por Idempotency-Key (almacén opcional compartido entre procesos)
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True) # Ruta + valor del header Idempotency-Key
+    fingerprint = Column(String) # Hash del cuerpo de la primera petición: la misma clave con otro cuerpo se rechaza
+    status_code = Column(Integer)
+    body = Column(LargeBinary) # Cuerpo de la respuesta tal como se envió
+    media_type = Column(String)
+    headers = Column(JSON) # Headers propios de la respuesta (ej: Location, ETag); content-type y content-length se recalculan
+    expires_at = Column(Float, index=True) # Epoch en segundos; las filas vencidas se purgan periódicamente
+
+class SessionStatsModel(Base): # Agregados por sesión mantenidos en la misma transacción que cada INSERT en messages (lectura O(1) por sesión)
+    __tablename__ = "session_stats"
+    __table_args__ = (
+        Index("ix_session_stats_message_count", "message_count"), # GET /api/sessions?order=messages
+        Index("ix_session_stats_last_timestamp", "last_timestamp"), # GET /api/sessions?order=recent
+    )
+
+    session_id = Column(String, primary_key=True)
+    message_count = Column(Integer, nullable=False, default=0)
+    word_count = Column(Integer, nullable=False, default=0) # Suma de word_count de la metadata del pipeline
+    character_count = Column(Integer, nullable=False, default=0) # Suma de character_count de la metadata del pipeline
+    user_count = Column(Integer, nullable=False, default=0) # Mensajes con sender = "user"
+    system_count = Column(Integer, nullable=False, default=0) # Mensajes con sender = "system"
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+
+class ContentDictionaryModel(Base): # Diccionarios de compresión de messages.content (nunca se modifican: los BLOB guardan el id con que se comprimieron)
+    __tablename__ = "content_dictionaries"
+
+    id = Column(Integer, primary_key=True) # 1-255, primer byte de cada contenido comprimido
+    zdict = Column(LargeBinary, nullable=False)
@@ -0,0 +1,341 @@
+# src/database/partitions.py
+"""Particiones mensuales de messages: archivado de meses fríos y retención
+
+La tabla messages guarda los meses recientes. El archivado mueve un mes completo a archive/messages_YYYY-MM.db,
+un archivo SQLite compacto, de solo lectura, con el contenido y la metadata comprimidos (zlib con un diccionario
+propio de la partición: los mensajes cortos comparten palabras y claves de metadata) y las filas agrupadas
+por sesión; archived_sessions registra qué sesiones tienen mensajes en cada mes archivado.
+Las lecturas por sesión y la exportación combinan la tabla principal con esas particiones.
+La retención elimina particiones completas borrando su archivo, resta de session_stats los agregados que
+archived_sessions guardó al archivar (sin leer la partición) e invalida en el caché las páginas de las sesiones afectadas.
+
+Uso como comando:
+    python -m src.database.partitions list
+    python -m src.database.partitions archive [YYYY-MM ...]   # sin meses: los anteriores a ARCHIVE_AFTER_MONTHS
+    python -m src.database.partitions retention                # elimina los meses anteriores a RETENTION_MONTHS
+"""
+import json # Importa json para la metadata de las filas archivadas
+import os # Importa os para los archivos de las particiones
+import re # Importa re para reconocer los nombres de archivo de las particiones
+import sqlite3 # Las particiones archivadas se leen con conexiones sqlite3 de solo lectura
+import stat # Importa stat para marcar los archivos como de solo lectura
+import sys # Importa sys para leer los argumentos del comando
+import threading # Importa threading: cada hilo usa sus propias conexiones a las particiones
+import zlib # Importa zlib para comprimir contenido y metadata
+from datetime import datetime, timezone # Importa datetime para calcular los meses a archivar o eliminar
+from urllib.parse import quote # Importa quote para abrir las particiones con URI (mode=ro&immutable=1)
+
+from sqlalchemy import delete, select, text # Importa funciones para el catálogo y el borrado de filas archivadas
+
+from src.core.config import settings # Importa la configuración (directorio de las particiones)
+from src.database.compression import content_text # Importa la lectura del texto de messages.content (la partición lo recomprime con su diccionario)
+from src.database.models import METADATA_CODECS, ArchivedSessionModel, MessageModel, column_metadata # Importa el catálogo, la tabla principal y la reconstrucción de la metadata
+from src.database.session_stats import ARCHIVED_UPSERT, aggregate_range, archived_stats, merge, stats_rows, subtract_session_stats # Importa los agregados por sesión del catálogo y su resta de session_stats
+
+PARTITION_RE = re.compile(r"^messages_(\d{4}-\d{2})\.db$")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f" # Formato en que SQLAlchemy guarda DateTime en SQLite (se compara como texto)
+ZDICT_SAMPLE_ROWS = 2000 # Filas del mes usadas para construir el diccionario de compresión
+ZDICT_MAX_BYTES = 32 * 1024 # zlib solo usa los últimos 32 KiB del diccionario
+
+ARCHIVE_DDL = [
+    """CREATE TABLE messages (
+        session_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        sender TEXT,
+        content BLOB,
+        message_metadata BLOB,
+        PRIMARY KEY (session_id, timestamp, message_id)
+    ) WITHOUT ROWID""", # Filas agrupadas físicamente por sesión y en orden cronológico: una sesión se lee de páginas contiguas
+    "CREATE UNIQUE INDEX ix_archive_message_id ON messages (message_id)",
+    "CREATE TABLE archive_info (key TEXT PRIMARY KEY, value BLOB)", # zdict: diccionario de compresión de la partición
+]
+
+
+def month_of(timestamp: datetime) -> str: # Partición (YYYY-MM) que corresponde a un timestamp
+    return timestamp.strftime("%Y-%m")
+
+
+def shift_month(month: str, delta: int) -> str: # Suma delta meses a YYYY-MM
+    year, number = map(int, month.split("-"))
+    index = year * 12 + number - 1 + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+ARCHIVED_MESSAGES_INSERT = text( # timestamp queda como texto, igual que en messages (month_rows no lo convierte)
+    "INSERT OR REPLACE INTO archived_messages (message_id, month, session_id, timestamp, sender) VALUES (:message_id, :month, :session_id, :timestamp, :sender)"
+)
+UNINDEX_MONTH = [
+    text("DELETE FROM messages_fts WHERE rowid IN (SELECT r.fts_rowid FROM archived_messages a JOIN messages_fts_rowids r ON r.message_id = a.message_id WHERE a.month = :month)"),
+    text("DELETE FROM messages_fts_rowids WHERE message_id IN (SELECT message_id FROM archived_messages WHERE month = :month)"),
+    text("DELETE FROM archived_messages WHERE month = :month"),
+]
+
+
+def month_bounds(month: str) -> tuple: # [inicio, fin) del mes en el formato de texto de la columna timestamp
+    return f"{month}-01 00:00:00", f"{shift_month(month, 1)}-01 00:00:00"
+
+
+def build_zdict(samples: list) -> bytes: # Diccionario de compresión a partir de contenidos y metadata de ejemplo
+    return "".join(value for value in samples if value).encode("utf-8")[-ZDICT_MAX_BYTES:]
+
+
+def compress(value, zdict: bytes) -> bytes:
+    if value is None:
+        return None
+    compressor = zlib.compressobj(9, zdict=zdict)
+    return compressor.compress(value.encode("utf-8")) + compressor.flush()
+
+
+def decompress(value: bytes, zdict: bytes) -> str:
+    return None if value is None else zlib.decompressobj(zdict=zdict).decompress(value).decode("utf-8")
+
+
+def month_rows(limit: int = None): # Filas de un mes de la tabla principal; timestamp queda como texto (la partición lo guarda igual)
+    return text(
+        f"SELECT session_id, timestamp, message_id, sender, content, {', '.join(METADATA_CODECS)}, metadata_extra FROM messages "
+        "WHERE timestamp >= :start AND timestamp < :end" + (f" LIMIT {int(limit)}" if limit else "")
+    ).columns(**{name: MessageModel.__table__.c[name].type for name in ("content", "is_filtered", "processed_at", "metadata_extra")})
+
+
+def metadata_json(row): # Metadata de una fila de messages como texto JSON (las particiones la guardan comprimida en una sola columna)
+    metadata = column_metadata(row)
+    return json.dumps(metadata, ensure_ascii=False) if metadata is not None else None
+
+
+def decode_row(row: tuple, zdict: bytes) -> dict: # Fila de una partición -> mismo diccionario que produce la tabla principal
+    session_id, timestamp, message_id, sender, content, metadata = row
+    return {
+        "message_id": message_id,
+        "session_id": session_id,
+        "content": decompress(content, zdict),
+        "timestamp": datetime.fromisoformat(timestamp),
+        "sender": sender,
+        "message_metadata": json.loads(decompress(metadata, zdict)) if metadata is not None else None
+    }
+
+
+class ArchiveStore: # Acceso de solo lectura a las particiones archivadas (una conexión por archivo y por hilo)
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._local = threading.local()
+        self._months = (None, frozenset()) # (mtime del directorio, meses disponibles)
+
+    def path(self, month: str) -> str:
+        return os.path.join(self.directory, f"messages_{month}.db")
+
+    def months(self) -> frozenset: # Meses archivados; el listado se relee solo si el directorio cambió
+        try:
+            version = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return frozenset()
+        if self._months[0] != version:
+            found = (PARTITION_RE.match(name) for name in os.listdir(self.directory))
+            self._months = (version, frozenset(match.group(1) for match in found if match))
+        return self._months[1]
+
+    def _connect(self, month: str) -> tuple: # (conexión, diccionario) del hilo actual para la partición, se renueva si el archivo fue reemplazado
+        path = self.path(month)
+        try:
+            version = os.stat(path).st_mtime_ns
+        except FileNotFoundError: # La retención eliminó la partición
+            return None, None
+        connections = self._local.__dict__.setdefault("connections", {})
+        cached = connections.get(month)
+        if cached is None or cached[0] != version:
+            if cached is not None:
+                cached[1].close()
+            connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro&immutable=1", uri=True) # immutable: sin bloqueos ni lectura del journal
+            zdict = connection.execute("SELECT value FROM archive_info WHERE key = 'zdict'").fetchone()[0]
+            connections[month] = cached = (version, connection, zdict)
+        return cached[1], cached[2]
+
+    def session_rows(self, month: str, session_id: str, limit: int, sender: str = None, after: tuple = None) -> list: # Página de una sesión en la partición, mismo orden y filtros que session_page_query
+        connection, zdict = self._connect(month)
+        if connection is None:
+            return []
+        sql = "SELECT * FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if sender:
+            sql += " AND sender = ?"
+            params.append(sender)
+        if after:
+            sql += " AND (timestamp, message_id) > (?, ?)"
+            params += [after[0].strftime(TIMESTAMP_FORMAT), after[1]]
+        sql += " ORDER BY timestamp, message_id LIMIT ?"
+        params.append(limit)
+        return [decode_row(row, zdict) for row in connection.execute(sql, params)]
+
+    def iter_session(self, month: str, session_id: str, since=None, until=None, sender: str = None): # Todos los mensajes de una sesión en la partición, en orden
+        connection, zdict = self._connect(month)
+        if connection is None:
+            return
+        sql = "SELECT * FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if sender:
+            sql += " AND sender = ?"
+            params.append(sender)
+        if since:
+            sql += " AND timestamp >= ?"
+            params.append(since.strftime(TIMESTAMP_FORMAT))
+        if until:
+            sql += " AND timestamp < ?"
+            params.append(until.strftime(TIMESTAMP_FORMAT))
+        for row in connection.execute(sql + " ORDER BY timestamp, message_id", params):
+            yield decode_row(row, zdict)
+
+    def iter_month(self, month: str): # Todos los mensajes de la partición (índice FTS5 de los meses archivados)
+        connection, zdict = self._connect(month)
+        if connection is None:
+            return
+        for row in connection.execute("SELECT * FROM messages"):
+            yield decode_row(row, zdict)
+
+    def existing_ids(self, month: str, message_ids: list) -> set: # message_id que ya están en la partición
+        connection, _ = self._connect(month)
+        if connection is None or not message_ids:
+            return set()
+        placeholders = ", ".join("?" * len(message_ids))
+        return {row[0] for row in connection.execute(f"SELECT message_id FROM messages WHERE message_id IN ({placeholders})", message_ids)}
+
+
+def archived_months_query(session_id: str): # Meses archivados en los que la sesión tiene mensajes (catálogo en la base principal)
+    return select(ArchivedSessionModel.month).where(ArchivedSessionModel.session_id == session_id).order_by(ArchivedSessionModel.month)
+
+
+def archive_month(engine, store: ArchiveStore, month: str, chunk_size: int = 1000) -> int: # Mueve un mes de messages a su partición, retorna las filas movidas
+    start, end = month_bounds(month)
+    path = store.path(month)
+    tmp = path + ".tmp"
+    os.makedirs(store.directory, exist_ok=True)
+    if os.path.exists(tmp): # Restos de un archivado interrumpido
+        os.remove(tmp)
+
+    message_ids, stats, searchable = [], {}, [] # stats: agregados por sesión de las filas copiadas (se suman al catálogo); searchable: filas de archived_messages
+    target = sqlite3.connect(tmp)
+    try:
+        for statement in ARCHIVE_DDL:
+            target.execute(statement)
+        if os.path.exists(path): # La partición ya existe (mensajes tardíos del mes o archivado interrumpido): se combinan con su mismo diccionario
+            target.execute("ATTACH DATABASE ? AS previous", (path,))
+            target.execute("INSERT INTO messages SELECT * FROM previous.messages")
+            target.execute("INSERT INTO archive_info SELECT * FROM previous.archive_info")
+            target.commit()
+            target.execute("DETACH DATABASE previous")
+            zdict = target.execute("SELECT value FROM archive_info WHERE key = 'zdict'").fetchone()[0]
+        else:
+            with engine.connect() as conn: # Muestra del mes para el diccionario de compresión
+                samples = conn.execute(month_rows(ZDICT_SAMPLE_ROWS), {"start": start, "end": end}).all()
+            zdict = build_zdict([value for row in samples for value in (content_text(row.content), metadata_json(row))])
+            target.execute("INSERT INTO archive_info (key, value) VALUES ('zdict', ?)", (zdict,))
+
+        with engine.connect() as conn: # Lectura por bloques; la tabla principal no se bloquea para escritura
+            result = conn.execution_options(stream_results=True).execute(month_rows(), {"start": start, "end": end})
+            for chunk in result.partitions(chunk_size):
+                target.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)", [
+                    (row.session_id, row.timestamp, row.message_id, row.sender, compress(content_text(row.content), zdict), compress(metadata_json(row), zdict))
+                    for row in chunk
+                ])
+                message_ids += [row.message_id for row in chunk]
+                searchable += [{"message_id": row.message_id, "month": month, "session_id": row.session_id, "timestamp": row.timestamp, "sender": row.sender} for row in chunk]
+                for entry in stats_rows([archived_stats_row(row) for row in chunk]):
+                    merge(stats, entry)
+        target.commit()
+        if not message_ids: # Nada nuevo que archivar
+            return 0
+        target.execute("VACUUM") # Compacta: sin páginas libres y con la tabla reconstruida en orden de sesión
+    finally:
+        target.close()
+        if not message_ids and os.path.exists(tmp):
+            os.remove(tmp)
+
+    os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(tmp, path) # Reemplazo atómico: los lectores ven la partición anterior o la nueva completa
+
+    with engine.begin() as conn: # Catálogo y borrado en la misma transacción; solo se borran las filas copiadas
+        conn.execute(ARCHIVED_UPSERT, [dict(entry, month=month) for entry in stats.values()])
+        conn.execute(ARCHIVED_MESSAGES_INSERT, searchable) # Antes del borrado: el trigger de FTS5 deja estos mensajes en el índice
+        for index in range(0, len(message_ids), chunk_size):
+            conn.execute(delete(MessageModel).where(MessageModel.message_id.in_(message_ids[index:index + chunk_size])))
+    return len(message_ids)
+
+
+def archived_stats_row(row) -> dict: # Fila de month_rows -> lo que stats_rows necesita para los agregados del catálogo
+    return {
+        "session_id": row.session_id,
+        "timestamp": datetime.fromisoformat(row.timestamp),
+        "sender": row.sender,
+        "message_metadata": {"word_count": row.word_count or 0, "character_count": row.character_count or 0}
+    }
+
+
+def drop_month(engine, store: ArchiveStore, month: str, cache=None) -> None: # Elimina una partición completa: el costo depende de las sesiones del catálogo, no de cuántos mensajes tenga
+    start, end = month_bounds(month)
+    with engine.begin() as conn:
+        removed = archived_stats(conn, month) + list(aggregate_range(conn, start, end).values()) # Mensajes archivados y los del mes que aún no se archivaron
+        conn.execute(delete(ArchivedSessionModel).where(ArchivedSessionModel.month == month))
+        for statement in UNINDEX_MONTH: # Los mensajes archivados del mes salen del índice de búsqueda
+            conn.execute(statement, {"month": month})
+        conn.execute(text("DELETE FROM messages WHERE timestamp >= :start AND timestamp < :end"), {"start": start, "end": end})
+        subtract_session_stats(conn, removed) # En la misma transacción que el borrado
+    if os.path.exists(store.path(month)):
+        os.remove(store.path(month))
+    if cache is not None: # Las páginas guardadas incluyen los mensajes eliminados
+        for session_id in {entry["session_id"] for entry in removed}:
+            cache.invalidate_session(session_id)
+
+
+def hot_months(engine, before: str) -> list: # Meses con mensajes en la tabla principal anteriores a before (YYYY-MM)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT substr(timestamp, 1, 7) FROM messages WHERE timestamp < :before ORDER BY 1"
+        ), {"before": f"{before}-01 00:00:00"})
+        return [row[0] for row in rows]
+
+
+def current_month() -> str:
+    return month_of(datetime.now(timezone.utc))
+
+
+def archive_due(engine, store: ArchiveStore, after_months: int) -> dict: # Archiva los meses anteriores a los after_months más recientes
+    cutoff = shift_month(current_month(), -after_months)
+    return {month: archive_month(engine, store, month) for month in hot_months(engine, cutoff)}
+
+
+def apply_retention(engine, store: ArchiveStore, retention_months: int, cache=None) -> list: # Elimina los meses anteriores a los retention_months más recientes
+    if retention_months <= 0:
+        return []
+    cutoff = shift_month(current_month(), -retention_months)
+    expired = sorted({month for month in store.months() if month < cutoff} | set(hot_months(engine, cutoff)))
+    for month in expired:
+        drop_month(engine, store, month, cache)
+    return expired
+
+
+archive_store = ArchiveStore(settings.archive_dir) # Particiones archivadas usadas por los repositorios
+
+
+if __name__ == "__main__":
+    command, months = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else (None, [])
+    if command not in ("list", "archive", "retention"):
+        print(__doc__)
+        sys.exit(1)
+
+    from src.database.database import get_engine
+    from src.database.schema import ensure_schema
+
+    engine = get_engine()
+    ensure_schema(engine)
+    if command == "list":
+        for month in sorted(archive_store.months()):
+            size = os.path.getsize(archive_store.path(month))
+            count = sqlite3.connect(f"file:{quote(os.path.abspath(archive_store.path(month)))}?mode=ro", uri=True).execute("SELECT count(*) FROM messages").fetchone()[0]
+            print(f"{month}\t{count} mensajes\t{size / 1024:.0f} KiB")
+    elif command == "archive":
+        archived = {month: archive_month(engine, archive_store, month) for month in months} if months else archive_due(engine, archive_store, settings.archive_after_months)
+        for month, count in archived.items():
+            print(f"{month}\t{count} mensajes archivados")
+    else:
+        for month in apply_retention(engine, archive_store, settings.retention_months): # Actualiza session_stats; el caché de la API vence por TTL (CACHE_TTL_S)
+            print(f"{month}\teliminado")
@@ -0,0 +1,164 @@
+# src/database/schema.py
+"""Versión del esquema en PRAGMA user_version y migraciones ordenadas
+
+Al iniciar, la aplicación solo lee PRAGMA user_version (una consulta, sin DDL) y aplica las migraciones
+pendientes. Con SCHEMA_AUTO_MIGRATE=false el arranque no modifica la base: falla si el esquema está
+atrasado y las migraciones se aplican antes del despliegue con:
+    python -m src.database.schema
+"""
+import json # Importa json para leer la metadata de las bases anteriores a la versión 3
+import logging # Importa logging para avisar si la base tiene un esquema más nuevo que el código
+
+from sqlalchemy import bindparam, text # Importa text para leer y escribir PRAGMA user_version y bindparam para la conversión de la metadata
+
+from src.database.database import Base # Importa la base de los modelos (metadata de las tablas)
+from src.database import models # Importa los modelos para registrar sus tablas en Base.metadata
+from src.database.fts import create_fts, index_messages, replace_triggers # Importa la creación del índice de texto completo
+
+logger = logging.getLogger(__name__)
+
+
+METADATA_CHUNK_ROWS = 5000 # Filas por bloque al repartir la metadata JSON en columnas (migración 3)
+
+
+def _columns(conn, table: str) -> set: # Columnas actuales de una tabla
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def _create_indexes(conn): # create_all no agrega índices nuevos a tablas existentes (ej: messages.db previo); solo los de columnas que ya existen
+    columns = _columns(conn, "messages")
+    for index in models.MessageModel.__table__.indexes:
+        if {column.name for column in index.columns} <= columns:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _rebuild_session_stats(conn):
+    from src.database.partitions import archive_store # Import diferido: solo al migrar
+    from src.database.session_stats import rebuild_session_stats
+
+    rebuild_session_stats(conn, archive_store)
+
+
+def _baseline(conn): # Versión 1: tablas, índices y FTS5. Es idempotente: las bases creadas antes de versionar el esquema quedan en la versión 1
+    Base.metadata.create_all(bind=conn)
+    _create_indexes(conn)
+    create_fts(conn)
+    index_messages(conn) # Los triggers solo indexan las escrituras nuevas: los mensajes de una base anterior a FTS5 se indexan aquí
+
+
+def _session_stats(conn): # Versión 2: tabla session_stats calculada a partir de los mensajes existentes (incluye los meses archivados)
+    Base.metadata.create_all(bind=conn, tables=[models.SessionStatsModel.__table__])
+    if "message_metadata" not in _columns(conn, "messages"): # Con la metadata aún en JSON se calcula en la versión 3
+        _rebuild_session_stats(conn)
+
+
+def _metadata_columns(conn): # Versión 3: message_metadata (JSON) -> una columna tipada por clave de las etapas incluidas y metadata_extra
+    columns = _columns(conn, "messages")
+    if "message_metadata" not in columns: # Base creada con las columnas tipadas
+        return
+    table = models.MessageModel.__table__
+    names = [*models.METADATA_CODECS, "metadata_extra"]
+    for name in names:
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE messages ADD COLUMN {name} {table.c[name].type.compile(conn.dialect)}"))
+
+    update = text( # Misma conversión que las escrituras de la aplicación (models.metadata_columns)
+        f"UPDATE messages SET {', '.join(f'{name} = :{name}' for name in names)} WHERE rowid = :row"
+    ).bindparams(*(bindparam(name, type_=table.c[name].type) for name in names))
+    last = 0
+    while True: # Por bloques de rowid: la memoria no depende del tamaño de la tabla
+        rows = conn.execute(text(
+            "SELECT rowid, message_metadata FROM messages WHERE rowid > :last AND message_metadata IS NOT NULL ORDER BY rowid LIMIT :limit"
+        ), {"last": last, "limit": METADATA_CHUNK_ROWS}).all()
+        if not rows:
+            break
+        conn.execute(update, [dict(models.metadata_columns(json.loads(metadata)), row=rowid) for rowid, metadata in rows])
+        last = rows[-1][0]
+
+    conn.execute(text("ALTER TABLE messages DROP COLUMN message_metadata")) # SQLite reescribe las filas sin la columna
+    _create_indexes(conn) # ix_messages_word_count, después de llenar la columna
+    if conn.execute(text("SELECT 1 FROM session_stats LIMIT 1")).first() is None: # La versión 2 no pudo calcularla con la metadata en JSON
+        _rebuild_session_stats(conn)
+
+
+def _content_compression(conn): # Versión 4: diccionarios de compresión y triggers de FTS5 que indexan message_text(content)
+    Base.metadata.create_all(bind=conn, tables=[models.ContentDictionaryModel.__table__])
+    replace_triggers(conn) # Los contenidos existentes siguen en texto hasta python -m src.database.compression compact
+
+
+def _archived_session_stats(conn): # Versión 5: agregados por sesión en archived_sessions, calculados una vez leyendo las particiones existentes
+    from src.database.partitions import archive_store # Import diferido: solo al migrar
+    from src.database.session_stats import ARCHIVED_UPSERT, COUNTERS, stats_rows
+
+    table = models.ArchivedSessionModel.__table__
+    columns = _columns(conn, "archived_sessions")
+    for name in (*COUNTERS, "first_timestamp", "last_timestamp"):
+        if name not in columns:
+            default = " NOT NULL DEFAULT 0" if name in COUNTERS else ""
+            conn.execute(text(f"ALTER TABLE archived_sessions ADD COLUMN {name} {table.c[name].type.compile(conn.dialect)}{default}"))
+    if not columns >= set(COUNTERS): # Catálogo anterior: los agregados salen de las particiones
+        for month, session_id in conn.execute(text("SELECT month, session_id FROM archived_sessions")).all():
+            entries = stats_rows(archive_store.iter_session(month, session_id))
+            conn.execute(text("DELETE FROM archived_sessions WHERE month = :month AND session_id = :session_id"), {"month": month, "session_id": session_id})
+            if entries: # Sin partición (archivo eliminado) la fila del catálogo no se conserva
+                conn.execute(ARCHIVED_UPSERT, [dict(entries[0], month=month)])
+
+
+def _archived_search(conn): # Versión 6: los meses archivados siguen en la búsqueda (archived_messages y trigger de borrado condicionado)
+    from src.database.fts import index_archive # Import diferido: solo al migrar
+    from src.database.partitions import archive_store
+
+    Base.metadata.create_all(bind=conn, tables=[models.ArchivedMessageModel.__table__])
+    replace_triggers(conn)
+    index_archive(conn, archive_store) # Los meses archivados antes de esta versión habían salido del índice
+
+
+def _idempotency_headers(conn): # Versión 7: headers de la respuesta guardada por Idempotency-Key (se repiten con ella)
+    if "headers" not in _columns(conn, "idempotency_keys"):
+        conn.execute(text("ALTER TABLE idempotency_keys ADD COLUMN headers JSON"))
+
+
+MIGRATIONS = [ # MIGRATIONS[i] lleva el esquema de la versión i a la i + 1 (solo se agregan al final)
+    _baseline,
+    _session_stats,
+    _metadata_columns,
+    _content_compression,
+    _archived_session_stats,
+    _archived_search,
+    _idempotency_headers,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS) # Versión que espera este código
+
+
+def schema_version(conn) -> int: # Versión guardada en la base (0 = base nueva o anterior al versionado)
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def ensure_schema(engine, migrate: bool = True) -> list: # Aplica las migraciones pendientes, retorna las versiones aplicadas
+    with engine.connect() as conn:
+        current = schema_version(conn)
+    if current > SCHEMA_VERSION: # Otra versión del código ya migró la base (ej: despliegue gradual)
+        logger.warning("La base de datos tiene el esquema %s, este código espera el %s", current, SCHEMA_VERSION)
+        return []
+    if current == SCHEMA_VERSION:
+        return []
+    if not migrate:
+        raise RuntimeError(f"Esquema de base de datos atrasado ({current} < {SCHEMA_VERSION}): ejecutar python -m src.database.schema")
+
+    applied = []
+    for version in range(current, SCHEMA_VERSION):
+        with engine.begin() as conn: # Cada migración y su número de versión en la misma transacción
+            if schema_version(conn) > version: # Otro proceso la aplicó mientras tanto
+                continue
+            MIGRATIONS[version](conn)
+            conn.execute(text(f"PRAGMA user_version = {version + 1}"))
+        applied.append(version + 1)
+    return applied
+
+
+if __name__ == "__main__":
+    from src.database.database import get_engine, DATABASE_URL
+
+    applied = ensure_schema(get_engine())
+    print(f"{DATABASE_URL}: esquema {SCHEMA_VERSION}" + (f" (migraciones aplicadas: {applied})" if applied else " (sin cambios)"))
@@ -0,0 +1,161 @@
+# src/database/session_stats.py
+"""Estadísticas por sesión (tabla session_stats)
+
+Los repositorios actualizan session_stats en la misma transacción que el INSERT de los mensajes, a partir
+de la metadata del pipeline (word_count, character_count). Archivar un mes no cambia las estadísticas
+(los mensajes siguen siendo de la sesión) pero guarda en archived_sessions los agregados de cada sesión en
+ese mes; la retención los resta al eliminar el mes, sin recorrer los mensajes.
+
+Uso como comando (recalcula la tabla desde messages y las particiones archivadas):
+    python -m src.database.session_stats rebuild
+"""
+import sys # Importa sys para leer los argumentos del comando
+
+from sqlalchemy import bindparam, delete, select, text # Importa funciones para el upsert (INSERT ... ON CONFLICT DO UPDATE) y la reconstrucción
+
+from src.database.models import ArchivedSessionModel, MessageModel, SessionStatsModel # Importa la tabla principal, el catálogo de particiones y la de estadísticas
+
+COUNTERS = ("message_count", "word_count", "character_count", "user_count", "system_count")
+
+
+def stats_rows(rows) -> list: # Agrega filas de messages (diccionarios) en una fila de session_stats por sesión
+    stats = {}
+    for row in rows:
+        metadata = row.get("message_metadata") or {}
+        entry = stats.get(row["session_id"])
+        if entry is None:
+            entry = stats[row["session_id"]] = dict(
+                session_id=row["session_id"], first_timestamp=row["timestamp"], last_timestamp=row["timestamp"], **dict.fromkeys(COUNTERS, 0)
+            )
+        entry["message_count"] += 1
+        entry["word_count"] += metadata.get("word_count", 0)
+        entry["character_count"] += metadata.get("character_count", 0)
+        entry["user_count" if row["sender"] == "user" else "system_count"] += 1
+        entry["first_timestamp"] = min(entry["first_timestamp"], row["timestamp"])
+        entry["last_timestamp"] = max(entry["last_timestamp"], row["timestamp"])
+    return list(stats.values())
+
+
+def upsert_statement(): # Suma los contadores y amplía el rango de timestamps de cada sesión (compartido por los repositorios síncrono y asíncrono)
+    return UPSERT
+
+
+def additive_upsert(table: str, keys: tuple): # INSERT ... ON CONFLICT que suma los contadores y amplía el rango de timestamps de la fila existente
+    columns = (*keys, *COUNTERS, "first_timestamp", "last_timestamp")
+    return text(f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES ({", ".join(":" + name for name in columns)})
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+            {", ".join(f"{name} = {name} + excluded.{name}" for name in COUNTERS)},
+            first_timestamp = min(first_timestamp, excluded.first_timestamp),
+            last_timestamp = max(last_timestamp, excluded.last_timestamp)
+    """).bindparams(
+        bindparam("first_timestamp", type_=SessionStatsModel.first_timestamp.type), # Mismo formato de texto que la columna DateTime
+        bindparam("last_timestamp", type_=SessionStatsModel.last_timestamp.type)
+    )
+
+
+# SQL textual: SQLAlchemy 2.0 no guarda en caché la compilación de INSERT ... ON CONFLICT DO UPDATE (costaba ~0,45 ms por escritura)
+UPSERT = additive_upsert("session_stats", ("session_id",))
+ARCHIVED_UPSERT = additive_upsert("archived_sessions", ("session_id", "month")) # Agregados de una sesión en un mes archivado (archivar de nuevo suma los mensajes tardíos)
+
+SUBTRACT = text(f"""
+    UPDATE session_stats SET
+        {", ".join(f"{name} = {name} - :{name}" for name in COUNTERS)},
+        first_timestamp = (SELECT min(bound) FROM (
+            SELECT min(timestamp) AS bound FROM messages WHERE session_id = :session_id
+            UNION ALL SELECT min(first_timestamp) FROM archived_sessions WHERE session_id = :session_id
+        )),
+        last_timestamp = (SELECT max(bound) FROM (
+            SELECT max(timestamp) AS bound FROM messages WHERE session_id = :session_id
+            UNION ALL SELECT max(last_timestamp) FROM archived_sessions WHERE session_id = :session_id
+        ))
+    WHERE session_id = :session_id
+""") # Los límites se vuelven a leer del índice (session_id, timestamp) y del catálogo: O(log n) por sesión
+
+
+def subtract_session_stats(conn, entries: list) -> int: # Resta de session_stats los agregados de mensajes eliminados (ya borrados de messages y del catálogo), retorna cuántas sesiones cambiaron
+    if not entries:
+        return 0
+    conn.execute(SUBTRACT, [{name: entry[name] for name in ("session_id", *COUNTERS)} for entry in entries])
+    conn.execute(delete(SessionStatsModel).where(
+        SessionStatsModel.session_id.in_({entry["session_id"] for entry in entries}), SessionStatsModel.message_count <= 0
+    ))
+    return len({entry["session_id"] for entry in entries})
+
+
+def archived_stats(conn, month: str) -> list: # Agregados por sesión guardados al archivar el mes
+    columns = [ArchivedSessionModel.__table__.c[name] for name in ("session_id", *COUNTERS, "first_timestamp", "last_timestamp")]
+    return [dict(row) for row in conn.execute(select(*columns).where(ArchivedSessionModel.month == month)).mappings()]
+
+
+def aggregate_messages(conn, after_rowid: int = 0) -> dict: # Estadísticas de las filas de messages con rowid > after_rowid, por sesión
+    return aggregate(conn, "rowid > :after_rowid", {"after_rowid": after_rowid})
+
+
+def aggregate_range(conn, start: str, end: str) -> dict: # Estadísticas de las filas de messages con timestamp en [start, end), por sesión
+    return aggregate(conn, "timestamp >= :start AND timestamp < :end", {"start": start, "end": end})
+
+
+def aggregate(conn, where: str, params: dict) -> dict:
+    result = conn.execute(text(f"""
+        SELECT session_id,
+               count(*) AS message_count,
+               coalesce(sum(word_count), 0) AS word_count,
+               coalesce(sum(character_count), 0) AS character_count,
+               sum(sender = 'user') AS user_count,
+               sum(sender <> 'user') AS system_count,
+               min(timestamp) AS first_timestamp,
+               max(timestamp) AS last_timestamp
+        FROM messages
+        WHERE {where}
+        GROUP BY session_id
+    """).columns(first_timestamp=MessageModel.timestamp.type, last_timestamp=MessageModel.timestamp.type), params)
+    return {row["session_id"]: dict(row) for row in result.mappings()}
+
+
+def add_new_messages(conn, after_rowid: int) -> int: # Suma a session_stats los mensajes con rowid > after_rowid (importación masiva), retorna cuántas sesiones cambiaron
+    stats = aggregate_messages(conn, after_rowid)
+    if stats:
+        conn.execute(UPSERT, list(stats.values()))
+    return len(stats)
+
+
+def rebuild_session_stats(conn, archive=None) -> int: # Recalcula todas las sesiones dentro de la transacción de conn, retorna cuántas quedaron
+    stats = aggregate_messages(conn)
+
+    for month in sorted(archive.months()) if archive is not None else (): # Los meses archivados se recorren fila a fila (contenido comprimido)
+        for session_id in conn.scalars(text("SELECT session_id FROM archived_sessions WHERE month = :month"), {"month": month}):
+            for entry in stats_rows(archive.iter_session(month, session_id)):
+                merge(stats, entry)
+
+    conn.execute(delete(SessionStatsModel))
+    if stats:
+        conn.execute(SessionStatsModel.__table__.insert(), list(stats.values()))
+    return len(stats)
+
+
+def merge(stats: dict, entry: dict): # Suma entry a las estadísticas acumuladas de su sesión
+    current = stats.get(entry["session_id"])
+    if current is None:
+        stats[entry["session_id"]] = entry
+        return
+    for name in COUNTERS:
+        current[name] += entry[name]
+    current["first_timestamp"] = min(current["first_timestamp"], entry["first_timestamp"])
+    current["last_timestamp"] = max(current["last_timestamp"], entry["last_timestamp"])
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print(__doc__)
+        sys.exit(1)
+
+    from src.database.database import get_engine, DATABASE_URL
+    from src.database.partitions import archive_store
+    from src.database.schema import ensure_schema
+
+    engine = get_engine()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        print(f"{rebuild_session_stats(conn, archive_store)} sesiones recalculadas en {DATABASE_URL}")
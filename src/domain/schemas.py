@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Literal
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 
 class MessageSchema(BaseModel):
     message_id: str
@@ -8,3 +8,110 @@ class MessageSchema(BaseModel):
     content: str
     timestamp: datetime
     sender: Literal["user", "system"]
+
+class MessageBatchSchema(BaseModel): # Lote de mensajes para POST /api/messages/batch
+    messages: List[Dict[str, Any]] # Cada elemento se valida individualmente contra MessageSchema para reportar errores por mensaje
+
+class ValidMessageSchema(MessageSchema): # MessageSchema con las reglas de negocio de ValidationService (contenido no vacío): validarlo una vez basta
+    content: str = Field(min_length=1)
+
+BatchItem = Annotated[Union[ValidMessageSchema, Any], Field(union_mode="left_to_right")] # Elemento de lote: ValidMessageSchema si es válido, si no tal como llegó (para reportar su error)
+
+class RawBatchSchema(BaseModel): # Cuerpo de POST /api/messages/batch validado directamente desde los bytes (ValidationService.parse_batch)
+    messages: List[BatchItem]
+
+class MessageMetadataSchema(BaseModel): # Metadata generada por el pipeline de procesamiento
+    model_config = ConfigDict(extra="allow") # Etapas adicionales del pipeline pueden agregar campos
+
+    word_count: int
+    character_count: int
+    processed_at: str
+
+class MessageResponseSchema(BaseModel): # Mensaje tal como lo devuelve la API
+    message_id: str
+    session_id: str
+    content: str
+    timestamp: datetime
+    sender: Literal["user", "system"]
+    metadata: Optional[MessageMetadataSchema] = Field(
+        default=None,
+        validation_alias=AliasChoices("metadata", "message_metadata") # La capa de servicio usa el nombre de la columna (message_metadata)
+    )
+
+class MessageEnvelope(BaseModel): # Respuesta de POST /api/messages
+    status: Literal["success"]
+    data: MessageResponseSchema
+
+class PaginationSchema(BaseModel):
+    limit: int
+    offset: Optional[int]
+    has_more: bool
+    next_cursor: Optional[str]
+
+class MessagePageSchema(BaseModel):
+    session_id: str
+    messages: List[MessageResponseSchema]
+    pagination: PaginationSchema
+
+class MessagePageEnvelope(BaseModel): # Respuesta de GET /api/messages/{session_id}
+    status: Literal["success"]
+    data: MessagePageSchema
+
+class BatchItemResultSchema(BaseModel): # Resultado de un mensaje dentro de un lote
+    index: int
+    message_id: Optional[Any] # Tal como llegó en la petición (puede ser inválido)
+    status: Literal["created", "duplicate", "validation_error"]
+    error: Optional[str]
+
+class BatchResultSchema(BaseModel):
+    total: int
+    created: int
+    failed: int
+    results: List[BatchItemResultSchema]
+
+class BatchEnvelope(BaseModel): # Respuesta de POST /api/messages/batch
+    status: Literal["success"]
+    data: BatchResultSchema
+
+class SearchResultSchema(BaseModel): # Un resultado de GET /api/messages/search
+    message_id: str
+    session_id: str
+    timestamp: datetime
+    sender: Literal["user", "system"]
+    snippet: str # Fragmento del contenido con las coincidencias entre [corchetes]
+    rank: float # Puntaje BM25 (menor = más relevante)
+
+class SearchPaginationSchema(BaseModel):
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str]
+
+class SearchPageSchema(BaseModel):
+    query: str
+    results: List[SearchResultSchema]
+    pagination: SearchPaginationSchema
+
+class SearchEnvelope(BaseModel): # Respuesta de GET /api/messages/search
+    status: Literal["success"]
+    data: SearchPageSchema
+
+class SessionStatsSchema(BaseModel): # Estadísticas de una sesión (tabla session_stats)
+    session_id: str
+    message_count: int
+    word_count: int
+    character_count: int
+    by_sender: Dict[Literal["user", "system"], int]
+    first_timestamp: Optional[datetime]
+    last_timestamp: Optional[datetime]
+
+class SessionStatsEnvelope(BaseModel): # Respuesta de GET /api/sessions/{session_id}/stats
+    status: Literal["success"]
+    data: SessionStatsSchema
+
+class SessionListSchema(BaseModel):
+    order: Literal["messages", "recent"]
+    sessions: List[SessionStatsSchema]
+
+class SessionListEnvelope(BaseModel): # Respuesta de GET /api/sessions
+    status: Literal["success"]
+    data: SessionListSchema
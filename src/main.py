@@ -1,11 +1,56 @@
+from contextlib import asynccontextmanager # Importa asynccontextmanager para el ciclo de vida (lifespan) de la aplicación
 from fastapi import FastAPI # Importa FastAPI para crear la aplicación web
-from src.api.endpoints import messages, health # Importa los routers (conjuntos de endpoints) de mensajes y salud
-from src.database.database import engine, Base # Importa engine (conexión a DB) y Base (base para modelos SQLAlchemy)
-from src.database import models # Importa modelos para que SQLAlchemy los registre (aunque no se usan directamente)
+from anyio import to_thread # Importa to_thread para ajustar el pool de hilos de los endpoints síncronos
+from src.core.config import Settings, settings # Importa la configuración de la aplicación
+from src.api.responses import DefaultJSONResponse # Importa la clase de respuesta JSON por defecto (orjson si está instalado)
+from src.api.middleware import MetricsMiddleware, ProfilingMiddleware # Importa los middlewares de latencia por ruta y de perfilado
+from src.api.endpoints import messages, stream, sessions, health, metrics # Importa los routers (conjuntos de endpoints) de mensajes, streaming, sesiones, salud y métricas
+from src.services import write_behind # Importa la cola de escritura opcional (group commit)
+from src.services import duplicate_guard # Importa el guard de message_id duplicados (se precarga al iniciar)
+from src.services import pubsub # Importa el hub de suscriptores de SSE/WebSocket
+from src.services import processing_pipeline # Importa el pipeline global (su pool de procesos se detiene al apagar)
+from src.repositories import cache # Importa el caché de páginas (la cola de escritura lo invalida)
+from src.repositories import idempotency # Importa el almacén de respuestas por Idempotency-Key
+from src.database import database # Importa el engine y la fábrica de sesiones, que se crean en el primer uso
+from src.database.schema import ensure_schema # Importa la verificación versionada del esquema (PRAGMA user_version)
+from src.database import partitions # Importa las particiones archivadas (la cola de escritura detecta duplicados en ellas)
 
-app = FastAPI(title="API PARA NEQUI", debug=True) # Crea la aplicación FastAPI principal, title: Nombre de la API en documentación, debug: True solo para desarrollo, muestra errores detallados
 
-Base.metadata.create_all(bind=engine) # Crea todas las tablas en la base de datos basadas en los modelos definidos, Se ejecuta al iniciar la aplicación. En producción usar migraciones (Alembic)
+def create_app(app_settings: Settings = settings) -> FastAPI: # Crea la aplicación; importar este módulo no abre la base de datos
+    # app_settings cubre la base de datos (URL, pool y PRAGMA), los hilos, la cola de escritura, el esquema, el caché, el guard, la idempotencia
+    # y el hub de streaming; el resto (ej: BATCH_MAX_ITEMS, DB_ASYNC, perfilado, particiones, compresión) sale de src.core.config.settings
+    database.configure(app_settings.database_url, app_settings)
+    if app_settings is not settings: # Los componentes globales se crearon al importar con la configuración del entorno
+        cache.set_message_cache(cache.build_message_cache(app_settings))
+        duplicate_guard.set_duplicate_guard(duplicate_guard.build_duplicate_guard(app_settings))
+        pubsub.set_session_hub(pubsub.SessionHub(app_settings.stream_buffer_size))
 
-app.include_router(messages.router) # Registra los grupos de endpoints en la aplicación, Todas las rutas de messages.py estarán bajo /api/messages
-app.include_router(health.router) # Rutas de health para monitoreo
+    @asynccontextmanager
+    async def lifespan(app: FastAPI): # Arranque y apagado (uvicorn, TestClient usado con "with" o lifespan_context en los benchmarks)
+        to_thread.current_default_thread_limiter().total_tokens = app_settings.threadpool_size # Cuántos endpoints síncronos pueden ejecutarse a la vez (por defecto anyio usa 40)
+        ensure_schema(database.get_engine(), migrate=app_settings.schema_auto_migrate) # Con el esquema al día solo lee PRAGMA user_version
+        if app_settings is not settings: # Con la configuración del entorno el almacén se crea en el primer uso
+            idempotency.set_idempotency_store(idempotency.build_idempotency_store(database.get_engine(), app_settings))
+        write_behind.start_write_behind(app_settings, database.get_sessionmaker(), cache.message_cache, partitions.archive_store) # Hilo escritor si WRITE_BEHIND_ENABLED está activo
+        if duplicate_guard.duplicate_guard is not None: # Carga en segundo plano los message_id existentes en el filtro de Bloom
+            duplicate_guard.duplicate_guard.start_warming(database.get_sessionmaker())
+        try:
+            yield
+        finally:
+            write_behind.stop_write_behind() # Escribe los mensajes pendientes antes de apagar
+            processing_pipeline.pipeline.shutdown() # Termina los procesos del pool si alguna etapa lo usó
+
+    app = FastAPI(title="API PARA NEQUI", debug=True, default_response_class=DefaultJSONResponse, lifespan=lifespan) # title: Nombre de la API en documentación, debug: True solo para desarrollo, muestra errores detallados, default_response_class: serialización con orjson cuando está disponible
+
+    app.include_router(messages.router) # Registra los grupos de endpoints en la aplicación, Todas las rutas de messages.py estarán bajo /api/messages
+    app.include_router(stream.router) # SSE y WebSocket con los mensajes nuevos de una sesión
+    app.include_router(sessions.router) # Estadísticas por sesión
+    app.include_router(health.router) # Rutas de health para monitoreo
+    app.include_router(metrics.router) # /metrics en formato Prometheus
+
+    app.add_middleware(ProfilingMiddleware) # Perfil cProfile de peticiones marcadas o muestreadas (PROFILE_TOKEN / PROFILE_SAMPLE_RATE)
+    app.add_middleware(MetricsMiddleware) # Latencia de cada petición por ruta (incluye el costo del perfilado)
+    return app
+
+
+app = create_app() # Aplicación usada por uvicorn (uvicorn src.main:app)
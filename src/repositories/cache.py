@@ -0,0 +1,140 @@
+# src/repositories/cache.py
+import json # Importa json para estimar el tamaño en bytes de cada entrada
+import threading # Importa threading: el caché se comparte entre los hilos del pool
+import time # Importa time para el vencimiento (TTL) de las entradas
+from collections import OrderedDict # Mantiene el orden de uso para desalojar la entrada menos reciente (LRU)
+from src.core.config import Settings, settings # Importa la configuración del caché
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer los contadores del caché
+
+
+class CacheBackend: # Interfaz de caché para las páginas de sesión; permite conectar un caché externo (ej: Redis)
+
+    def get(self, key): # Retorna el valor guardado o None
+        raise NotImplementedError
+
+    def generation(self, session_id: str) -> int: # Marca que el lector toma antes de consultar la base; set la compara para no guardar una página vieja
+        return 0
+
+    def set(self, key, value, session_id: str, generation: int = None): # Guarda un valor asociado a una sesión; se descarta si la sesión se invalidó después de generation
+        raise NotImplementedError
+
+    def invalidate_session(self, session_id: str): # Elimina todas las entradas de una sesión
+        raise NotImplementedError
+
+    def stats(self) -> dict: # Contadores de uso
+        return {}
+
+
+class LRUCache(CacheBackend): # Caché en proceso con TTL y límite de tamaño en bytes
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 10.0, max_generations: int = 100_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (valor, session_id, tamaño, vence_en)
+        self._by_session = {} # session_id -> claves, para invalidar solo esa sesión
+        self._clock = 0 # Se incrementa en cada invalidación
+        self._invalidated = OrderedDict() # session_id -> valor de _clock de su última invalidación (las más antiguas primero)
+        self._floor = 0 # Mayor valor olvidado de _invalidated: una sesión ausente se considera invalidada en _floor
+        self.max_generations = max_generations # Sesiones recordadas en _invalidated (acota la memoria)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[3] < time.monotonic(): # Vencida por TTL
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) # Marca como usada recientemente
+            self.hits += 1
+            return entry[0]
+
+    def generation(self, session_id: str) -> int:
+        return self._clock
+
+    def set(self, key, value, session_id: str, generation: int = None):
+        size = len(json.dumps(value, default=str)) # Aproximación del tamaño de la entrada
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and self._invalidated.get(session_id, self._floor) > generation: # Un escritor invalidó la sesión mientras se leía la página
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, session_id, size, time.monotonic() + self.ttl)
+            self._by_session.setdefault(session_id, set()).add(key)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes: # Desaloja las entradas menos usadas hasta respetar el límite
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_session(self, session_id: str):
+        with self._lock:
+            self._clock += 1 # Siempre, aunque no haya entradas: puede haber una lectura en curso
+            self._invalidated[session_id] = self._clock
+            self._invalidated.move_to_end(session_id)
+            if len(self._invalidated) > self.max_generations:
+                _, self._floor = self._invalidated.popitem(last=False)
+            keys = self._by_session.get(session_id)
+            if keys:
+                for key in list(keys):
+                    self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _remove(self, key): # Elimina una entrada (se llama con el lock tomado)
+        value, session_id, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._by_session.get(session_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_session[session_id]
+
+
+def build_message_cache(app_settings: Settings = settings): # Caché según CACHE_ENABLED (None = desactivado)
+    return LRUCache(app_settings.cache_max_bytes, app_settings.cache_ttl_s) if app_settings.cache_enabled else None
+
+
+message_cache = build_message_cache() # Caché global de páginas de sesión (None = desactivado)
+
+
+def set_message_cache(backend: CacheBackend): # Reemplaza el caché global (ej: por un CacheBackend externo)
+    global message_cache
+    message_cache = backend
+
+
+def cache_events() -> dict: # Contadores del caché global (métrica message_cache_events_total)
+    if message_cache is None:
+        return {}
+    stats = message_cache.stats()
+    return {(event, ): stats[event] for event in ("hits", "misses", "evictions", "invalidations") if event in stats}
+
+
+REGISTRY.register(Gauge("message_cache_events_total", "Eventos del caché de páginas de sesión", ("event",), callback=cache_events, type="counter"))
+REGISTRY.register(Gauge(
+    "message_cache_bytes", "Tamaño aproximado del caché de páginas de sesión",
+    callback=lambda: {(): message_cache.stats().get("bytes", 0)} if message_cache is not None else {}
+))
@@ -0,0 +1,143 @@
+# src/repositories/idempotency.py
+import threading # Importa threading: el almacén se comparte entre los hilos del pool
+import time # Importa time para el vencimiento (TTL) de las respuestas
+from collections import OrderedDict, namedtuple # OrderedDict para desalojar la respuesta menos reciente (LRU)
+
+from sqlalchemy import delete, select # Importa funciones para la tabla idempotency_keys
+from sqlalchemy.dialects.sqlite import insert # INSERT ... ON CONFLICT: gana la primera respuesta vigente
+
+from src.core.config import Settings, settings # Importa la configuración del almacén
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer los contadores
+from src.database.database import get_engine # Importa el engine (se crea al primer uso) para la tabla opcional
+from src.database.models import IdempotencyKeyModel # Importa el modelo de la tabla opcional
+
+StoredResponse = namedtuple("StoredResponse", "fingerprint status_code body media_type headers", defaults=(None,)) # Respuesta guardada, se repite byte a byte con sus headers
+
+
+class IdempotencyStore: # Interfaz del almacén de respuestas por Idempotency-Key
+    blocking = False # True: get/set hacen E/S y se llaman desde el pool de hilos
+
+    def get(self, key: str): # Retorna la StoredResponse vigente o None
+        raise NotImplementedError
+
+    def set(self, key: str, response: StoredResponse): # Guarda la respuesta (si ya existía una se conserva la primera)
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryIdempotencyStore(IdempotencyStore): # Almacén en proceso con TTL y límite de tamaño en bytes
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 86400.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (StoredResponse, tamaño, vence_en)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, response: StoredResponse, ttl: float = None):
+        size = len(key) + len(response.fingerprint) + len(response.body) + sum(len(name) + len(value) for name, value in (response.headers or {}).items()) + 64 # Tamaño aproximado de la entrada
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] >= time.monotonic(): # Se conserva la primera respuesta vigente
+                    return
+                self._remove(key)
+            self._entries[key] = (response, size, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._bytes += size
+            while self._bytes > self.max_bytes: # Desaloja las respuestas menos usadas hasta respetar el límite
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str): # Se llama con el lock tomado
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SQLiteIdempotencyStore(IdempotencyStore): # Memoria delante de la tabla idempotency_keys: los reintentos que llegan a otro proceso también se repiten
+    blocking = True
+
+    def __init__(self, engine, memory: MemoryIdempotencyStore, ttl: float = 86400.0, purge_every: int = 1000):
+        self.engine = engine
+        self.memory = memory
+        self.ttl = ttl
+        self.purge_every = purge_every # Cada cuántas escrituras se borran las filas vencidas
+        self._writes = 0
+
+    def get(self, key: str):
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+        with self.engine.connect() as conn:
+            row = conn.execute(select(IdempotencyKeyModel).where(IdempotencyKeyModel.key == key)).first()
+        if row is None or row.expires_at < time.time():
+            return None
+        response = StoredResponse(row.fingerprint, row.status_code, row.body, row.media_type, row.headers)
+        self.memory.set(key, response, ttl=row.expires_at - time.time()) # Mismo vencimiento que la fila
+        return response
+
+    def set(self, key: str, response: StoredResponse):
+        self.memory.set(key, response)
+        self._writes += 1
+        now = time.time()
+        values = {"key": key, "expires_at": now + self.ttl, **response._asdict()}
+        statement = insert(IdempotencyKeyModel).values(values)
+        statement = statement.on_conflict_do_update( # Solo reemplaza una fila vencida que aún no se purgó
+            index_elements=["key"], set_={name: statement.excluded[name] for name in values if name != "key"},
+            where=IdempotencyKeyModel.expires_at < now
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+            if self._writes % self.purge_every == 0:
+                conn.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.expires_at < time.time()))
+
+    def stats(self) -> dict:
+        return self.memory.stats()
+
+
+def build_idempotency_store(engine=None, app_settings: Settings = settings) -> IdempotencyStore: # Almacén según IDEMPOTENCY_SQLITE
+    memory = MemoryIdempotencyStore(app_settings.idempotency_max_bytes, app_settings.idempotency_ttl_s)
+    if app_settings.idempotency_sqlite:
+        return SQLiteIdempotencyStore(engine or get_engine(), memory, app_settings.idempotency_ttl_s)
+    return memory
+
+
+idempotency_store = None # Almacén global usado por POST /api/messages; se crea en el primer uso (con IDEMPOTENCY_SQLITE abre el engine)
+
+
+def get_idempotency_store() -> IdempotencyStore: # Almacén global, creado al usarlo: importar el módulo no abre la base de datos
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = build_idempotency_store()
+    return idempotency_store
+
+
+def set_idempotency_store(store: IdempotencyStore): # Reemplaza el almacén global (ej: create_app con otra configuración)
+    global idempotency_store
+    idempotency_store = store
+
+
+REGISTRY.register(Gauge(
+    "idempotency_events_total", "Consultas al almacén de Idempotency-Key por resultado", ("event",), type="counter",
+    callback=lambda: {(event, ): value for event, value in idempotency_store.stats().items() if event in ("hits", "misses", "evictions")} if idempotency_store is not None else {}
+))
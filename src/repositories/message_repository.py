@@ -1,18 +1,186 @@
-from sqlalchemy.exc import IntegrityError # Importa IntegrityError para capturar errores de restricciones de BD
-from src.database.models import MessageModel # Importa el modelo SQLAlchemy para la tabla messages
+import asyncio # Importa asyncio para leer las particiones archivadas fuera del event loop
+import heapq # Importa heapq para combinar en orden las filas de varias particiones
+from itertools import islice # Importa islice para aplicar offset y limit a las filas combinadas
+from sqlalchemy import select, text, tuple_ # Importa select y tuple_ para consultas con paginación por cursor, text para la búsqueda FTS5
+from sqlalchemy.dialects.sqlite import insert # INSERT específico de SQLite (soporta ON CONFLICT DO NOTHING y RETURNING)
+from sqlalchemy.exc import IntegrityError, OperationalError # Importa IntegrityError para capturar errores de restricciones de BD, OperationalError para consultas FTS5 inválidas
+from src.core.config import settings # Importa la configuración (tamaño de página de los INSERT por lotes)
+from src.database.compression import content_text # Importa la lectura del texto de messages.content (descomprime solo al armar la respuesta)
+from src.database.models import MessageModel, SessionStatsModel, column_metadata, metadata_columns # Importa los modelos SQLAlchemy de las tablas messages y session_stats y la conversión de la metadata a columnas
+from src.database.session_stats import stats_rows, upsert_statement as stats_upsert_statement # Importa la actualización incremental de session_stats
+from src.database.partitions import archived_months_query, month_of # Importa el catálogo y el enrutamiento por mes de las particiones archivadas
+from src.core.metrics import instrument # Importa el hook de tiempos por capa
+
+
+MESSAGE_FIELDS = ("message_id", "session_id", "content", "timestamp", "sender")
+
+
+def storage_row(row: dict) -> dict: # Diccionario de la capa de servicio -> columnas de messages (la metadata se reparte en columnas tipadas)
+    stored = {name: row[name] for name in MESSAGE_FIELDS}
+    stored.update(metadata_columns(row.get("message_metadata")))
+    return stored
+
+
+def message_row(row) -> dict: # Fila de messages -> diccionario de la capa de servicio (con message_metadata reconstruida)
+    message = {name: getattr(row, name) for name in MESSAGE_FIELDS}
+    message["content"] = content_text(message["content"])
+    message["message_metadata"] = column_metadata(row)
+    return message
+
+
+def insert_many_statement(): # INSERT multi-fila compartido por los repositorios síncrono y asíncrono
+    return ( # Los duplicados se ignoran y RETURNING indica cuáles filas entraron realmente
+        insert(MessageModel)
+        .on_conflict_do_nothing(index_elements=["message_id"])
+        .returning(MessageModel.message_id)
+    ).execution_options(
+        insertmanyvalues_page_size=settings.batch_chunk_size # Filas por sentencia INSERT ... VALUES (...), (...)
+    )
+
+
+def session_page_query(session_id: str, limit: int, offset: int = 0, sender: str = None, after: tuple = None): # Consulta de una página de mensajes de una sesión en orden (timestamp, message_id)
+    query = select(*MessageModel.__table__.columns).where(MessageModel.session_id == session_id) # Columnas planas: las filas se cachean como diccionarios, no como objetos ORM
+
+    if sender: # Filtro opcional por remitente, resuelto por ix_messages_session_sender_timestamp
+        query = query.where(MessageModel.sender == sender)
+
+    if after: # Paginación por cursor: continúa después de (timestamp, message_id) sin recorrer las filas anteriores
+        query = query.where(tuple_(MessageModel.timestamp, MessageModel.message_id) > tuple_(*after))
+    elif offset: # Paginación por desplazamiento (solo recomendada para páginas cercanas al inicio)
+        query = query.offset(offset)
+
+    return query.order_by(MessageModel.timestamp, MessageModel.message_id).limit(limit)
+
+
+def session_export_query(session_id: str, since=None, until=None, sender: str = None): # Consulta de todos los mensajes de una sesión con filtros resueltos en SQL
+    query = select(MessageModel).where(MessageModel.session_id == session_id)
+
+    if sender:
+        query = query.where(MessageModel.sender == sender)
+    if since: # Límite inferior inclusivo
+        query = query.where(MessageModel.timestamp >= since)
+    if until: # Límite superior exclusivo
+        query = query.where(MessageModel.timestamp < until)
+
+    return query.order_by(MessageModel.timestamp, MessageModel.message_id)
+
+
+def search_query(match: str, limit: int, session_id: str = None, sender: str = None, since=None, until=None, after: tuple = None): # Búsqueda de texto completo ordenada por relevancia BM25 (menor = más relevante)
+    filters = ["messages_fts MATCH :match"]
+    params = {"match": match, "limit": limit}
+
+    if session_id:
+        filters.append("coalesce(m.session_id, a.session_id) = :session_id")
+        params["session_id"] = session_id
+    if sender:
+        filters.append("coalesce(m.sender, a.sender) = :sender")
+        params["sender"] = sender
+    if since:
+        filters.append("coalesce(m.timestamp, a.timestamp) >= :since")
+        params["since"] = since
+    if until:
+        filters.append("coalesce(m.timestamp, a.timestamp) < :until")
+        params["until"] = until
+    if after: # Paginación por cursor sobre (rank, rowid del índice)
+        filters.append("(bm25(messages_fts), messages_fts.rowid) > (:after_rank, :after_rowid)")
+        params["after_rank"], params["after_rowid"] = after
+
+    query = text(f"""
+        SELECT messages_fts.message_id,
+               coalesce(m.session_id, a.session_id) AS session_id,
+               coalesce(m.timestamp, a.timestamp) AS timestamp,
+               coalesce(m.sender, a.sender) AS sender,
+               snippet(messages_fts, 0, '[', ']', '…', 16) AS snippet,
+               bm25(messages_fts) AS rank,
+               messages_fts.rowid AS fts_rowid
+        FROM messages_fts
+        LEFT JOIN messages m ON m.message_id = messages_fts.message_id
+        LEFT JOIN archived_messages a ON a.message_id = messages_fts.message_id -- Meses archivados: siguen en el índice
+        WHERE {" AND ".join(filters)} AND (m.message_id IS NOT NULL OR a.message_id IS NOT NULL)
+        ORDER BY rank, fts_rowid
+        LIMIT :limit
+    """).columns(timestamp=MessageModel.timestamp.type) # Convierte el timestamp a datetime igual que el ORM
+    return query, params
+
+
+def invalid_search(error: OperationalError) -> Exception: # Traduce errores de sintaxis de FTS5 a ValueError (400); otros errores se propagan
+    if "fts5" in str(error.orig):
+        return ValueError("Consulta de búsqueda inválida")
+    return error
+
+
+def session_stats_query(session_id: str): # Estadísticas de una sesión: lectura por clave primaria, no depende del tamaño de la sesión
+    return select(*SessionStatsModel.__table__.columns).where(SessionStatsModel.session_id == session_id)
+
+
+def top_sessions_query(limit: int, order: str = "messages"): # Sesiones con más mensajes ("messages") o con actividad más reciente ("recent"), resuelto por índice
+    column = SessionStatsModel.message_count if order == "messages" else SessionStatsModel.last_timestamp
+    return select(*SessionStatsModel.__table__.columns).order_by(column.desc(), SessionStatsModel.session_id).limit(limit)
+
+
+def page_cache_key(session_id: str, limit: int, offset: int, sender: str, after: tuple) -> tuple: # Clave de caché de una página: sesión + filtros + posición
+    return (session_id, sender, after, offset, limit)
+
+
+def invalidate_sessions(cache, rows: list): # Invalida en el caché solo las sesiones que recibieron mensajes
+    if cache is not None:
+        for session_id in {row["session_id"] for row in rows}:
+            cache.invalidate_session(session_id)
+
+
+def unique_rows(rows, key): # Descarta repetidos consecutivos (un mensaje presente en la tabla principal y en su partición tras un archivado interrumpido)
+    last = None
+    for row in rows:
+        if key(row) != last:
+            last = key(row)
+            yield row
+
+
+def merge_partitions(sources: list, skip: int, limit: int) -> list: # Combina páginas ya ordenadas de varias particiones y aplica offset/limit
+    merged = heapq.merge(*sources, key=lambda row: (row["timestamp"], row["message_id"]))
+    return list(islice(unique_rows(merged, lambda row: row["message_id"]), skip, skip + limit))
+
+
+def archived_duplicates(archive, rows: list) -> set: # message_id que ya existen en la partición archivada del mes de su timestamp
+    months = archive.months() if archive is not None else ()
+    if not months:
+        return set()
+    by_month = {}
+    for row in rows:
+        month = month_of(row["timestamp"])
+        if month in months:
+            by_month.setdefault(month, []).append(row["message_id"])
+    return set().union(*(archive.existing_ids(month, ids) for month, ids in by_month.items()))
 
 
 class MessageRepository: # Clase repositorio - maneja todas las operaciones de base de datos
 
-    def __init__(self, db): # Constructor recibe una sesión de base de datos
+    def __init__(self, db, cache=None, archive=None): # Constructor recibe una sesión de base de datos y opcionalmente un caché de páginas y las particiones archivadas
         self.db = db # Sesión de SQLAlchemy
+        self.cache = cache # CacheBackend para las lecturas por sesión (None = sin caché)
+        self.archive = archive # ArchiveStore con los meses archivados (None = solo la tabla principal)
+
+    def _archived_months(self, session_id: str) -> list: # Meses archivados de la sesión; sin particiones no se consulta el catálogo
+        if self.archive is None or not self.archive.months():
+            return []
+        return self.db.scalars(archived_months_query(session_id)).all()
 
+    @instrument("repository")
+    def exists(self, message_id: str) -> bool: # Consulta por clave primaria, sin transacción de escritura
+        return self.db.scalar(select(MessageModel.message_id).where(MessageModel.message_id == message_id)) is not None
+
+    @instrument("repository")
     def save_message(self, data: dict): # Guarda un mensaje en la base de datos
+        if archived_duplicates(self.archive, [data]): # El mes del mensaje está archivado y ya contiene ese message_id
+            raise ValueError("El message_id ya existe")
+
         try:
             message = MessageModel(**data)
             self.db.add(message)
+            self.db.execute(stats_upsert_statement(), stats_rows([data])) # Misma transacción: si el INSERT falla, tampoco cambian las estadísticas
             self.db.commit()
             self.db.refresh(message)
+            invalidate_sessions(self.cache, [data])
             return message
 
         except IntegrityError:
@@ -22,3 +190,189 @@ class MessageRepository: # Clase repositorio - maneja todas las operaciones de b
         except Exception:
             self.db.rollback()
             raise
+
+    @instrument("repository")
+    def save_messages(self, rows: list) -> set: # Guarda varios mensajes en una sola transacción con INSERT multi-fila, retorna los message_id insertados
+        duplicates = archived_duplicates(self.archive, rows) # Se reportan como duplicados al no aparecer en el resultado
+        rows = [row for row in rows if row["message_id"] not in duplicates]
+        if not rows:
+            return set()
+
+        try:
+            result = self.db.execute(insert_many_statement(), [storage_row(row) for row in rows]) # executemany: SQLAlchemy agrupa las filas en INSERT multi-fila
+            inserted = set(result.scalars().all())
+            stats = stats_rows(row for row in rows if row["message_id"] in inserted) # Solo los mensajes que entraron, una fila por sesión
+            if stats:
+                self.db.execute(stats_upsert_statement(), stats)
+            self.db.commit() # Un único commit (un único fsync) para todo el lote
+            invalidate_sessions(self.cache, rows)
+            return inserted
+
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError("El message_id ya existe")
+
+        except Exception:
+            self.db.rollback()
+            raise
+
+    @instrument("repository")
+    def get_session_messages(self, session_id: str, limit: int, offset: int = 0, sender: str = None, after: tuple = None) -> list: # Obtiene una página de mensajes de una sesión (lectura a través del caché)
+        key = page_cache_key(session_id, limit, offset, sender, after)
+        if self.cache is not None:
+            rows = self.cache.get(key)
+            if rows is not None:
+                return rows
+            generation = self.cache.generation(session_id) # Antes de consultar: si un escritor invalida la sesión durante la lectura, la página no se guarda
+
+        months = self._archived_months(session_id)
+        if months: # La sesión también tiene mensajes archivados: cada partición aporta hasta offset + limit filas y se combinan en orden
+            skip = 0 if after else offset
+            query = session_page_query(session_id, skip + limit, sender=sender, after=after)
+            sources = [[message_row(row) for row in self.db.execute(query)]]
+            sources += [self.archive.session_rows(month, session_id, skip + limit, sender=sender, after=after) for month in months]
+            rows = merge_partitions(sources, skip, limit)
+        else:
+            query = session_page_query(session_id, limit, offset=offset, sender=sender, after=after)
+            rows = [message_row(row) for row in self.db.execute(query)]
+        if self.cache is not None:
+            self.cache.set(key, rows, session_id, generation)
+        return rows
+
+    @instrument("repository")
+    def get_session_stats(self, session_id: str): # Estadísticas de una sesión (None si no tiene mensajes)
+        row = self.db.execute(session_stats_query(session_id)).mappings().first()
+        return dict(row) if row is not None else None
+
+    @instrument("repository")
+    def list_session_stats(self, limit: int, order: str = "messages") -> list: # Top-N de sesiones por actividad
+        return [dict(row) for row in self.db.execute(top_sessions_query(limit, order)).mappings()]
+
+    @instrument("repository")
+    def search_messages(self, match: str, limit: int, **filters) -> list: # Busca mensajes por texto completo en todas las sesiones
+        query, params = search_query(match, limit, **filters)
+        try:
+            return [dict(row) for row in self.db.execute(query, params).mappings()]
+        except OperationalError as e:
+            raise invalid_search(e)
+
+    def iter_session_messages(self, session_id: str, since=None, until=None, sender: str = None, batch_size: int = 1000): # Recorre los mensajes de una sesión con cursor del lado del servidor, memoria constante
+        query = session_export_query(session_id, since=since, until=until, sender=sender)
+        months = self._archived_months(session_id)
+        result = self.db.scalars(query.execution_options(yield_per=batch_size)) # yield_per activa stream_results: las filas se leen por bloques
+        try:
+            if not months:
+                yield from result
+                return
+            sources = [result] + [ # Las particiones archivadas se recorren en paralelo y se combinan en orden cronológico
+                (MessageModel(**row) for row in self.archive.iter_session(month, session_id, since=since, until=until, sender=sender))
+                for month in months
+            ]
+            merged = heapq.merge(*sources, key=lambda message: (message.timestamp, message.message_id))
+            yield from unique_rows(merged, lambda message: message.message_id)
+        finally:
+            result.close()
+
+class AsyncMessageRepository: # Variante asíncrona del repositorio (AsyncSession + aiosqlite), mismas operaciones que MessageRepository
+
+    def __init__(self, db, cache=None, archive=None): # Constructor recibe una AsyncSession y opcionalmente un caché de páginas y las particiones archivadas
+        self.db = db
+        self.cache = cache
+        self.archive = archive
+
+    async def _archived_months(self, session_id: str) -> list:
+        if self.archive is None or not self.archive.months():
+            return []
+        return (await self.db.scalars(archived_months_query(session_id))).all()
+
+    @instrument("repository")
+    async def exists(self, message_id: str) -> bool:
+        return (await self.db.scalar(select(MessageModel.message_id).where(MessageModel.message_id == message_id))) is not None
+
+    @instrument("repository")
+    async def save_message(self, data: dict):
+        if self.archive is not None and self.archive.months() and await asyncio.to_thread(archived_duplicates, self.archive, [data]):
+            raise ValueError("El message_id ya existe")
+
+        try:
+            message = MessageModel(**data)
+            self.db.add(message)
+            await self.db.execute(stats_upsert_statement(), stats_rows([data]))
+            await self.db.commit()
+            await self.db.refresh(message)
+            invalidate_sessions(self.cache, [data])
+            return message
+
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("El message_id ya existe")
+
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    @instrument("repository")
+    async def save_messages(self, rows: list) -> set:
+        duplicates = await asyncio.to_thread(archived_duplicates, self.archive, rows) if self.archive is not None and self.archive.months() else set()
+        rows = [row for row in rows if row["message_id"] not in duplicates]
+        if not rows:
+            return set()
+
+        try:
+            result = await self.db.execute(insert_many_statement(), [storage_row(row) for row in rows])
+            inserted = set(result.scalars().all())
+            stats = stats_rows(row for row in rows if row["message_id"] in inserted)
+            if stats:
+                await self.db.execute(stats_upsert_statement(), stats)
+            await self.db.commit()
+            invalidate_sessions(self.cache, rows)
+            return inserted
+
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("El message_id ya existe")
+
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    @instrument("repository")
+    async def get_session_messages(self, session_id: str, limit: int, offset: int = 0, sender: str = None, after: tuple = None) -> list:
+        key = page_cache_key(session_id, limit, offset, sender, after)
+        if self.cache is not None:
+            rows = self.cache.get(key)
+            if rows is not None:
+                return rows
+            generation = self.cache.generation(session_id) # Antes de consultar: si un escritor invalida la sesión durante la lectura, la página no se guarda
+
+        months = await self._archived_months(session_id)
+        if months:
+            skip = 0 if after else offset
+            query = session_page_query(session_id, skip + limit, sender=sender, after=after)
+            sources = [[message_row(row) for row in await self.db.execute(query)]]
+            for month in months:
+                sources.append(await asyncio.to_thread(self.archive.session_rows, month, session_id, skip + limit, sender=sender, after=after))
+            rows = merge_partitions(sources, skip, limit)
+        else:
+            query = session_page_query(session_id, limit, offset=offset, sender=sender, after=after)
+            rows = [message_row(row) for row in await self.db.execute(query)]
+        if self.cache is not None:
+            self.cache.set(key, rows, session_id, generation)
+        return rows
+
+    @instrument("repository")
+    async def get_session_stats(self, session_id: str):
+        row = (await self.db.execute(session_stats_query(session_id))).mappings().first()
+        return dict(row) if row is not None else None
+
+    @instrument("repository")
+    async def list_session_stats(self, limit: int, order: str = "messages") -> list:
+        return [dict(row) for row in (await self.db.execute(top_sessions_query(limit, order))).mappings()]
+
+    @instrument("repository")
+    async def search_messages(self, match: str, limit: int, **filters) -> list:
+        query, params = search_query(match, limit, **filters)
+        try:
+            return [dict(row) for row in (await self.db.execute(query, params)).mappings()]
+        except OperationalError as e:
+            raise invalid_search(e)
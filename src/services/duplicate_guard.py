@@ -0,0 +1,145 @@
+# src/services/duplicate_guard.py
+"""Detección en memoria de message_id repetidos antes de abrir una transacción de escritura
+
+Combina un filtro de Bloom escalable (todos los message_id conocidos, con falsos positivos acotados)
+y un LRU exacto de los message_id recientes. La restricción única de la base de datos sigue siendo
+la fuente de verdad: el guard solo evita INSERT + rollback en los reintentos evidentes.
+"""
+import hashlib # Importa hashlib para las posiciones del filtro de Bloom
+import math # Importa math para dimensionar cada capa del filtro
+import threading # Importa threading: el guard se comparte entre los hilos del pool
+from collections import OrderedDict # LRU exacto de los message_id recientes
+
+from sqlalchemy import select # Importa select para precargar los message_id existentes
+
+from src.core.config import Settings, settings # Importa la configuración del guard
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer los contadores
+from src.database.models import MessageModel # Importa el modelo para leer los message_id existentes
+
+NEW, DUPLICATE, MAYBE = "new", "duplicate", "maybe" # Respuestas de DuplicateGuard.check
+
+
+class BloomFilter: # Filtro de Bloom de tamaño fijo (doble hashing sobre blake2b)
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2)) # Bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ScalableBloomFilter: # Agrega capas más grandes y más estrictas a medida que se llena (la tasa total de error se mantiene acotada)
+
+    def __init__(self, initial_capacity: int = 1_000_000, error_rate: float = 0.001, growth: int = 2, tightening: float = 0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key: str):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * self.growth, self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters))
+            self.filters.append(current)
+        current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in layer for layer in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(layer.bits) for layer in self.filters)
+
+
+class DuplicateGuard: # Clasifica un message_id como nuevo, duplicado seguro o posible duplicado (a confirmar en la base de datos)
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001, recent_size: int = 100_000):
+        self.bloom = ScalableBloomFilter(capacity, error_rate)
+        self.recent_size = recent_size
+        self._recent = OrderedDict() # message_id guardados o confirmados recientemente
+        self._lock = threading.Lock()
+        self.counters = {"recent_hits": 0, "bloom_negatives": 0, "bloom_positives": 0, "false_positives": 0}
+
+    def check(self, message_id: str) -> str:
+        with self._lock:
+            if message_id in self._recent: # Reintento evidente: se rechaza sin tocar la base de datos
+                self._recent.move_to_end(message_id)
+                self.counters["recent_hits"] += 1
+                return DUPLICATE
+            if message_id not in self.bloom: # Seguro que no existe (salvo escrituras de otros procesos, que detecta la restricción única)
+                self.counters["bloom_negatives"] += 1
+                return NEW
+            self.counters["bloom_positives"] += 1
+            return MAYBE
+
+    def remember(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                self.bloom.add(message_id)
+                self._recent[message_id] = None
+                self._recent.move_to_end(message_id)
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+
+    def confirm(self, message_id: str, exists: bool): # Resultado de la consulta en la base de datos para un posible duplicado
+        if exists:
+            self.remember([message_id])
+        else:
+            with self._lock:
+                self.counters["false_positives"] += 1
+
+    def warm(self, session_factory, chunk_size: int = 10000) -> int: # Carga en el filtro los message_id existentes, retorna cuántos
+        db = session_factory()
+        loaded = 0
+        try:
+            result = db.scalars(select(MessageModel.message_id).execution_options(yield_per=chunk_size))
+            for chunk in result.partitions():
+                with self._lock:
+                    for message_id in chunk:
+                        self.bloom.add(message_id)
+                loaded += len(chunk)
+        finally:
+            db.close()
+        return loaded
+
+    def start_warming(self, session_factory) -> threading.Thread: # Precarga en segundo plano: mientras tanto el guard responde NEW y decide la restricción única
+        thread = threading.Thread(target=self.warm, args=(session_factory,), name="duplicate-guard-warm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, recent=len(self._recent), bloom_bytes=self.bloom.nbytes, bloom_layers=len(self.bloom.filters))
+
+
+def build_duplicate_guard(app_settings: Settings = settings): # Guard según DUPLICATE_GUARD_ENABLED (None = desactivado)
+    return DuplicateGuard(
+        app_settings.duplicate_guard_capacity, app_settings.duplicate_guard_error_rate, app_settings.duplicate_guard_recent_size
+    ) if app_settings.duplicate_guard_enabled else None
+
+
+duplicate_guard = build_duplicate_guard() # Guard global compartido por las peticiones (None = desactivado)
+
+
+def set_duplicate_guard(guard): # Reemplaza el guard global (ej: create_app con otra configuración)
+    global duplicate_guard
+    duplicate_guard = guard
+
+REGISTRY.register(Gauge(
+    "duplicate_guard_events_total", "Consultas al guard de message_id duplicados por resultado", ("event",), type="counter",
+    callback=lambda: {(event, ): value for event, value in duplicate_guard.stats().items() if event in duplicate_guard.counters} if duplicate_guard is not None else {}
+))
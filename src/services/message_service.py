@@ -1,31 +1,121 @@
 from src.services.validation_service import ValidationService # Importa servicios de validación y procesamiento
-from src.services.processing_pipeline import process_message_content 
+from src.services.processing_pipeline import process_message_content, process_batch_content
 from datetime import datetime # Importa datetime para manejo de fechas
+import base64 # Importa base64 para codificar el cursor de paginación
+import json # Importa json para serializar la exportación NDJSON
+import hashlib # Importa hashlib para calcular el ETag de una página
+import asyncio # Importa asyncio para esperar el commit de la cola de escritura sin bloquear el event loop
+from concurrent.futures import TimeoutError as FutureTimeoutError # Importa el timeout de la espera síncrona del commit de la cola de escritura
+from src.services.write_behind import QueueFullError # Importa el error de backpressure de la cola de escritura
+from src.services.duplicate_guard import DUPLICATE, MAYBE # Importa las respuestas del guard de message_id duplicados
+from src.core.metrics import instrument, timed # Importa el hook de tiempos por capa
+from src.database.compression import content_text # Importa la lectura del texto de messages.content (los BLOB se descomprimen al exportar)
 from fastapi import HTTPException# Importa HTTPException para errores HTTP
 
 class MessageService: # Clase principal de servicio - contiene la lógica de negocio
 
-    def __init__(self, repository):  # Constructor que recibe el repositorio (inyección de dependencias)
+    def __init__(self, repository, writer=None, ack_timeout: float = None, guard=None, hub=None):  # Constructor que recibe el repositorio (inyección de dependencias)
         self.repository = repository
         self.validator = ValidationService()
+        self.writer = writer # Cola de escritura (write-behind) opcional; si existe, los mensajes se guardan en grupo
+        self.ack_timeout = ack_timeout # Espera máxima por el commit del grupo
+        self.guard = guard # DuplicateGuard opcional: rechaza message_id repetidos sin abrir una transacción de escritura
+        self.hub = hub # SessionHub opcional: difunde los mensajes guardados a los suscriptores de su sesión (SSE/WebSocket)
 
+    @instrument("service")
     def process_message(self, message):   # Método principal: procesa un mensaje end-to-end
-        # Validaciones
-        is_valid, error = self.validator.validate_message_format(message.dict())  # Valida el formato del mensaje (campos requeridos)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error)
+        data = self._prepare_message(message)
+        if self._known_duplicate(message.message_id): # Reintento evidente: 409 sin INSERT ni rollback
+            raise HTTPException(status_code=409, detail="El message_id ya existe")
 
-        is_valid, error = self.validator.validate_content(message.content)  # Valida el contenido (no vacío, tipo string)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error)
+        try: # Guarda en base de datos a través del repositorio o de la cola de escritura
+            if self.writer:
+                future = self._submit(data)
+                try:
+                    future.result(timeout=self.ack_timeout) # Responde solo cuando el grupo del mensaje ya hizo commit
+                except FutureTimeoutError:
+                    if future.cancel(): # El grupo aún no lo tomó: no se escribe y el cliente reintenta
+                        raise ack_timeout_error()
+                    future.result() # El hilo escritor ya lo tomó: se espera el commit en curso (un 503 haría reintentar un mensaje guardado)
+            else:
+                self.repository.save_message(data)
+        except ValueError as e:
+            self._remember([message.message_id]) # La restricción única confirmó que existe
+            raise HTTPException(status_code=409, detail=str(e))
+
+        self._remember([message.message_id])
+        self._publish([data]) # Después del commit: los suscriptores nunca reciben un mensaje que no se guardó
+        return data # Retorna los datos procesados
+
+    @instrument("service")
+    def process_batch(self, items: list) -> list: # Procesa un lote de mensajes, retorna un resultado por elemento en el mismo orden
+        results, valid, rows = prepare_batch(items, self.validator)
+        inserted = self.repository.save_messages(rows) # Una transacción con INSERT multi-fila
+        self._publish([row for row in rows if row["message_id"] in inserted])
+        return self._finish_batch(results, valid, inserted)
+
+    @instrument("service")
+    def get_messages(self, session_id: str, limit: int, offset: int = 0, sender: str = None, cursor: str = None) -> dict: # Obtiene una página de mensajes de una sesión
+        after = decode_cursor(cursor) if cursor else None # El cursor tiene prioridad sobre offset
+
+        rows = self.repository.get_session_messages( # Pide una fila extra para saber si hay más páginas sin contar toda la sesión
+            session_id, limit + 1, offset=offset, sender=sender, after=after
+        )
+        return self._build_page(session_id, rows, limit, offset, after)
 
-        is_valid, error = self.validator.validate_timestamp(message.timestamp)    # Valida el timestamp (formato ISO 8601)
-        if not is_valid:
+    @instrument("service")
+    def search_messages(self, q: str, limit: int, raw: bool = False, cursor: str = None, **filters) -> dict: # Búsqueda de texto completo con ranking BM25, fragmentos y paginación por cursor
+        match = fts_match(q, raw)
+        after = decode_search_cursor(cursor) if cursor else None
+        rows = self.repository.search_messages(match, limit + 1, after=after, **filters)
+        return self._build_search_page(q, rows, limit)
+
+    @instrument("service")
+    def get_session_stats(self, session_id: str): # Estadísticas de una sesión, None si no tiene mensajes
+        row = self.repository.get_session_stats(session_id)
+        return session_stats(row) if row is not None else None
+
+    @instrument("service")
+    def list_sessions(self, limit: int, order: str = "messages") -> dict: # Sesiones más activas según session_stats
+        return {"order": order, "sessions": [session_stats(row) for row in self.repository.list_session_stats(limit, order)]}
+
+    def export_messages(self, session_id: str, since: datetime = None, until: datetime = None, sender: str = None): # Genera los mensajes de una sesión como líneas NDJSON (bytes), una fila a la vez
+        for row in self.repository.iter_session_messages(session_id, since=since, until=until, sender=sender):
+            yield json.dumps(export_record(row), ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def _known_duplicate(self, message_id: str) -> bool: # Consulta el guard; un posible duplicado se confirma con una lectura por clave primaria
+        if self.guard is None:
+            return False
+        verdict = self.guard.check(message_id)
+        if verdict == MAYBE:
+            exists = self.repository.exists(message_id)
+            self.guard.confirm(message_id, exists)
+            return exists
+        return verdict == DUPLICATE
+
+    def _remember(self, message_ids): # Registra en el guard message_id que ya están en la base de datos
+        if self.guard is not None:
+            self.guard.remember(message_ids)
+
+    def _publish(self, rows: list): # Difunde los mensajes recién guardados (no hace nada sin suscriptores en su sesión)
+        if self.hub is not None and rows:
+            self.hub.publish(rows)
+
+    def _submit(self, data: dict): # Encola el mensaje en la cola de escritura, 503 si está llena
+        try:
+            return self.writer.submit(data)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    def _prepare_message(self, message) -> dict: # Valida y procesa un mensaje, retorna la fila lista para guardar
+        error = self._validate(message) # Valida el contenido (el esquema ya validó campos y timestamp)
+        if error:
             raise HTTPException(status_code=400, detail=error)
 
-        metadata = process_message_content(message.content) # Procesa el contenido para extraer metadata
+        with timed("pipeline", "process_message_content"):
+            metadata = process_message_content(message.content) # Procesa el contenido para extraer metadata
 
-        data = { # Prepara el diccionario con todos los datos
+        return { # Prepara el diccionario con todos los datos
             "message_id": message.message_id,
             "session_id": message.session_id,
             "content": message.content,
@@ -34,9 +124,245 @@ class MessageService: # Clase principal de servicio - contiene la lógica de neg
             "message_metadata": metadata
         }
 
-        try: # Guarda en base de datos a través del repositorio
-            self.repository.save_message(data)
+    def _finish_batch(self, results: list, valid: list, inserted: set) -> list: # Marca como duplicados los mensajes que el INSERT ignoró
+        self._remember(message.message_id for _, message in valid) # Insertados o ya existentes: todos están en la base de datos
+        for index, message in valid:
+            if message.message_id not in inserted: # Ya existía en la base de datos
+                results[index].update(status="duplicate", error="El message_id ya existe")
+
+        return results
+
+    def _build_page(self, session_id: str, rows: list, limit: int, offset: int, after: tuple) -> dict: # Arma la respuesta paginada a partir de limit + 1 filas
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return {
+            "session_id": session_id,
+            "messages": [
+                {
+                    "message_id": row["message_id"],
+                    "session_id": row["session_id"],
+                    "content": row["content"],
+                    "timestamp": row["timestamp"],
+                    "sender": row["sender"],
+                    "message_metadata": row["message_metadata"]
+                }
+                for row in rows
+            ],
+            "pagination": {
+                "limit": limit,
+                "offset": None if after else offset,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1]["timestamp"], rows[-1]["message_id"]) if has_more else None
+            }
+        }
+
+    def _build_search_page(self, q: str, rows: list, limit: int) -> dict: # Arma la respuesta de búsqueda a partir de limit + 1 filas
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return {
+            "query": q,
+            "results": [
+                {
+                    "message_id": row["message_id"],
+                    "session_id": row["session_id"],
+                    "timestamp": row["timestamp"],
+                    "sender": row["sender"],
+                    "snippet": row["snippet"],
+                    "rank": row["rank"]
+                }
+                for row in rows
+            ],
+            "pagination": {
+                "limit": limit,
+                "has_more": has_more,
+                "next_cursor": encode_search_cursor(rows[-1]["rank"], rows[-1]["fts_rowid"]) if has_more else None
+            }
+        }
+
+    @instrument("validation")
+    def _validate(self, message): # Ejecuta las validaciones de negocio que MessageSchema no expresa, retorna el error o None
+        is_valid, error = self.validator.validate_message(message) # Campos requeridos y timestamp ya los validó el esquema: no se revisan otra vez
+        return None if is_valid else error
+
+
+class AsyncMessageService(MessageService): # Variante asíncrona del servicio: misma validación y procesamiento, acceso a datos con await
+
+    @instrument("service")
+    async def process_message(self, message):
+        data = self._prepare_message(message)
+        if await self._known_duplicate(message.message_id):
+            raise HTTPException(status_code=409, detail="El message_id ya existe")
+
+        try:
+            if self.writer:
+                future = self._submit(data)
+                waiter = asyncio.wrap_future(future)
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter), self.ack_timeout) # shield: al vencer se decide abajo si el Future se cancela
+                except asyncio.TimeoutError:
+                    if future.cancel(): # El grupo aún no lo tomó: el hilo escritor lo descarta
+                        raise ack_timeout_error()
+                    await waiter # El hilo escritor ya lo tomó: se espera el commit en curso
+            else:
+                await self.repository.save_message(data)
         except ValueError as e:
+            self._remember([message.message_id])
             raise HTTPException(status_code=409, detail=str(e))
 
-        return data # Retorna los datos procesados
+        self._remember([message.message_id])
+        self._publish([data])
+        return data
+
+    async def _known_duplicate(self, message_id: str) -> bool:
+        if self.guard is None:
+            return False
+        verdict = self.guard.check(message_id)
+        if verdict == MAYBE:
+            exists = await self.repository.exists(message_id)
+            self.guard.confirm(message_id, exists)
+            return exists
+        return verdict == DUPLICATE
+
+    @instrument("service")
+    async def process_batch(self, items: list) -> list:
+        results, valid, rows = prepare_batch(items, self.validator)
+        inserted = await self.repository.save_messages(rows)
+        self._publish([row for row in rows if row["message_id"] in inserted])
+        return self._finish_batch(results, valid, inserted)
+
+    @instrument("service")
+    async def get_messages(self, session_id: str, limit: int, offset: int = 0, sender: str = None, cursor: str = None) -> dict:
+        after = decode_cursor(cursor) if cursor else None
+
+        rows = await self.repository.get_session_messages(
+            session_id, limit + 1, offset=offset, sender=sender, after=after
+        )
+        return self._build_page(session_id, rows, limit, offset, after)
+
+    @instrument("service")
+    async def search_messages(self, q: str, limit: int, raw: bool = False, cursor: str = None, **filters) -> dict:
+        match = fts_match(q, raw)
+        after = decode_search_cursor(cursor) if cursor else None
+        rows = await self.repository.search_messages(match, limit + 1, after=after, **filters)
+        return self._build_search_page(q, rows, limit)
+
+    @instrument("service")
+    async def get_session_stats(self, session_id: str):
+        row = await self.repository.get_session_stats(session_id)
+        return session_stats(row) if row is not None else None
+
+    @instrument("service")
+    async def list_sessions(self, limit: int, order: str = "messages") -> dict:
+        return {"order": order, "sessions": [session_stats(row) for row in await self.repository.list_session_stats(limit, order)]}
+
+
+def prepare_batch(items: list, validator: ValidationService = None) -> tuple: # Valida y procesa un lote, retorna (resultados, mensajes válidos, filas a insertar); también lo usa src.tools.bulk
+    validator = validator or ValidationService()
+    results = []
+    valid = [] # (posición en results, mensaje validado)
+    seen_ids = set() # message_id ya vistos dentro del mismo lote
+
+    with timed("validation", "schema"): # Una sola validación por elemento (esquema y reglas de contenido); items puede venir ya validado por parse_batch
+        checked = validator.validate_batch(items)
+
+    for index, (item, (message, error)) in enumerate(zip(items, checked)):
+        message_id = message.message_id if message is not None else (item.get("message_id") if isinstance(item, dict) else None)
+        result = {"index": index, "message_id": message_id, "status": "created", "error": None}
+        results.append(result)
+
+        if error:
+            result.update(status="validation_error", error=error)
+            continue
+
+        if message.message_id in seen_ids: # Duplicado dentro del mismo lote
+            result.update(status="duplicate", error="El message_id ya existe")
+            continue
+        seen_ids.add(message.message_id)
+        valid.append((index, message))
+
+    with timed("pipeline", "process_batch_content"):
+        metadata = process_batch_content([message.content for _, message in valid]) # Una sola pasada del pipeline para todo el lote
+
+    rows = [
+        {
+            "message_id": message.message_id,
+            "session_id": message.session_id,
+            "content": message.content,
+            "timestamp": message.timestamp,
+            "sender": message.sender,
+            "message_metadata": meta
+        }
+        for (_, message), meta in zip(valid, metadata)
+    ]
+
+    return results, valid, rows
+
+
+def ack_timeout_error() -> HTTPException: # El grupo del mensaje no hizo commit a tiempo: mismo 503 que la cola llena, el cliente reintenta
+    return HTTPException(status_code=503, detail="La cola de escritura no confirmó el mensaje a tiempo", headers={"Retry-After": "1"})
+
+
+def export_record(row) -> dict: # Mensaje (objeto o fila con atributos) -> objeto de la exportación NDJSON (también lo usa src.tools.bulk)
+    return {
+        "message_id": row.message_id,
+        "session_id": row.session_id,
+        "content": content_text(row.content),
+        "timestamp": row.timestamp.isoformat(),
+        "sender": row.sender,
+        "message_metadata": row.message_metadata
+    }
+
+
+def session_stats(row: dict) -> dict: # Fila de session_stats -> respuesta de la API
+    return {
+        "session_id": row["session_id"],
+        "message_count": row["message_count"],
+        "word_count": row["word_count"],
+        "character_count": row["character_count"],
+        "by_sender": {"user": row["user_count"], "system": row["system_count"]},
+        "first_timestamp": row["first_timestamp"],
+        "last_timestamp": row["last_timestamp"]
+    }
+
+
+def fts_match(q: str, raw: bool) -> str: # Convierte el texto buscado en una expresión MATCH de FTS5
+    if raw: # Sintaxis FTS5 tal cual (AND, OR, NEAR, prefijos*)
+        return q
+    return '"' + q.replace('"', '""') + '"' # Por defecto se busca la frase exacta
+
+
+def encode_cursor(timestamp: datetime, message_id: str) -> str: # Codifica la posición (timestamp, message_id) del último mensaje de una página
+    raw = f"{timestamp.isoformat()}|{message_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def encode_search_cursor(rank: float, rowid: int) -> str: # Codifica la posición (rank, rowid) del último resultado de búsqueda
+    raw = json.dumps([rank, rowid]).encode("utf-8") # json conserva el float exacto (repr)
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_search_cursor(cursor: str) -> tuple:
+    try:
+        rank, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(rank), int(rowid)
+    except Exception:
+        raise ValueError("Cursor de búsqueda inválido")
+
+
+def page_etag(page: dict) -> str: # ETag de una página: cambia solo si cambian sus mensajes o la existencia de una página siguiente
+    digest = hashlib.sha1()
+    for message in page["messages"]:
+        digest.update(f"{message['message_id']}|{message['timestamp']}\n".encode("utf-8"))
+    digest.update(str(page["pagination"]["next_cursor"]).encode("utf-8"))
+    return f'W/"{digest.hexdigest()}"'
+
+
+def decode_cursor(cursor: str) -> tuple: # Decodifica un cursor generado por encode_cursor, lanza ValueError si es inválido
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), message_id
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
@@ -1,9 +1,226 @@
 # src/services/processing_pipeline.py
+import os # Importa os para conocer el número de CPUs
+import re # Importa re para las etapas basadas en expresiones regulares
+import threading # Importa threading para proteger las métricas de tiempo entre hilos
+import time # Importa time para medir el costo de cada etapa
+from bisect import bisect_right # Ubica a qué mensaje pertenece cada coincidencia en el texto concatenado del lote
 from datetime import datetime # Importa datetime para timestamp de procesamiento
 
+from src.core.config import settings # Importa la configuración del pipeline
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer los tiempos por etapa
+
+SEPARATOR = "\x1f" # Separador de mensajes al concatenar un lote; un cliente puede enviarlo ("\u001f"), así que nunca se usa para volver a separar
+
+
+def scan_batch(pattern: re.Pattern, contents: list) -> list: # Ejecuta una expresión regular una sola vez sobre todo el lote, retorna las coincidencias por mensaje
+    starts = []
+    offset = 0
+    for content in contents:
+        starts.append(offset)
+        offset += len(content) + 1
+
+    matches = [[] for _ in contents]
+    for match in pattern.finditer(SEPARATOR.join(contents)): # Cada coincidencia se asigna por posición (largos de los mensajes), no por el separador
+        index = bisect_right(starts, match.start()) - 1
+        if match.end() <= starts[index] + len(contents[index]): # Descarta coincidencias que cruzan al mensaje siguiente
+            matches[index].append(match)
+    return matches
+
+
+# Etapas incluidas. Cada etapa recibe la lista de contenidos del lote y retorna un diccionario de metadata por mensaje.
+# Deben ser funciones de módulo para poder ejecutarse en el pool de procesos.
+
+def metrics_stage(contents: list) -> list: # Conteo de palabras y caracteres
+    return [{"word_count": len(content.split()), "character_count": len(content)} for content in contents]
+
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]+") # Signos de puntuación (el separador de mensajes es espacio en blanco y se conserva)
+
+
+def batch_words(contents: list) -> list: # Conjunto de palabras en minúsculas de cada mensaje; lower y la limpieza de signos se aplican una sola vez al lote
+    joined = SEPARATOR.join(content.replace(SEPARATOR, " ") for content in contents) # Un separador dentro de un mensaje partiría el lote en más elementos; split() ya lo trataba como espacio
+    return [set(text.split()) for text in PUNCTUATION_RE.sub(" ", joined.lower()).split(SEPARATOR)]
+
+
+PROFANITY = {"idiota", "estúpido", "estupido", "imbécil", "imbecil", "mierda", "puta", "carajo", "stupid", "idiot", "shit", "fuck"}
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+NUMBER_RE = re.compile(r"(?P<card>\b(?:\d[ -]?){13,19}\b)|(?P<phone>\+?\d[\d ()-]{7,}\d)")
+DIGIT_RE = re.compile(r"\d")
+
+
+def scan_subset(pattern: re.Pattern, contents: list, candidates: list) -> list: # Igual que scan_batch pero solo sobre los mensajes candidatos (índices)
+    matches = [[] for _ in contents]
+    for index, found in zip(candidates, scan_batch(pattern, [contents[i] for i in candidates])):
+        matches[index] = found
+    return matches
+
+
+def filter_stage(contents: list) -> list: # Filtrado básico: lenguaje ofensivo y datos personales (PII)
+    words = batch_words(contents)
+    emails = scan_subset(EMAIL_RE, contents, [i for i, content in enumerate(contents) if "@" in content]) # Solo mensajes con "@"
+    numbers = scan_subset(NUMBER_RE, contents, [i for i, content in enumerate(contents) if DIGIT_RE.search(content)]) # Solo mensajes con dígitos
+    return [
+        {
+            "is_filtered": not message_words.isdisjoint(PROFANITY),
+            "pii_types": sorted({match.lastgroup for match in message_numbers} | ({"email"} if message_emails else set()))
+        }
+        for message_words, message_emails, message_numbers in zip(words, emails, numbers)
+    ]
+
+
+LANGUAGE_WORDS = {
+    "es": {"el", "la", "los", "las", "de", "que", "y", "en", "un", "una", "por", "con", "para", "es", "hola", "cómo", "puedo", "gracias", "mi"},
+    "en": {"the", "a", "an", "of", "and", "to", "in", "is", "for", "with", "hello", "how", "can", "thanks", "my", "you", "i"},
+}
+
+
+def language_stage(contents: list) -> list: # Idioma aproximado por palabras frecuentes (es, en o und)
+    results = []
+    for words in batch_words(contents):
+        scores = {lang: len(words & vocabulary) for lang, vocabulary in LANGUAGE_WORDS.items()}
+        best = max(scores, key=scores.get)
+        results.append({"language": best if scores[best] else "und"})
+    return results
+
+
+LINK_RE = re.compile(r"https?://[^\s\x1f<>\"']+", re.IGNORECASE)
+
+
+def links_stage(contents: list) -> list: # Extracción de enlaces
+    return [{"links": [match.group() for match in matches]} for matches in scan_batch(LINK_RE, contents)]
+
+
+class Stage: # Etapa registrada en el pipeline con sus métricas de tiempo
+
+    def __init__(self, name: str, func, offload: bool = True):
+        self.name = name
+        self.func = func # func(contents: list) -> list[dict]
+        self.offload = offload # Puede ejecutarse en el pool de procesos si supera el umbral de costo
+        self.calls = 0
+        self.items = 0
+        self.total_seconds = 0.0
+
+    @property
+    def seconds_per_item(self) -> float: # Costo promedio medido por mensaje
+        return self.total_seconds / self.items if self.items else 0.0
+
+
+class ProcessingPipeline: # Pipeline por etapas: cada etapa procesa el lote completo de una vez
+
+    def __init__(self, offload_threshold_ms: float = 50.0, workers: int = 0):
+        self.stages = []
+        self.offload_threshold = offload_threshold_ms / 1000 # Costo estimado de una etapa a partir del cual se usa el pool de procesos
+        self.workers = workers or os.cpu_count() or 1 # 0 = un proceso por CPU
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, func, offload: bool = True): # Agrega una etapa al final del pipeline
+        if any(stage.name == name for stage in self.stages):
+            raise ValueError(f"La etapa {name} ya está registrada")
+        self.stages.append(Stage(name, func, offload))
+        return func
+
+    def stage(self, name: str, offload: bool = True): # Decorador equivalente a register
+        return lambda func: self.register(name, func, offload)
+
+    def run(self, contents: list) -> list: # Procesa un lote, retorna la metadata combinada de todas las etapas por mensaje
+        processed_at = datetime.utcnow().isoformat() + "Z" # Un único timestamp de procesamiento para todo el lote
+        results = [{} for _ in contents]
+        if not contents:
+            return results
+
+        for stage in self.stages:
+            started = time.perf_counter()
+            if self._should_offload(stage, len(contents)):
+                stage_results = self._run_offloaded(stage, contents)
+            else:
+                stage_results = stage.func(contents)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                stage.calls += 1
+                stage.items += len(contents)
+                stage.total_seconds += elapsed
+
+            for result, stage_result in zip(results, stage_results):
+                result.update(stage_result)
+
+        for result in results:
+            result["processed_at"] = processed_at
+        return results
+
+    def timings(self) -> dict: # Tiempos acumulados por etapa
+        with self._lock:
+            return {
+                stage.name: {
+                    "calls": stage.calls,
+                    "items": stage.items,
+                    "total_ms": round(stage.total_seconds * 1000, 3),
+                    "us_per_item": round(stage.seconds_per_item * 1e6, 3),
+                    "offload": stage.offload
+                }
+                for stage in self.stages
+            }
+
+    def shutdown(self): # Detiene el pool de procesos si se creó
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _should_offload(self, stage: Stage, size: int) -> bool: # Usa el pool solo si el costo estimado del lote supera el umbral
+        return stage.offload and size > 1 and stage.seconds_per_item * size > self.offload_threshold
+
+    def _run_offloaded(self, stage: Stage, contents: list) -> list: # Divide el lote entre los procesos del pool
+        with self._lock:
+            if self._executor is None: # "spawn" evita copiar con fork un proceso que tiene hilos activos
+                import multiprocessing # Import diferido: el pool de procesos solo se crea si una etapa supera el umbral
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            executor = self._executor
+
+        size = -(-len(contents) // self.workers) # Un bloque por proceso
+        results = []
+        for chunk_results in executor.map(stage.func, [contents[i:i + size] for i in range(0, len(contents), size)]):
+            results.extend(chunk_results)
+        return results
+
+
+BUILTIN_STAGES = {
+    "metrics": metrics_stage,
+    "filter": filter_stage,
+    "language": language_stage,
+    "links": links_stage,
+}
+
+
+def build_pipeline(stages: list = None) -> ProcessingPipeline: # Crea el pipeline con las etapas incluidas que indique la configuración (PIPELINE_STAGES por defecto)
+    stages = settings.pipeline_stages if stages is None else stages
+    unknown = [name for name in stages if name not in BUILTIN_STAGES]
+    if unknown: # Error de configuración al importar: mejor un mensaje claro que un KeyError
+        raise ValueError(f"PIPELINE_STAGES tiene etapas desconocidas {unknown}; las válidas son {list(BUILTIN_STAGES)}")
+    pipeline = ProcessingPipeline(settings.pipeline_offload_threshold_ms, settings.pipeline_workers)
+    pipeline.register("metrics", metrics_stage, offload=False) # word_count y character_count siempre están presentes
+    for name in stages:
+        if name != "metrics": # Las etapas incluidas cuestan menos que enviar el lote a otro proceso, se ejecutan en línea
+            pipeline.register(name, BUILTIN_STAGES[name], offload=False)
+    return pipeline
+
+
+pipeline = build_pipeline() # Pipeline global usado por el servicio
+
+REGISTRY.register(Gauge(
+    "pipeline_stage_seconds_total", "Tiempo acumulado por etapa del pipeline", ("stage",), type="counter",
+    callback=lambda: {(name, ): timing["total_ms"] / 1000 for name, timing in pipeline.timings().items()}
+))
+REGISTRY.register(Gauge(
+    "pipeline_stage_items_total", "Mensajes procesados por etapa del pipeline", ("stage",), type="counter",
+    callback=lambda: {(name, ): timing["items"] for name, timing in pipeline.timings().items()}
+))
+
+
 def process_message_content(content: str) -> dict: # Función que procesa el contenido de un mensaje y extrae metadata
-    return {
-        "word_count": len(content.split()), # Número de palabras (split por espacios)
-        "character_count": len(content), # Número total de caracteres
-        "processed_at": datetime.utcnow().isoformat() + "Z" # Timestamp UTC en ISO con Z
-    }
+    return pipeline.run([content])[0]
+
+
+def process_batch_content(contents: list) -> list: # Procesa un lote de contenidos en una sola pasada, mismo resultado que process_message_content por elemento
+    return pipeline.run(contents)
@@ -0,0 +1,130 @@
+# src/services/pubsub.py
+"""Difusión en proceso de los mensajes nuevos a los suscriptores de una sesión (SSE y WebSocket)
+
+Cada suscriptor tiene un buffer acotado en el event loop; no hay un hilo por conexión. Si un suscriptor
+no consume a tiempo y su buffer se llena, se le desaloja (slow consumer) y el cliente se reconecta
+desde el último cursor recibido. MessageService publica después del commit, desde el pool de hilos
+(modo síncrono) o desde el event loop (DB_ASYNC).
+"""
+import asyncio # Importa asyncio: los buffers y las esperas de los suscriptores viven en el event loop
+from collections import deque, namedtuple # deque para el buffer de cada suscriptor
+
+from src.core.config import settings # Importa la configuración de los buffers
+from src.core.metrics import REGISTRY, Gauge # Importa el registro de métricas para exponer suscriptores y desalojos
+from src.domain.schemas import MessageResponseSchema # Importa el esquema de salida: el evento lleva el mismo JSON que POST /api/messages
+from src.services.message_service import encode_cursor # Importa el cursor de paginación: el id del evento sirve para reanudar
+
+StreamEvent = namedtuple("StreamEvent", "id message_id data") # id = cursor del mensaje, data = JSON serializado una sola vez para todos los suscriptores
+
+SLOW_CONSUMER = "slow_consumer" # Motivo de cierre cuando el buffer del suscriptor se llena
+
+
+def stream_event(row: dict) -> StreamEvent: # Evento de un mensaje guardado (fila del servicio o de una página)
+    data = MessageResponseSchema.model_validate(row).model_dump_json(by_alias=True)
+    return StreamEvent(encode_cursor(row["timestamp"], row["message_id"]), row["message_id"], data)
+
+
+class Subscription: # Suscriptor de una sesión: buffer acotado y espera sin hilos (un Future mientras espera, sin tareas extra)
+
+    def __init__(self, session_id: str, buffer_size: int):
+        self.session_id = session_id
+        self.buffer_size = buffer_size
+        self.buffer = deque()
+        self.closed = None # Motivo del cierre (None = activa)
+        self._waiter = None # Future de la espera en curso
+
+    def push(self, event: StreamEvent) -> bool: # False si el buffer está lleno
+        if len(self.buffer) >= self.buffer_size:
+            return False
+        self.buffer.append(event)
+        self._wake()
+        return True
+
+    def close(self, reason: str):
+        if self.closed is None:
+            self.closed = reason
+            self.buffer.clear() # Un suscriptor desalojado no recibe nada más: reanuda desde su último cursor
+            self._wake()
+
+    async def next(self, timeout: float = None): # Siguiente evento, None si pasó timeout sin eventos o si la suscripción se cerró
+        if not self.buffer and self.closed is None:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            timer = loop.call_later(timeout, self._wake) if timeout else None
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if timer is not None:
+                    timer.cancel()
+        return self.buffer.popleft() if self.buffer else None
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class SessionHub: # Suscriptores por session_id; publish se puede llamar desde cualquier hilo
+
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self._sessions = {} # session_id -> {Subscription: None} (solo se modifica en el event loop)
+        self._loop = None # Event loop de los suscriptores
+        self.counters = {"published": 0, "evicted": 0}
+
+    def subscribe(self, session_id: str) -> Subscription: # Se llama desde el event loop
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(session_id, self.buffer_size)
+        self._sessions.setdefault(session_id, {})[subscription] = None
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._sessions.get(subscription.session_id)
+        if subscribers is not None:
+            subscribers.pop(subscription, None)
+            if not subscribers:
+                del self._sessions[subscription.session_id]
+
+    def publish(self, rows): # Difunde mensajes ya guardados; sin suscriptores en su sesión no serializa nada
+        events = [(row["session_id"], stream_event(row)) for row in rows if row["session_id"] in self._sessions]
+        if not events or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop: # DB_ASYNC: se publica desde el mismo event loop
+            self._dispatch(events)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, events) # Un solo salto al event loop por publicación
+        except RuntimeError: # El event loop ya se cerró (apagado)
+            pass
+
+    def _dispatch(self, events: list): # Se ejecuta en el event loop
+        for session_id, event in events:
+            for subscription in list(self._sessions.get(session_id, ())):
+                if not subscription.push(event):
+                    subscription.close(SLOW_CONSUMER)
+                    self.unsubscribe(subscription)
+                    self.counters["evicted"] += 1
+            self.counters["published"] += 1
+
+    def stats(self) -> dict:
+        return dict(self.counters, sessions=len(self._sessions), subscribers=sum(len(subscribers) for subscribers in self._sessions.values()))
+
+
+session_hub = SessionHub(settings.stream_buffer_size) # Hub global compartido por los endpoints de streaming y MessageService
+
+
+def set_session_hub(hub: SessionHub): # Reemplaza el hub global (ej: create_app con otro STREAM_BUFFER_SIZE)
+    global session_hub
+    session_hub = hub
+
+REGISTRY.register(Gauge(
+    "stream_subscribers", "Suscriptores activos de SSE/WebSocket", callback=lambda: {(): session_hub.stats()["subscribers"]}
+))
+REGISTRY.register(Gauge(
+    "stream_events_total", "Eventos de streaming por resultado", ("event",), type="counter",
+    callback=lambda: {(event, ): value for event, value in session_hub.counters.items()}
+))
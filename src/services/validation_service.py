@@ -1,4 +1,17 @@
 from datetime import datetime # Importa datetime para validación de fechas
+from functools import lru_cache # Importa lru_cache para compilar una sola vez el esquema de cada tamaño máximo de lote
+from typing import Annotated, List # Importa List para el validador de lotes
+
+from pydantic import Field, TypeAdapter, ValidationError, create_model # Importa TypeAdapter para compilar el validador de lotes una sola vez
+from src.domain.schemas import BatchItem, MessageSchema, RawBatchSchema, ValidMessageSchema # Importa los esquemas de mensaje y de lote
+
+BATCH_ITEMS = TypeAdapter(List[BatchItem]) # Validador compilado al importar: todo un lote en una sola llamada a pydantic-core
+
+
+@lru_cache(maxsize=8)
+def limited_batch_schema(max_items: int): # RawBatchSchema con max_length: pydantic-core deja de validar elementos al pasar del máximo (error too_long)
+    return create_model("RawBatchSchema", __base__=RawBatchSchema, messages=(Annotated[List[BatchItem], Field(max_length=max_items)], ...))
+
 
 class ValidationService: # Valida que el mensaje tenga todos los campos requeridos
 
@@ -25,3 +38,22 @@ class ValidationService: # Valida que el mensaje tenga todos los campos requerid
             return True, None
         except Exception:
             return False, "Formato de timestamp inválido. Use ISO 8601 (ej: 2023-06-15T14:30:00Z)"
+
+    def validate_message(self, message: MessageSchema): # Validación consolidada de un mensaje ya validado por MessageSchema: solo las reglas que el esquema no expresa
+        return self.validate_content(message.content) # Campos requeridos y timestamp (datetime) ya los garantiza el esquema
+
+    def parse_batch(self, body: bytes, max_items: int = None) -> list: # Cuerpo JSON de un lote -> elementos validados en una sola pasada, sin dict intermedio; lanza ValidationError si el cuerpo no es un lote o supera max_items
+        schema = limited_batch_schema(max_items) if max_items else RawBatchSchema
+        return schema.model_validate_json(body).messages
+
+    def validate_batch(self, items: list) -> list: # Un (mensaje, None) o (None, error) por elemento, con los mismos textos de error que la validación por pasos
+        return [(item, None) if isinstance(item, ValidMessageSchema) else self._check_item(item) for item in BATCH_ITEMS.validate_python(items)]
+
+    def _check_item(self, item) -> tuple: # Camino lento, solo para lo que no pasó ValidMessageSchema: arma el error con MessageSchema y las reglas de contenido
+        try:
+            message = MessageSchema.model_validate(item)
+        except ValidationError as e:
+            first = e.errors()[0]
+            return None, f"{'.'.join(map(str, first['loc']))}: {first['msg']}"
+        is_valid, error = self.validate_message(message)
+        return (message, None) if is_valid else (None, error)
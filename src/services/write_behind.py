@@ -0,0 +1,144 @@
+# src/services/write_behind.py
+import logging # Importa logging para registrar los errores del hilo escritor
+import queue # Cola acotada y segura entre hilos
+import threading # Hilo escritor en segundo plano
+import time # Medición del tiempo máximo de espera de un grupo
+from concurrent.futures import Future # Cada petición espera el Future de su mensaje hasta que su grupo es durable
+
+from src.repositories.message_repository import MessageRepository # Reutiliza el INSERT multi-fila del repositorio
+from src.core.metrics import REGISTRY, Gauge, timed # Importa las métricas (profundidad de la cola y tiempo de cada grupo)
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception): # La cola de escritura está llena (backpressure)
+    pass
+
+
+class WriteBehindQueue: # Agrupa los mensajes de muchas peticiones en un solo commit (group commit)
+
+    def __init__(self, session_factory, max_size: int = 10000, max_batch: int = 500, max_delay_ms: float = 5.0, cache=None, archive=None):
+        self.session_factory = session_factory # Fábrica de sesiones propia del hilo escritor
+        self.cache = cache # Caché de páginas a invalidar tras cada grupo
+        self.archive = archive # Particiones archivadas (duplicados en meses archivados)
+        self.max_batch = max_batch # Un grupo se escribe al alcanzar este tamaño...
+        self.max_delay = max_delay_ms / 1000 # ...o cuando el primer mensaje lleva este tiempo esperando
+        self._queue = queue.Queue(maxsize=max_size)
+        self._closing = threading.Event()
+        self._lock = threading.Lock() # submit y close: ningún mensaje entra a la cola después de que el hilo puede terminar
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+
+    @property
+    def depth(self) -> int: # Mensajes esperando a ser escritos
+        return self._queue.qsize()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, row: dict) -> Future: # Encola un mensaje ya validado, el Future se resuelve cuando su grupo hizo commit
+        future = Future()
+        with self._lock:
+            if self._closing.is_set():
+                raise QueueFullError("La cola de escritura se está cerrando")
+            try:
+                self._queue.put_nowait((row, future))
+            except queue.Full:
+                raise QueueFullError("La cola de escritura está llena")
+        return future
+
+    def close(self, timeout: float = 30.0): # Deja de aceptar mensajes y espera a que se escriba todo lo pendiente
+        with self._lock:
+            self._closing.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        if not self._thread.is_alive(): # Hilo nunca iniciado o ya terminado: ningún Future queda sin resolver
+            while True:
+                try:
+                    _, future = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(QueueFullError("La cola de escritura se cerró"))
+
+    def _run(self): # Bucle del hilo escritor
+        while not (self._closing.is_set() and self._queue.empty()):
+            try:
+                group = [self._queue.get(timeout=0.1)] # Espera el primer mensaje del grupo
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_batch: # Completa el grupo hasta max_batch o hasta que venza max_delay
+                remaining = deadline - time.monotonic()
+                try:
+                    group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._flush(group)
+            except Exception as e: # Un error inesperado en un grupo no detiene el hilo: sus peticiones fallan y el bucle sigue
+                logger.exception("Error escribiendo un grupo de la cola de escritura")
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _flush(self, group: list): # Escribe un grupo en una transacción y resuelve los Future de sus peticiones
+        pending = {} # message_id -> Future; un message_id repetido dentro del grupo se rechaza de inmediato
+        rows = []
+        for row, future in group:
+            if not future.set_running_or_notify_cancel(): # La petición ya dejó de esperar (ack timeout): el mensaje no se escribe
+                continue
+            if row["message_id"] in pending:
+                future.set_exception(ValueError("El message_id ya existe"))
+                continue
+            pending[row["message_id"]] = future
+            rows.append(row)
+
+        db = self.session_factory()
+        try:
+            with timed("write_behind", "flush"):
+                inserted = MessageRepository(db, self.cache, self.archive).save_messages(rows)
+        except Exception as e: # Error de la transacción completa: todas las peticiones del grupo fallan
+            for future in pending.values():
+                future.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        for row in rows:
+            if row["message_id"] in inserted:
+                pending[row["message_id"]].set_result(row)
+            else:
+                pending[row["message_id"]].set_exception(ValueError("El message_id ya existe"))
+
+
+write_behind_queue = None # Cola global, solo existe con WRITE_BEHIND_ENABLED
+
+
+REGISTRY.register(Gauge(
+    "write_behind_queue_depth", "Mensajes esperando en la cola de escritura",
+    callback=lambda: {(): write_behind_queue.depth} if write_behind_queue is not None else {}
+))
+
+
+def start_write_behind(settings, session_factory, cache=None, archive=None): # Crea e inicia la cola global (arranque de la aplicación)
+    global write_behind_queue
+    if settings.write_behind_enabled and write_behind_queue is None:
+        write_behind_queue = WriteBehindQueue(
+            session_factory,
+            max_size=settings.write_behind_max_queue,
+            max_batch=settings.write_behind_max_batch,
+            max_delay_ms=settings.write_behind_max_delay_ms,
+            cache=cache,
+            archive=archive
+        ).start()
+    return write_behind_queue
+
+
+def stop_write_behind(): # Drena y detiene la cola global (apagado de la aplicación)
+    global write_behind_queue
+    if write_behind_queue is not None:
+        write_behind_queue.close()
+        write_behind_queue = None
@@ -0,0 +1,284 @@
+# src/tools/bulk.py
+"""Importación y exportación masiva de la tabla messages (NDJSON o CSV) sin pasar por la API
+
+La importación aplica las mismas reglas que POST /api/messages/batch (MessageSchema, ValidationService y el
+pipeline de procesamiento) en un pool de procesos; el proceso principal solo inserta las filas ya codificadas
+con executemany en transacciones grandes. Mientras dura la carga se relajan los pragmas de durabilidad y se
+quitan los índices secundarios y los triggers de FTS5; al terminar (también si se interrumpe) se recrean, se
+indexan en FTS5 los mensajes nuevos y se suman a session_stats. Los message_id que ya existen (también en los
+meses archivados) se cuentan como duplicados y no se modifican.
+
+Pensado para migrar o volver a poblar un entorno con la API detenida: el caché de páginas y el guard de
+duplicados de una API en marcha no ven los mensajes importados. Si el proceso muere sin llegar al final
+(kill -9), volver a ejecutar import (aunque sea con un archivo vacío) recrea índices y triggers, y
+python -m src.database.fts rebuild y python -m src.database.session_stats rebuild completan el resto.
+
+La exportación recorre la tabla principal con un cursor del lado del servidor (memoria constante) y escribe
+el mismo objeto que GET /api/messages/{session_id}/export; los meses archivados no se incluyen.
+
+Uso como comando (FILE = - usa stdin o stdout):
+    python -m src.tools.bulk import FILE [--format csv] [--workers N] [--errors FILE] [--keep-indexes]
+    python -m src.tools.bulk export FILE [--format csv] [--session SESSION_ID]
+"""
+import argparse # Importa argparse para las opciones del comando
+import csv # Importa csv para el formato CSV (una columna por campo, message_metadata como JSON)
+import json # Importa json para el formato NDJSON
+import multiprocessing # Importa multiprocessing para crear el pool con "spawn"
+import sys # Importa sys para stdin, stdout y el progreso en stderr
+import time # Importa time para medir filas por segundo
+from collections import deque # Bloques enviados al pool y aún no insertados (en orden)
+from concurrent.futures import ProcessPoolExecutor # Pool de procesos para la validación y el pipeline
+from itertools import islice # Importa islice para leer la entrada por bloques
+
+from sqlalchemy import select, text # Importa select para la exportación, text para las consultas de FTS5 y rowid
+from sqlalchemy.dialects import sqlite # Dialecto de SQLite: los procesos del pool codifican cada columna como lo haría SQLAlchemy
+from sqlalchemy.orm import Session # Importa Session para recorrer los mensajes con yield_per
+
+from src.core.config import settings # Importa la configuración (pragmas que se restauran al terminar)
+from src.database.compression import content_codec # Importa el codec del contenido: los diccionarios se envían a los procesos del pool
+from src.database.fts import replace_triggers # Importa la recreación de los triggers de FTS5
+from src.database.models import METADATA_CODECS, MessageModel # Importa el modelo de messages y las columnas de metadata
+from src.database.session_stats import add_new_messages # Importa la actualización incremental de session_stats
+from src.repositories.message_repository import storage_row # Importa la conversión de la fila del servicio a columnas de messages
+from src.services.message_service import export_record, prepare_batch # Importa la validación por lotes y el formato de exportación
+
+COLUMNS = ("message_id", "session_id", "content", "timestamp", "sender", *METADATA_CODECS, "metadata_extra") # Columnas de messages en el orden del INSERT
+CSV_FIELDS = ("message_id", "session_id", "content", "timestamp", "sender", "message_metadata")
+INSERT = f"INSERT OR IGNORE INTO messages ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})" # Duplicados ignorados, sin RETURNING
+CHUNK_ROWS = 2000 # Registros por bloque enviado a un proceso del pool
+COMMIT_ROWS = 200_000 # Filas por transacción
+PROGRESS_INTERVAL_S = 1.0 # Intervalo entre líneas de progreso en stderr
+
+_BINDERS = [MessageModel.__table__.c[name].type.bind_processor(sqlite.dialect()) for name in COLUMNS] # Comprime content, formatea DateTime y serializa JSON
+
+
+def _init_worker(dictionaries: list): # Inicializador de cada proceso del pool: mismos diccionarios de compresión que el proceso principal
+    content_codec.add_dictionaries(dictionaries)
+
+
+def prepare_chunk(fmt: str, first_line: int, records: list) -> tuple: # Valida, procesa y codifica un bloque, retorna (filas para el INSERT, errores, duplicados en el bloque)
+    items, lines, errors = [], [], []
+    for line, record in enumerate(records, first_line):
+        if fmt == "ndjson":
+            if not record.strip(): # Líneas vacías (ej: salto de línea final)
+                continue
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                errors.append({"line": line, "message_id": None, "status": "validation_error", "error": f"JSON inválido: {e}"})
+                continue
+        items.append(record)
+        lines.append(line)
+
+    results, _, rows = prepare_batch(items) # Mismas reglas que POST /api/messages/batch
+    duplicates = 0
+    for result in results:
+        if result["status"] == "duplicate": # Repetido dentro del bloque
+            duplicates += 1
+        elif result["status"] != "created":
+            errors.append({"line": lines[result["index"]], "message_id": result["message_id"], "status": result["status"], "error": result["error"]})
+
+    encoded = []
+    for row in rows:
+        stored = storage_row(row)
+        encoded.append(tuple(bind(stored[name]) if bind else stored[name] for name, bind in zip(COLUMNS, _BINDERS)))
+    return encoded, errors, duplicates
+
+
+def read_chunks(source, fmt: str, size: int = CHUNK_ROWS): # Bloques (número de la primera línea o registro, registros) de la entrada
+    records = csv.DictReader(source) if fmt == "csv" else source
+    first = 2 if fmt == "csv" else 1 # En CSV la línea 1 es el encabezado; los errores indican el número de registro + 1
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield first, chunk
+        first += len(chunk)
+
+
+def prepared_chunks(chunks, fmt: str, workers: int): # Resultados de prepare_chunk en el orden de la entrada; workers = 0 procesa en línea
+    if not workers:
+        for first, records in chunks:
+            yield prepare_chunk(fmt, first, records)
+        return
+
+    context = multiprocessing.get_context("spawn") # Igual que el pipeline: no copia con fork el estado del proceso principal
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(list(content_codec.dictionaries.items()),)) as executor:
+        pending = deque()
+        for first, records in chunks:
+            pending.append(executor.submit(prepare_chunk, fmt, first, records))
+            if len(pending) >= 2 * workers: # Memoria acotada: la lectura no se adelanta más de dos bloques por proceso
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _archived_ids(archive, rows: list) -> set: # message_id de las filas que ya están en la partición archivada de su mes
+    months = archive.months() if archive is not None else ()
+    if not months:
+        return set()
+    by_month = {}
+    for row in rows:
+        month = row[3][:7] # timestamp ya codificado como texto: YYYY-MM
+        if month in months:
+            by_month.setdefault(month, []).append(row[0])
+    return set().union(*(archive.existing_ids(month, ids) for month, ids in by_month.items()))
+
+
+def _relax(conn, keep_indexes: bool): # Pragmas de carga masiva y, salvo keep_indexes, sin índices secundarios ni triggers de FTS5
+    conn.exec_driver_sql("PRAGMA synchronous=OFF") # Sin fsync: una caída durante la carga solo pierde la transacción en curso en WAL
+    conn.exec_driver_sql("PRAGMA cache_size=-1048576") # 1 GiB de caché de páginas para esta conexión
+    conn.exec_driver_sql("PRAGMA temp_store=MEMORY") # Ordenamientos de CREATE INDEX en memoria
+    if not keep_indexes:
+        for index in MessageModel.__table__.indexes:
+            index.drop(conn, checkfirst=True)
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.commit()
+
+
+def _restore(conn, start: dict, keep_indexes: bool) -> None: # Recrea índices y triggers, indexa en FTS5 y suma a session_stats las filas nuevas
+    conn.rollback() # Descarta la transacción interrumpida, si la hay
+    for index in MessageModel.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    if not keep_indexes: # Con los triggers activos FTS5 ya indexó cada fila al insertarla
+        conn.execute(text("INSERT INTO messages_fts (content, message_id) SELECT message_text(content), message_id FROM messages WHERE rowid > :start"), {"start": start["messages"]})
+        conn.execute(text("INSERT INTO messages_fts_rowids (message_id, fts_rowid) SELECT message_id, rowid FROM messages_fts WHERE rowid > :start"), {"start": start["fts"]})
+    replace_triggers(conn)
+    add_new_messages(conn, start["messages"])
+    conn.commit()
+    conn.exec_driver_sql(f"PRAGMA synchronous={settings.sqlite_synchronous}") # La conexión vuelve al pool con los pragmas de set_sqlite_pragmas
+    conn.exec_driver_sql(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+    conn.exec_driver_sql("PRAGMA temp_store=DEFAULT")
+    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)") # El WAL de la carga no queda ocupando disco
+
+
+def import_messages(engine, source, fmt: str = "ndjson", workers: int = None, errors=None, archive=None, keep_indexes: bool = False, progress=None) -> dict: # Importa un archivo abierto, retorna los contadores
+    counters = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+    started = last_report = time.perf_counter()
+    if workers is None: # Con una sola CPU el pool solo agregaría serialización entre procesos
+        workers = multiprocessing.cpu_count() if multiprocessing.cpu_count() > 1 else 0
+
+    with engine.connect() as conn: # Conexión del pool: ya tiene message_text() y los diccionarios de compresión
+        start = {
+            "messages": conn.scalar(text("SELECT coalesce(max(rowid), 0) FROM messages")),
+            "fts": conn.scalar(text("SELECT coalesce(max(rowid), 0) FROM messages_fts"))
+        }
+        _relax(conn, keep_indexes)
+        try:
+            cursor = conn.connection.driver_connection.cursor() # executemany directo: sin compilar ni procesar parámetros en el proceso principal
+            pending_rows = 0
+            for rows, chunk_errors, duplicates in prepared_chunks(read_chunks(source, fmt), fmt, workers):
+                skipped = _archived_ids(archive, rows)
+                if skipped:
+                    rows = [row for row in rows if row[0] not in skipped]
+                cursor.executemany(INSERT, rows)
+                inserted = cursor.rowcount # executemany suma las filas insertadas; INSERT OR IGNORE no cuenta las ignoradas
+                counters["read"] += len(rows) + len(skipped) + len(chunk_errors) + duplicates
+                counters["inserted"] += inserted
+                counters["duplicates"] += len(rows) + len(skipped) + duplicates - inserted
+                counters["invalid"] += len(chunk_errors)
+                for error in chunk_errors if errors is not None else ():
+                    errors.write(json.dumps(error, ensure_ascii=False) + "\n")
+
+                pending_rows += len(rows)
+                if pending_rows >= COMMIT_ROWS:
+                    conn.commit()
+                    pending_rows = 0
+                now = time.perf_counter()
+                if progress is not None and now - last_report >= PROGRESS_INTERVAL_S:
+                    progress(counters, now - started)
+                    last_report = now
+            cursor.close()
+            conn.commit()
+        finally:
+            _restore(conn, start, keep_indexes)
+
+    seconds = time.perf_counter() - started
+    return dict(counters, seconds=round(seconds, 3), rows_per_s=round(counters["read"] / seconds) if seconds else 0)
+
+
+def export_messages(engine, target, fmt: str = "ndjson", session_id: str = None, batch_size: int = 1000) -> int: # Escribe los mensajes de la tabla principal, retorna cuántos
+    query = select(MessageModel)
+    if session_id:
+        query = query.where(MessageModel.session_id == session_id).order_by(MessageModel.timestamp, MessageModel.message_id)
+    else:
+        query = query.order_by(text("messages.rowid")) # Orden de inserción, recorrido secuencial de la tabla
+
+    writer = csv.DictWriter(target, CSV_FIELDS) if fmt == "csv" else None
+    if writer is not None:
+        writer.writeheader()
+    count = 0
+    with Session(engine) as db:
+        for message in db.scalars(query.execution_options(yield_per=batch_size)): # yield_per activa stream_results: memoria constante
+            record = export_record(message)
+            if writer is not None:
+                record["message_metadata"] = json.dumps(record["message_metadata"], ensure_ascii=False) if record["message_metadata"] is not None else ""
+                writer.writerow(record)
+            else:
+                target.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _print_progress(counters: dict, seconds: float):
+    print(
+        f"{counters['read']} leídos, {counters['inserted']} insertados, {counters['duplicates']} duplicados, "
+        f"{counters['invalid']} inválidos ({counters['read'] / seconds:.0f} filas/s)",
+        file=sys.stderr, flush=True
+    )
+
+
+def _open(path: str, mode: str): # "-" = stdin/stdout; newline="" lo pide el módulo csv y no altera NDJSON
+    if path == "-":
+        stream = sys.stdin if mode == "r" else sys.stdout
+        stream.reconfigure(encoding="utf-8", newline="")
+        return stream
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.tools.bulk", description="Importación y exportación masiva de mensajes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="Importa mensajes desde NDJSON o CSV")
+    importer.add_argument("file")
+    importer.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    importer.add_argument("--workers", type=int, default=None, help="Procesos para validar y procesar (0 = en línea; por defecto uno por CPU, o en línea con una sola CPU)")
+    importer.add_argument("--errors", help="Archivo NDJSON con los registros rechazados (línea, message_id, error)")
+    importer.add_argument("--keep-indexes", action="store_true", help="No quita índices ni triggers (importaciones chicas sobre una base grande)")
+    exporter = commands.add_parser("export", help="Exporta mensajes a NDJSON o CSV")
+    exporter.add_argument("file")
+    exporter.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    exporter.add_argument("--session", help="Solo los mensajes de esta sesión, en orden cronológico")
+    args = parser.parse_args(argv)
+
+    from src.database.database import get_engine, DATABASE_URL # Imports diferidos: solo para el comando
+    from src.database.partitions import archive_store
+    from src.database.schema import ensure_schema
+
+    engine = get_engine()
+    ensure_schema(engine)
+
+    if args.command == "import":
+        source = _open(args.file, "r")
+        errors = open(args.errors, "w", encoding="utf-8") if args.errors else None
+        try:
+            summary = import_messages(engine, source, args.format, args.workers, errors, archive_store, args.keep_indexes, progress=_print_progress)
+        finally:
+            if errors is not None:
+                errors.close()
+            if source is not sys.stdin:
+                source.close()
+        print(json.dumps(dict(summary, database=DATABASE_URL)))
+    else:
+        target = _open(args.file, "w")
+        try:
+            count = export_messages(engine, target, args.format, args.session)
+        finally:
+            if target is not sys.stdout:
+                target.close()
+        print(f"{count} mensajes exportados de {DATABASE_URL}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
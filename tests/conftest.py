@@ -0,0 +1,18 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# La base de datos de pruebas vive en un directorio temporal para no tocar messages.db
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_messages.db"
+
+
+@pytest.fixture
+def client():
+    """Cliente HTTP de pruebas contra la aplicación completa (ejecuta el lifespan: esquema, cola de escritura, guard)"""
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,70 @@
+# tests/test_api/test_messages_batch.py
+import uuid
+
+
+def _message(message_id, **overrides):
+    message = {
+        "message_id": message_id,
+        "session_id": "session-batch",
+        "content": "Hola, ¿cómo puedo ayudarte hoy?",
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "system"
+    }
+    message.update(overrides)
+    return message
+
+
+def test_create_messages_batch_reports_each_item(client):
+    """Cada elemento del lote reporta creado, duplicado o error de validación"""
+    prefix = uuid.uuid4().hex
+    batch = [
+        _message(f"{prefix}-1"),
+        _message(f"{prefix}-2", sender="bot"),
+        _message(f"{prefix}-1"),
+        _message(f"{prefix}-3", content=""),
+        _message(f"{prefix}-4", sender="user"),
+    ]
+
+    response = client.post("/api/messages/batch", json={"messages": batch})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["total"] == 5
+    assert data["created"] == 2
+    assert [r["status"] for r in data["results"]] == [
+        "created", "validation_error", "duplicate", "validation_error", "created"
+    ]
+
+
+def test_create_messages_batch_detects_existing_ids(client):
+    """Los message_id ya guardados se reportan como duplicados sin abortar el lote"""
+    prefix = uuid.uuid4().hex
+    assert client.post("/api/messages", json=_message(f"{prefix}-1")).status_code == 201
+
+    response = client.post(
+        "/api/messages/batch",
+        json={"messages": [_message(f"{prefix}-1"), _message(f"{prefix}-2")]}
+    )
+    results = response.json()["data"]["results"]
+    assert [r["status"] for r in results] == ["duplicate", "created"]
+
+
+def test_create_messages_batch_rejects_oversized_batch(client, monkeypatch):
+    """Un lote mayor al máximo configurado responde 413"""
+    from src.core.config import settings
+
+    monkeypatch.setattr(settings, "batch_max_items", 1)
+    response = client.post(
+        "/api/messages/batch",
+        json={"messages": [_message("a"), _message("b")]}
+    )
+    assert response.status_code == 413
+
+
+def test_create_messages_batch_rejects_malformed_body(client):
+    """Un cuerpo que no es un lote responde 422 con el formato de validación de FastAPI"""
+    response = client.post("/api/messages/batch", content=b'{"messages": 5}', headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "messages"]
+
+    response = client.post("/api/messages/batch", content=b'{"messages": [', headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
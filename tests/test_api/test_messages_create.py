@@ -0,0 +1,22 @@
+# tests/test_api/test_messages_create.py
+import uuid
+
+
+def test_create_message_response_matches_readme(client):
+    """La respuesta de POST /api/messages expone la metadata bajo "metadata" como documenta el README"""
+    message_id = f"msg-{uuid.uuid4().hex}"
+    response = client.post("/api/messages", json={
+        "message_id": message_id,
+        "session_id": "session-abcdef",
+        "content": "Hola, ¿cómo puedo ayudarte hoy?",
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "system"
+    })
+
+    assert response.status_code == 201
+    data = response.json()["data"]
+    assert data["message_id"] == message_id
+    assert data["timestamp"] == "2023-06-15T14:30:00Z"
+    assert data["metadata"]["word_count"] == 5
+    assert data["metadata"]["character_count"] == 31
+    assert "message_metadata" not in data
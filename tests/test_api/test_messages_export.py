@@ -0,0 +1,32 @@
+# tests/test_api/test_messages_export.py
+import json
+import uuid
+
+
+def test_export_streams_ndjson_with_filters(client):
+    """La exportación devuelve un JSON por línea y aplica since/until/sender"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    batch = [
+        {
+            "message_id": f"{session_id}-{i}",
+            "session_id": session_id,
+            "content": f"Mensaje {i}",
+            "timestamp": f"2023-06-15T14:30:0{i}",
+            "sender": "user" if i % 2 else "system"
+        }
+        for i in range(6)
+    ]
+    client.post("/api/messages/batch", json={"messages": batch})
+
+    response = client.get(f"/api/messages/{session_id}/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [m["message_id"] for m in lines] == [f"{session_id}-{i}" for i in range(6)]
+
+    response = client.get(
+        f"/api/messages/{session_id}/export",
+        params={"since": "2023-06-15T14:30:01", "until": "2023-06-15T14:30:05", "sender": "user"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [m["message_id"] for m in lines] == [f"{session_id}-1", f"{session_id}-3"]
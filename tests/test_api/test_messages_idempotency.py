@@ -0,0 +1,80 @@
+# tests/test_api/test_messages_idempotency.py
+import asyncio
+import uuid
+
+import httpx
+
+
+def _message(session_id, content="Hola idempotente"):
+    return {
+        "message_id": f"{session_id}-1",
+        "session_id": session_id,
+        "content": content,
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "user"
+    }
+
+
+def test_retry_with_same_key_replays_first_response(client):
+    """Un reintento con la misma Idempotency-Key recibe la primera respuesta (201) byte a byte, sin un 409"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    first = client.post("/api/messages", json=_message(session_id), headers=headers)
+    retry = client.post("/api/messages", json=_message(session_id), headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.content == first.content
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert first.json()["data"]["metadata"]["word_count"] == 2
+
+    without_key = client.post("/api/messages", json=_message(session_id))
+    assert without_key.status_code == 409 # Sin clave se mantiene la detección de duplicados
+
+
+def test_same_key_with_different_body_is_rejected(client):
+    """Reutilizar una Idempotency-Key con otro cuerpo responde 422"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    client.post("/api/messages", json=_message(session_id), headers=headers)
+
+    response = client.post("/api/messages", json=_message(session_id, "Otro contenido"), headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"]["error"]["code"] == "IDEMPOTENCY_KEY_REUSED"
+
+    extra = client.post("/api/messages", json=dict(_message(session_id), origen="web"), headers=headers)
+    assert extra.status_code == 422 # La huella es del cuerpo crudo: un campo que el esquema ignora también cuenta
+
+
+def test_concurrent_requests_with_same_key_are_coalesced():
+    """Las peticiones concurrentes con la misma clave esperan a la primera: un solo INSERT y la misma respuesta para todas"""
+    from src.main import app
+
+    session_id = f"session-{uuid.uuid4().hex}"
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    async def scenario():
+        async with app.router.lifespan_context(app), httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/api/messages", json=_message(session_id), headers=headers) for _ in range(8)))
+
+    responses = asyncio.run(scenario())
+    assert {response.status_code for response in responses} == {201}
+    assert len({response.content for response in responses}) == 1
+    assert sum("idempotent-replayed" not in response.headers for response in responses) == 1
+
+
+def test_replay_keeps_response_headers():
+    """La respuesta repetida conserva los headers de la primera (ej: Location, ETag)"""
+    from fastapi import Response
+
+    from src.api.idempotency import fingerprint, run_idempotent
+
+    async def respond():
+        return Response(b"{}", status_code=201, media_type="application/json", headers={"Location": "/api/messages/s-1", "ETag": '"v1"'})
+
+    key = f"POST /api/messages:{uuid.uuid4().hex}"
+    asyncio.run(run_idempotent(key, fingerprint(b"{}"), respond))
+    replayed = asyncio.run(run_idempotent(key, fingerprint(b"{}"), respond))
+    assert replayed.headers["location"] == "/api/messages/s-1" and replayed.headers["etag"] == '"v1"'
+    assert replayed.headers["idempotent-replayed"] == "true" and replayed.headers["content-length"] == "2"
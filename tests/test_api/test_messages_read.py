@@ -0,0 +1,78 @@
+# tests/test_api/test_messages_read.py
+import uuid
+
+
+def _seed_session(client, count=5):
+    session_id = f"session-{uuid.uuid4().hex}"
+    batch = [
+        {
+            "message_id": f"{session_id}-{i}",
+            "session_id": session_id,
+            "content": f"Mensaje {i}",
+            "timestamp": f"2023-06-15T14:30:0{i}Z",
+            "sender": "user" if i % 2 else "system"
+        }
+        for i in range(count)
+    ]
+    assert client.post("/api/messages/batch", json={"messages": batch}).json()["data"]["created"] == count
+    return session_id
+
+
+def test_get_messages_follows_cursor_through_session(client):
+    """Recorrer la sesión con next_cursor devuelve todos los mensajes en orden y sin repetir"""
+    session_id = _seed_session(client)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/messages/{session_id}", params=params)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        seen.extend(m["message_id"] for m in data["messages"])
+        cursor = data["pagination"]["next_cursor"]
+        if not data["pagination"]["has_more"]:
+            break
+
+    assert seen == [f"{session_id}-{i}" for i in range(5)]
+
+
+def test_get_messages_supports_offset_and_sender(client):
+    """offset y sender siguen funcionando como documenta el README"""
+    session_id = _seed_session(client)
+
+    data = client.get(f"/api/messages/{session_id}", params={"offset": 3}).json()["data"]
+    assert [m["message_id"] for m in data["messages"]] == [f"{session_id}-3", f"{session_id}-4"]
+
+    data = client.get(f"/api/messages/{session_id}", params={"sender": "user"}).json()["data"]
+    assert {m["sender"] for m in data["messages"]} == {"user"}
+    assert len(data["messages"]) == 2
+
+
+def test_get_messages_rejects_invalid_cursor(client):
+    """Un cursor manipulado responde 400"""
+    response = client.get("/api/messages/session-x", params={"cursor": "no-es-un-cursor"})
+    assert response.status_code == 400
+
+
+def test_get_messages_etag_and_invalidation(client):
+    """Una página sin cambios responde 304; escribir en la sesión invalida el caché"""
+    session_id = _seed_session(client, count=2)
+
+    first = client.get(f"/api/messages/{session_id}")
+    etag = first.headers["etag"]
+    again = client.get(f"/api/messages/{session_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    client.post("/api/messages", json={
+        "message_id": f"{session_id}-nuevo",
+        "session_id": session_id,
+        "content": "Mensaje nuevo",
+        "timestamp": "2023-06-15T14:31:00Z",
+        "sender": "user"
+    })
+    updated = client.get(f"/api/messages/{session_id}", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert len(updated.json()["data"]["messages"]) == 3
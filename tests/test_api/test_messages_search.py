@@ -0,0 +1,62 @@
+# tests/test_api/test_messages_search.py
+import uuid
+
+
+def test_search_finds_phrase_with_filters_and_cursor(client):
+    """La búsqueda encuentra la frase en todas las sesiones, filtra y pagina por cursor"""
+    token = uuid.uuid4().hex[:10]
+    batch = [
+        {
+            "message_id": f"{token}-{i}",
+            "session_id": f"session-{token}-{i % 2}",
+            "content": f"Necesito ayuda con mi tarjeta {token}" if i < 4 else f"Otro tema {token}",
+            "timestamp": f"2023-06-15T14:30:0{i}Z",
+            "sender": "user"
+        }
+        for i in range(6)
+    ]
+    client.post("/api/messages/batch", json={"messages": batch})
+
+    response = client.get("/api/messages/search", params={"q": f"tarjeta {token}", "limit": 3})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert len(data["results"]) == 3
+    assert f"[tarjeta {token}]" in data["results"][0]["snippet"]
+
+    rest = client.get("/api/messages/search", params={
+        "q": f"tarjeta {token}", "limit": 3, "cursor": data["pagination"]["next_cursor"]
+    }).json()["data"]
+    found = {r["message_id"] for r in data["results"] + rest["results"]}
+    assert found == {f"{token}-{i}" for i in range(4)}
+
+    filtered = client.get("/api/messages/search", params={
+        "q": f"tarjeta {token}", "session_id": f"session-{token}-1"
+    }).json()["data"]
+    assert {r["message_id"] for r in filtered["results"]} == {f"{token}-1", f"{token}-3"}
+
+
+def test_search_rejects_invalid_raw_query(client):
+    """Una consulta FTS5 con sintaxis inválida responde 400"""
+    response = client.get("/api/messages/search", params={"q": "AND OR (", "raw": True})
+    assert response.status_code == 400
+
+
+def test_search_includes_archived_months(client, monkeypatch, tmp_path):
+    """Un mes archivado sigue en la búsqueda (con sus filtros) hasta que la retención lo elimina"""
+    from src.database import partitions
+    from src.database.database import engine
+
+    monkeypatch.setattr(partitions.archive_store, "directory", str(tmp_path))
+    monkeypatch.setattr(partitions.archive_store, "_months", (None, frozenset()))
+    token = uuid.uuid4().hex[:10]
+    session_id = f"session-{token}"
+    client.post("/api/messages", json={
+        "message_id": f"{token}-1", "session_id": session_id, "content": f"Factura vieja {token}", "timestamp": "2015-02-10T10:00:00Z", "sender": "user"
+    })
+    partitions.archive_month(engine, partitions.archive_store, "2015-02")
+
+    results = client.get("/api/messages/search", params={"q": token, "session_id": session_id, "sender": "user"}).json()["data"]["results"]
+    assert [(r["message_id"], r["session_id"], r["timestamp"][:10]) for r in results] == [(f"{token}-1", session_id, "2015-02-10")]
+
+    partitions.drop_month(engine, partitions.archive_store, "2015-02")
+    assert client.get("/api/messages/search", params={"q": token}).json()["data"]["results"] == []
@@ -0,0 +1,97 @@
+# tests/test_api/test_messages_stream.py
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from src.services.pubsub import session_hub
+
+
+def _message(session_id, index):
+    return {
+        "message_id": f"{session_id}-{index}",
+        "session_id": session_id,
+        "content": f"Mensaje en vivo {index}",
+        "timestamp": f"2023-06-15T14:30:0{index}Z",
+        "sender": "user"
+    }
+
+
+def _wait_until_unsubscribed(timeout=5.0): # TestClient cierra el WebSocket sin esperar a que termine el endpoint
+    deadline = time.monotonic() + timeout
+    while session_hub.stats()["subscribers"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return session_hub.stats()["subscribers"]
+
+
+def test_websocket_receives_new_messages_after_commit(client):
+    """Un suscriptor WebSocket recibe el mensaje guardado con el mismo formato que POST /api/messages"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    with client.websocket_connect(f"/api/messages/{session_id}/ws") as websocket:
+        created = client.post("/api/messages", json=_message(session_id, 1))
+        frame = websocket.receive_json()
+
+    assert frame["data"] == created.json()["data"]
+    assert frame["id"]
+    assert _wait_until_unsubscribed() == 0
+
+
+def test_websocket_resumes_from_last_seen_cursor(client):
+    """Al reconectar con el último id recibido llegan solo los mensajes posteriores y luego los nuevos"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    with client.websocket_connect(f"/api/messages/{session_id}/ws") as websocket:
+        client.post("/api/messages", json=_message(session_id, 1))
+        last_seen = websocket.receive_json()["id"]
+
+    for index in (2, 3):
+        client.post("/api/messages", json=_message(session_id, index))
+
+    with client.websocket_connect(f"/api/messages/{session_id}/ws?cursor={last_seen}") as websocket:
+        replayed = [websocket.receive_json()["data"]["message_id"] for _ in range(2)]
+        client.post("/api/messages", json=_message(session_id, 4))
+        live = websocket.receive_json()["data"]["message_id"]
+
+    assert replayed == [f"{session_id}-2", f"{session_id}-3"]
+    assert live == f"{session_id}-4"
+
+
+def test_sse_stream_pushes_events_with_resumable_ids():
+    """GET /stream envía cada mensaje como evento SSE con id = cursor y libera la suscripción al desconectarse"""
+    from src.main import app
+
+    session_id = f"session-{uuid.uuid4().hex}"
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http", "root_path": "",
+        "path": f"/api/messages/{session_id}/stream", "raw_path": f"/api/messages/{session_id}/stream".encode(),
+        "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80)
+    }
+
+    async def scenario():
+        chunks = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                await chunks.put(message["body"])
+
+        async with app.router.lifespan_context(app):
+            stream = asyncio.create_task(app(scope, receive, send))
+            assert await asyncio.wait_for(chunks.get(), 5) == b": connected\n\n"
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                created = await client.post("/api/messages", json=_message(session_id, 1))
+            event = (await asyncio.wait_for(chunks.get(), 5)).decode()
+            disconnected.set()
+            await asyncio.wait_for(stream, 5)
+        return created, event
+
+    created, event = asyncio.run(scenario())
+    fields = dict(line.split(": ", 1) for line in event.strip().splitlines())
+    assert fields["event"] == "message"
+    assert json.loads(fields["data"]) == created.json()["data"]
+    assert session_hub.stats()["subscribers"] == 0
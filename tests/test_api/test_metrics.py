@@ -0,0 +1,37 @@
+# tests/test_api/test_metrics.py
+import uuid
+
+from src.core.metrics import Histogram
+
+
+def test_metrics_exposes_route_and_layer_latencies(client):
+    """/metrics expone la latencia por ruta (plantilla) y por capa"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    client.post("/api/messages", json={
+        "message_id": f"{session_id}-1",
+        "session_id": session_id,
+        "content": "Mensaje para métricas",
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "user"
+    })
+    client.get(f"/api/messages/{session_id}")
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/messages/{session_id}",status="200"}' in body
+    assert 'layer_duration_seconds_count{layer="repository",operation="save_message"}' in body
+    assert 'layer_duration_seconds_count{layer="pipeline",operation="process_message_content"}' in body
+    assert 'layer_duration_seconds_count{layer="validation",operation="_validate"}' in body
+    assert "db_pool_connections" in body
+    assert 'pipeline_stage_items_total{stage="metrics"}' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    """Los buckets del histograma son acumulativos y +Inf cuenta todas las observaciones"""
+    histogram = Histogram("h", "prueba", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    samples = {(name, labels): value for name, labels, value in histogram.samples()}
+    assert samples[("h_bucket", '{le="0.1"}')] == 1
+    assert samples[("h_bucket", '{le="1.0"}')] == 2
+    assert samples[("h_bucket", '{le="+Inf"}')] == 3
+    assert samples[("h_count", "")] == 3
@@ -0,0 +1,48 @@
+import pstats
+import uuid
+
+from src.core.config import settings
+
+
+def create_message(client, session_id):
+    return client.post("/api/messages", json={
+        "message_id": f"{session_id}-{uuid.uuid4().hex[:8]}",
+        "session_id": session_id,
+        "content": "Mensaje para perfilar",
+        "timestamp": "2023-06-15T14:30:00Z",
+        "sender": "user"
+    })
+
+
+def test_admin_header_saves_request_profile(client, monkeypatch, tmp_path):
+    """Con el header X-Profile correcto se guarda un .pstats con las llamadas del servicio y el repositorio"""
+    monkeypatch.setattr(settings, "profile_token", "secreto")
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    session_id = f"session-{uuid.uuid4().hex}"
+    create_message(client, session_id)
+
+    response = client.get(f"/api/messages/{session_id}", headers={"X-Profile": "secreto"})
+    assert response.status_code == 200
+    filename = response.headers["x-profile-file"]
+
+    functions = {name for _, _, name in pstats.Stats(str(tmp_path / filename)).stats}
+    assert "get_messages" in functions
+    assert "get_session_messages" in functions
+
+
+def test_wrong_token_is_not_profiled(client, monkeypatch, tmp_path):
+    """Un token incorrecto no activa el perfilado"""
+    monkeypatch.setattr(settings, "profile_token", "secreto")
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    response = client.get(f"/api/messages/session-{uuid.uuid4().hex}?profile=otro")
+    assert "x-profile-file" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sample_rate_profiles_requests_automatically(client, monkeypatch, tmp_path):
+    """PROFILE_SAMPLE_RATE=1 perfila todas las peticiones sin flag"""
+    monkeypatch.setattr(settings, "profile_sample_rate", 1)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    response = create_message(client, f"session-{uuid.uuid4().hex}")
+    assert response.status_code == 201
+    assert (tmp_path / response.headers["x-profile-file"]).exists()
@@ -0,0 +1,73 @@
+# tests/test_api/test_sessions_stats.py
+import uuid
+
+from src.database import partitions
+from src.database.database import engine
+from src.database.session_stats import rebuild_session_stats
+
+
+def _message(session_id, index, content, sender="user", timestamp="2023-06-15T14:30:00Z"):
+    return {
+        "message_id": f"{session_id}-{index}",
+        "session_id": session_id,
+        "content": content,
+        "timestamp": timestamp,
+        "sender": sender
+    }
+
+
+def test_stats_follow_single_and_batch_inserts(client):
+    """Cada INSERT (individual o en lote) actualiza session_stats; los duplicados no cuentan"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    client.post("/api/messages", json=_message(session_id, 1, "Hola mundo", timestamp="2023-06-15T14:30:00Z"))
+    client.post("/api/messages", json=_message(session_id, 2, "Hola, ¿cómo estás?", "system", "2023-06-15T14:31:00Z"))
+    client.post("/api/messages/batch", json={"messages": [
+        _message(session_id, 3, "Tres palabras aquí", timestamp="2023-06-15T14:29:00Z"),
+        _message(session_id, 1, "Duplicado")
+    ]})
+
+    response = client.get(f"/api/sessions/{session_id}/stats")
+    assert response.status_code == 200
+    stats = response.json()["data"]
+    assert stats["message_count"] == 3
+    assert stats["word_count"] == 2 + 3 + 3
+    assert stats["character_count"] == len("Hola mundo") + len("Hola, ¿cómo estás?") + len("Tres palabras aquí")
+    assert stats["by_sender"] == {"user": 2, "system": 1}
+    assert stats["first_timestamp"].startswith("2023-06-15T14:29:00")
+    assert stats["last_timestamp"].startswith("2023-06-15T14:31:00")
+
+    assert client.get(f"/api/sessions/{uuid.uuid4().hex}/stats").status_code == 404
+
+
+def test_sessions_are_listed_by_activity(client):
+    """GET /api/sessions ordena por cantidad de mensajes o por actividad reciente"""
+    busy, quiet = f"session-{uuid.uuid4().hex}", f"session-{uuid.uuid4().hex}"
+    client.post("/api/messages/batch", json={"messages": [_message(busy, index, "Hola") for index in range(3)]})
+    client.post("/api/messages", json=_message(quiet, 0, "Hola"))
+
+    sessions = client.get("/api/sessions", params={"limit": 1000}).json()["data"]["sessions"]
+    counts = [session["message_count"] for session in sessions]
+    assert counts == sorted(counts, reverse=True)
+    ids = [session["session_id"] for session in sessions]
+    assert ids.index(busy) < ids.index(quiet)
+
+    recent = client.get("/api/sessions", params={"order": "recent", "limit": 1000}).json()["data"]["sessions"]
+    last = [session["last_timestamp"] for session in recent]
+    assert last == sorted(last, reverse=True)
+
+
+def test_rebuild_matches_incremental_stats_including_archived_months(client, monkeypatch, tmp_path):
+    """La reconstrucción desde messages y las particiones archivadas da el mismo resultado que las actualizaciones incrementales"""
+    monkeypatch.setattr(partitions.archive_store, "directory", str(tmp_path))
+    monkeypatch.setattr(partitions.archive_store, "_months", (None, frozenset()))
+    session_id = f"session-{uuid.uuid4().hex}"
+    for index, timestamp in enumerate(["2017-03-10T10:00:00Z", "2017-03-20T10:00:00Z", "2017-04-01T09:00:00Z"]):
+        client.post("/api/messages", json=_message(session_id, index, f"Mensaje número {index}", timestamp=timestamp))
+    partitions.archive_month(engine, partitions.archive_store, "2017-03")
+    before = client.get(f"/api/sessions/{session_id}/stats").json()["data"]
+
+    with engine.begin() as conn:
+        rebuild_session_stats(conn, partitions.archive_store)
+
+    assert client.get(f"/api/sessions/{session_id}/stats").json()["data"] == before
+    assert before["message_count"] == 3
@@ -0,0 +1,61 @@
+# tests/test_api/test_startup.py
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = 300 # Tiempo propio de los módulos src.* al importar src.main (fastapi, pydantic y sqlalchemy no cuentan)
+
+
+def test_import_is_lazy_and_within_budget(tmp_path):
+    """Importar src.main no crea la base de datos ni carga dependencias opcionales, y respeta el presupuesto de tiempo; create_app todavía puede cambiar la URL"""
+    database = tmp_path / "startup.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", IDEMPOTENCY_SQLITE="true") # El almacén de idempotencia en SQLite tampoco abre la base al importar
+    code = (
+        "import sys, src.main; print(','.join(m for m in ('aiosqlite', 'multiprocessing') if m in sys.modules)); "
+        f"src.main.create_app(src.main.settings.model_copy(update={{'database_url': 'sqlite:///{tmp_path / 'other.db'}'}}))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    )
+
+    own_us = sum(
+        int(match.group(1))
+        for match in re.finditer(r"^import time:\s+(\d+) \|\s+\d+ \|\s+src(\.|$)", result.stderr, re.MULTILINE)
+    )
+    assert not database.exists()
+    assert result.stdout.strip() == ""
+    assert own_us / 1000 < IMPORT_BUDGET_MS
+
+
+def test_create_app_applies_its_settings(tmp_path):
+    """create_app con otra configuración la usa en el pool, los PRAGMA, el caché, el guard, la idempotencia y el hub"""
+    code = f"""
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+import src.main
+from src.database import database
+from src.repositories import cache, idempotency
+from src.services import duplicate_guard, pubsub
+app_settings = src.main.settings.model_copy(update=dict(
+    database_url='sqlite:///{tmp_path / "custom.db"}', db_pool_size=2, sqlite_busy_timeout_ms=1234, cache_enabled=False,
+    duplicate_guard_enabled=False, idempotency_sqlite=True, stream_buffer_size=7
+))
+with TestClient(src.main.create_app(app_settings)):
+    with database.get_engine().connect() as conn:
+        busy_timeout = conn.execute(text('PRAGMA busy_timeout')).scalar()
+    print(database.get_engine().pool.size(), busy_timeout, cache.message_cache, duplicate_guard.duplicate_guard,
+          type(idempotency.idempotency_store).__name__, pubsub.session_hub.buffer_size)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    )
+    assert result.stdout.split() == ["2", "1234", "None", "None", "SQLiteIdempotencyStore", "7"]
+
+
+def test_client_runs_lifespan(client):
+    """El lifespan deja el esquema listo antes de la primera petición"""
+    response = client.get("/api/messages/session-startup")
+    assert response.status_code == 200
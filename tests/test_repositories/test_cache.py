@@ -0,0 +1,62 @@
+# tests/test_repositories/test_cache.py
+import time
+
+from src.repositories.cache import LRUCache
+
+
+def test_lru_cache_evicts_by_size_and_expires_by_ttl():
+    """El caché respeta el límite en bytes (LRU) y el TTL"""
+    cache = LRUCache(max_bytes=40, ttl=0.05)
+    cache.set("a", ["x" * 10], "s1")
+    cache.set("b", ["y" * 10], "s1")
+    assert cache.get("a") == ["x" * 10] # "a" pasa a ser la más reciente
+    cache.set("c", ["z" * 10], "s2") # Excede 40 bytes: se desaloja "b"
+
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_lru_cache_invalidates_only_one_session():
+    """Invalidar una sesión no borra las páginas de otras sesiones"""
+    cache = LRUCache()
+    cache.set(("s1", 1), [1], "s1")
+    cache.set(("s1", 2), [2], "s1")
+    cache.set(("s2", 1), [3], "s2")
+
+    cache.invalidate_session("s1")
+    assert cache.get(("s1", 1)) is None
+    assert cache.get(("s1", 2)) is None
+    assert cache.get(("s2", 1)) == [3]
+
+
+def test_page_read_during_a_write_is_not_cached(client):
+    """Una página leída antes del commit de un escritor no queda en caché si la invalidación llega antes de guardarla"""
+    import uuid
+    from datetime import datetime
+
+    from src.database.database import get_sessionmaker
+    from src.repositories.message_repository import MessageRepository
+
+    session_id = f"session-{uuid.uuid4().hex}"
+    row = lambda n: {"message_id": f"{session_id}-{n}", "session_id": session_id, "content": "Hola", "timestamp": datetime(2023, 6, 15, 14, 30, n), "sender": "user", "message_metadata": None}
+
+    class WriteBeforeSet(LRUCache): # El escritor hace commit e invalida entre la consulta del lector y su set
+        def set(self, key, value, session_id, generation=None):
+            if not writes:
+                writes.append(MessageRepository(db, self).save_message(row(2)))
+            super().set(key, value, session_id, generation)
+
+    writes = []
+    cache = WriteBeforeSet()
+    db = get_sessionmaker()()
+    try:
+        repository = MessageRepository(db, cache)
+        repository.save_message(row(1))
+        assert [message["message_id"] for message in repository.get_session_messages(session_id, 10)] == [f"{session_id}-1"] # Leída antes del commit
+        assert cache.stats()["entries"] == 0 # La página vieja se descartó
+        assert len(repository.get_session_messages(session_id, 10)) == 2
+    finally:
+        db.close()
@@ -0,0 +1,116 @@
+# tests/test_repositories/test_compression.py
+import sqlite3
+import uuid
+from datetime import datetime
+
+from sqlalchemy import insert, select, text
+
+from src.database.compression import CompressedContent, ContentCodec, codec_of, compact, content_text, train_dictionary
+from src.database.database import build_engine, engine
+from src.database.models import MessageModel
+from src.database.schema import ensure_schema
+
+PASTED = "Hola, necesito ayuda con mi tarjeta, no me deja hacer pagos desde la aplicación. " * 40
+
+
+def test_codec_compresses_only_long_compressible_content():
+    """Los contenidos cortos o incompresibles quedan como texto; los largos se recuperan igual y el diccionario ahorra más"""
+    plain = ContentCodec(min_bytes=256)
+    trained = ContentCodec(min_bytes=256)
+    trained.add_dictionaries([(1, train_dictionary([PASTED, "Gracias, ya funciona la tarjeta"] * 10))])
+    long_text = "Gracias, ya funciona la tarjeta. " + PASTED[:600] + "¿Algo más?"
+
+    assert plain.encode("Hola") == "Hola"
+    assert ContentCodec(min_bytes=4).encode("Hola, ¿qué tal?") == "Hola, ¿qué tal?" # Comprimido no ocuparía menos
+
+    without_dict, with_dict = plain.encode(long_text), trained.encode(long_text)
+    assert isinstance(with_dict, bytes) and with_dict[0] == 1
+    assert len(with_dict) < len(without_dict) < len(long_text.encode("utf-8"))
+    assert plain.decode(without_dict) == trained.decode(with_dict) == long_text
+    assert trained.stats()["bytes_saved"] == len(long_text.encode("utf-8")) - len(with_dict)
+
+
+def test_long_content_is_stored_compressed_and_read_transparently(client):
+    """Un mensaje largo se guarda como BLOB pero la lectura, la búsqueda y la exportación ven el texto"""
+    token = uuid.uuid4().hex[:10]
+    content = f"{PASTED} código {token}"
+    session_id = f"session-{token}"
+    client.post("/api/messages", json={
+        "message_id": f"{token}-1", "session_id": session_id, "content": content, "timestamp": "2023-06-15T14:30:00Z", "sender": "user"
+    })
+
+    with engine.connect() as conn:
+        stored = conn.execute(text("SELECT typeof(content), length(content) FROM messages WHERE message_id = :id"), {"id": f"{token}-1"}).one()
+    assert stored[0] == "blob" and stored[1] < len(content) / 5
+
+    assert client.get(f"/api/messages/{session_id}").json()["data"]["messages"][0]["content"] == content
+    results = client.get("/api/messages/search", params={"q": token}).json()["data"]["results"]
+    assert [result["message_id"] for result in results] == [f"{token}-1"]
+    assert content in client.get(f"/api/messages/{session_id}/export").content.decode("utf-8")
+
+
+def test_dictionary_trained_while_running_is_loaded_on_read(client):
+    """Un BLOB compactado con un diccionario entrenado por otro proceso se lee (y se indexa) sin reconectar"""
+    token = uuid.uuid4().hex[:10]
+    content = f"{PASTED} nuevo {token}"
+    session_id = f"session-{token}"
+    client.post("/api/messages", json={
+        "message_id": f"{token}-1", "session_id": session_id, "content": "corto", "timestamp": "2023-06-15T14:30:00Z", "sender": "user"
+    })
+    zdict = train_dictionary([PASTED] * 3)
+    other = sqlite3.connect(engine.url.database) # python -m src.database.compression train desde otro proceso
+    with other:
+        dictionary_id = other.execute("INSERT INTO content_dictionaries (zdict) VALUES (?)", (zdict,)).lastrowid
+    other.close()
+    trainer = ContentCodec(min_bytes=256)
+    trainer.add_dictionaries([(dictionary_id, zdict)])
+
+    codec_of(engine.dialect).dictionaries.pop(dictionary_id, None) # Las conexiones del pool se abrieron antes del diccionario
+    with engine.begin() as conn: # compact: el trigger de FTS descomprime con message_text()
+        conn.execute(text("UPDATE messages SET content = :content WHERE message_id = :id"), {"content": trainer.encode(content), "id": f"{token}-1"})
+    codec_of(engine.dialect).dictionaries.pop(dictionary_id, None)
+
+    assert client.get(f"/api/messages/{session_id}").json()["data"]["messages"][0]["content"] == content
+    results = client.get("/api/messages/search", params={"q": token}).json()["data"]["results"]
+    assert [result["message_id"] for result in results] == [f"{token}-1"]
+
+
+def temporary_engine(path):
+    engine = build_engine(f"sqlite:///{path}")
+    ensure_schema(engine)
+    return engine
+
+
+def test_dictionaries_are_per_database(tmp_path):
+    """Cada base usa sus propios ids de diccionario y las lecturas descomprimen solo al pedir el texto"""
+    trained, plain = temporary_engine(tmp_path / "trained.db"), temporary_engine(tmp_path / "plain.db")
+    codec_of(trained.dialect).add_dictionaries([(1, train_dictionary([PASTED] * 3))])
+    row = {"message_id": "m-1", "session_id": "s-1", "content": PASTED, "timestamp": datetime(2023, 6, 15), "sender": "user"}
+    for target in (trained, plain):
+        with target.begin() as conn:
+            conn.execute(insert(MessageModel), [row])
+
+    with trained.connect() as conn, plain.connect() as other:
+        assert conn.scalar(text("SELECT hex(substr(content, 1, 1)) FROM messages")) == "01"
+        assert other.scalar(text("SELECT hex(substr(content, 1, 1)) FROM messages")) == "00" # La otra base no conoce el diccionario 1
+        stored = other.scalar(select(MessageModel.content))
+    assert isinstance(stored, CompressedContent) and stored.text is None
+    assert content_text(stored) == PASTED
+    trained.dispose()
+    plain.dispose()
+
+
+def test_compact_skips_incompressible_content(tmp_path):
+    """compact comprime los textos largos una sola vez y no reescribe los incompresibles"""
+    engine = temporary_engine(tmp_path / "compact.db")
+    codec_of(engine.dialect).min_bytes = 16
+    with engine.begin() as conn: # Guardados como texto (ej: antes de activar la compresión)
+        conn.execute(text("INSERT INTO messages (message_id, session_id, content, timestamp, sender) VALUES (:id, 's-1', :content, '2023-06-15 00:00:00.000000', 'user')"), [
+            {"id": "long", "content": PASTED}, {"id": "incompressible", "content": "Hola, ¿qué tal?"}
+        ])
+
+    assert compact(engine) == (2, 1)
+    assert compact(engine) == (1, 0) # Solo vuelve a revisar el incompresible, sin reescribirlo
+    with engine.connect() as conn:
+        assert dict(conn.execute(text("SELECT message_id, typeof(content) FROM messages")).all()) == {"long": "blob", "incompressible": "text"}
+    engine.dispose()
@@ -0,0 +1,24 @@
+# tests/test_repositories/test_database.py
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from src.database.database import build_engine
+
+
+def test_file_engine_uses_pool_and_pragmas(tmp_path):
+    """Las bases en archivo usan pool de conexiones, WAL y los PRAGMA configurados"""
+    engine = build_engine(f"sqlite:///{tmp_path}/pragmas.db")
+    assert isinstance(engine.pool, QueuePool)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+    engine.dispose()
+
+
+def test_memory_engine_shares_single_connection():
+    """Las bases en memoria usan una única conexión para no perder las tablas"""
+    engine = build_engine("sqlite://")
+    assert isinstance(engine.pool, StaticPool)
@@ -0,0 +1,33 @@
+# tests/test_repositories/test_idempotency.py
+from src.database.database import Base, build_engine
+from src.repositories.idempotency import MemoryIdempotencyStore, SQLiteIdempotencyStore, StoredResponse
+
+
+def test_memory_store_expires_and_respects_size_limit():
+    """Las respuestas vencen por TTL y las menos usadas se desalojan al superar el tamaño máximo"""
+    store = MemoryIdempotencyStore(max_bytes=400, ttl=60)
+    store.set("a", StoredResponse("f", 201, b"x" * 100, "application/json"))
+    store.set("b", StoredResponse("f", 201, b"x" * 100, "application/json"))
+    store.set("c", StoredResponse("f", 201, b"x" * 100, "application/json"))
+    assert store.get("a") is None
+    assert store.get("c").body == b"x" * 100
+
+    store.set("d", StoredResponse("f", 201, b"{}", "application/json"), ttl=-1)
+    assert store.get("d") is None
+
+
+def test_sqlite_store_is_shared_between_processes(tmp_path):
+    """Otro proceso (otra memoria sobre la misma base) repite la respuesta guardada en idempotency_keys"""
+    engine = build_engine(f"sqlite:///{tmp_path}/idempotency.db")
+    Base.metadata.create_all(bind=engine)
+    response = StoredResponse("huella", 201, b'{"status":"success"}', "application/json", {"location": "/api/messages/s-1"})
+
+    SQLiteIdempotencyStore(engine, MemoryIdempotencyStore()).set("POST /api/messages:k1", response)
+    other = SQLiteIdempotencyStore(engine, MemoryIdempotencyStore())
+    assert other.get("POST /api/messages:k1") == response
+    assert other.get("POST /api/messages:k2") is None
+
+    expired = SQLiteIdempotencyStore(engine, MemoryIdempotencyStore(), ttl=-1)
+    expired.set("POST /api/messages:k3", response)
+    assert SQLiteIdempotencyStore(engine, MemoryIdempotencyStore()).get("POST /api/messages:k3") is None
+    engine.dispose()
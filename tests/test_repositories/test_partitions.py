@@ -0,0 +1,95 @@
+# tests/test_repositories/test_partitions.py
+import json
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from src.database import partitions
+from src.database.database import engine
+from src.repositories import cache
+
+
+@pytest.fixture
+def archive(monkeypatch, tmp_path):
+    """Particiones archivadas en un directorio temporal"""
+    monkeypatch.setattr(partitions.archive_store, "directory", str(tmp_path))
+    monkeypatch.setattr(partitions.archive_store, "_months", (None, frozenset()))
+    return partitions.archive_store
+
+
+def post_messages(client, session_id, timestamps):
+    for index, timestamp in enumerate(timestamps):
+        response = client.post("/api/messages", json={
+            "message_id": f"{session_id}-{index}",
+            "session_id": session_id,
+            "content": f"Mensaje {index} de la sesión",
+            "timestamp": timestamp,
+            "sender": "user" if index % 2 else "system"
+        })
+        assert response.status_code == 201
+
+
+def test_archived_month_is_still_readable(client, archive):
+    """Un mes archivado sale de la tabla principal pero las lecturas, la paginación y la exportación lo siguen viendo"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    post_messages(client, session_id, ["2019-01-10T10:00:00Z", "2019-01-31T23:59:59Z", "2019-02-01T00:00:00Z", "2019-02-02T08:00:00Z"])
+
+    assert partitions.archive_month(engine, archive, "2019-01") >= 2
+    path = archive.path("2019-01")
+    assert not os.access(path, os.W_OK) or os.geteuid() == 0 # Solo lectura (root ignora los permisos)
+    with engine.connect() as conn:
+        hot = conn.execute(text("SELECT count(*) FROM messages WHERE session_id = :s"), {"s": session_id}).scalar()
+    assert hot == 2
+
+    first = client.get(f"/api/messages/{session_id}", params={"limit": 3}).json()["data"]
+    assert [m["message_id"] for m in first["messages"]] == [f"{session_id}-{i}" for i in range(3)]
+    assert first["messages"][0]["metadata"]["word_count"] == 5 # La metadata se descomprime igual que se guardó
+    second = client.get(f"/api/messages/{session_id}", params={"limit": 3, "cursor": first["pagination"]["next_cursor"]}).json()["data"]
+    assert [m["message_id"] for m in second["messages"]] == [f"{session_id}-3"]
+
+    exported = [json.loads(line) for line in client.get(f"/api/messages/{session_id}/export").text.splitlines()]
+    assert [m["message_id"] for m in exported] == [f"{session_id}-{i}" for i in range(4)]
+
+    duplicate = client.post("/api/messages", json={
+        "message_id": f"{session_id}-0",
+        "session_id": session_id,
+        "content": "Repetido",
+        "timestamp": "2019-01-10T10:00:00Z",
+        "sender": "user"
+    })
+    assert duplicate.status_code == 409
+
+
+def test_late_messages_are_merged_and_dropped_with_partition(client, archive):
+    """Un mensaje tardío de un mes archivado se combina al volver a archivar; eliminar el mes borra el archivo, las estadísticas y las páginas en caché"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    post_messages(client, session_id, ["2018-05-01T10:00:00Z"])
+    partitions.archive_month(engine, archive, "2018-05")
+    post_messages(client, f"{session_id}-late", ["2018-05-02T10:00:00Z"])
+    partitions.archive_month(engine, archive, "2018-05")
+
+    assert archive.existing_ids("2018-05", [f"{session_id}-0", f"{session_id}-late-0"]) == {f"{session_id}-0", f"{session_id}-late-0"}
+
+    assert len(client.get(f"/api/messages/{session_id}").json()["data"]["messages"]) == 1 # Página guardada en el caché
+    assert client.get(f"/api/sessions/{session_id}/stats").json()["data"]["message_count"] == 1
+
+    partitions.drop_month(engine, archive, "2018-05", cache.message_cache)
+    assert "2018-05" not in archive.months()
+    assert client.get(f"/api/messages/{session_id}").json()["data"]["messages"] == []
+    assert client.get(f"/api/sessions/{session_id}/stats").status_code == 404
+
+
+def test_drop_month_subtracts_archived_stats(client, archive):
+    """Eliminar un mes resta de las estadísticas los totales guardados al archivar y corre el primer timestamp al mes siguiente"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    post_messages(client, session_id, ["2017-03-01T10:00:00Z", "2017-03-02T10:00:00Z", "2017-04-01T10:00:00Z"])
+    partitions.archive_month(engine, archive, "2017-03")
+    with engine.connect() as conn:
+        archived = conn.execute(text("SELECT message_count, word_count FROM archived_sessions WHERE session_id = :s"), {"s": session_id}).one()
+    assert tuple(archived) == (2, 10)
+
+    partitions.drop_month(engine, archive, "2017-03")
+    stats = client.get(f"/api/sessions/{session_id}/stats").json()["data"]
+    assert (stats["message_count"], stats["word_count"], stats["first_timestamp"][:10]) == (1, 5, "2017-04-01")
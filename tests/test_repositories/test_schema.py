@@ -0,0 +1,97 @@
+# tests/test_repositories/test_schema.py
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from src.database.database import build_engine
+from src.database.schema import MIGRATIONS, SCHEMA_VERSION, ensure_schema
+from src.repositories.message_repository import MessageRepository
+
+
+def test_schema_is_migrated_once_and_then_only_checked(tmp_path):
+    """Una base nueva se migra hasta SCHEMA_VERSION; los arranques siguientes solo leen PRAGMA user_version"""
+    engine = build_engine(f"sqlite:///{tmp_path}/schema.db")
+    assert ensure_schema(engine) == list(range(1, SCHEMA_VERSION + 1))
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    assert ensure_schema(engine) == []
+    assert statements == ["PRAGMA user_version"]
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+        assert conn.execute(text("SELECT count(*) FROM messages")).scalar() == 0
+    engine.dispose()
+
+
+def test_outdated_schema_fails_without_auto_migrate(tmp_path):
+    """Con SCHEMA_AUTO_MIGRATE=false el arranque no modifica una base atrasada"""
+    engine = build_engine(f"sqlite:///{tmp_path}/outdated.db")
+    with pytest.raises(RuntimeError):
+        ensure_schema(engine, migrate=False)
+    engine.dispose()
+
+
+def _legacy_v1_database(engine): # Base en la versión 1: messages con la metadata en una columna JSON y sin session_stats
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE messages (message_id VARCHAR NOT NULL PRIMARY KEY, session_id VARCHAR, content VARCHAR, "
+            "timestamp DATETIME, sender VARCHAR, message_metadata JSON)"
+        ))
+        MIGRATIONS[0](conn)
+        conn.execute(text("DROP TABLE session_stats")) # La versión 1 no tenía la tabla
+        conn.execute(text(
+            "INSERT INTO messages (message_id, session_id, content, timestamp, sender, message_metadata) VALUES "
+            "('m1', 's1', 'Hola mundo', '2023-06-15 14:30:00.000000', 'user', "
+            "'{\"word_count\": 2, \"character_count\": 10, \"is_filtered\": false, \"pii_types\": [\"email\", \"phone\"], \"language\": \"es\", "
+            "\"links\": [], \"sentiment\": \"positive\", \"processed_at\": \"2023-06-15T14:30:01.250000Z\"}'), "
+            "('m2', 's1', 'Hola', '2023-06-15 14:31:00.000000', 'system', '{\"word_count\": 1, \"character_count\": 4}')"
+        ))
+        conn.execute(text("PRAGMA user_version = 1"))
+
+
+def test_migrations_fill_session_stats_and_metadata_columns(tmp_path):
+    """Una base en la versión 1 obtiene session_stats y la metadata repartida en columnas tipadas sin perder datos"""
+    engine = build_engine(f"sqlite:///{tmp_path}/v1.db")
+    _legacy_v1_database(engine)
+
+    assert ensure_schema(engine) == list(range(2, SCHEMA_VERSION + 1))
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT message_count, word_count, user_count, system_count FROM session_stats WHERE session_id = 's1'")).one()
+        assert tuple(row) == (2, 3, 1, 1)
+        assert "message_metadata" not in {column[1] for column in conn.execute(text("PRAGMA table_info(messages)"))}
+        plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT message_id FROM messages WHERE word_count > 1")).all()
+        assert "ix_messages_word_count" in " ".join(step[-1] for step in plan)
+
+    with Session(engine) as db:
+        rows = MessageRepository(db).get_session_messages("s1", 10)
+    assert rows[0]["message_metadata"] == {
+        "word_count": 2, "character_count": 10, "is_filtered": False, "pii_types": ["email", "phone"], "language": "es",
+        "links": [], "sentiment": "positive", "processed_at": "2023-06-15T14:30:01.250000Z"
+    }
+    with engine.connect() as conn: # Solo la salida de etapas propias queda en JSON
+        assert conn.execute(text("SELECT metadata_extra FROM messages ORDER BY message_id")).scalars().all() == ['{"sentiment": "positive"}', None]
+    assert rows[1]["message_metadata"] == {"word_count": 1, "character_count": 4}
+    engine.dispose()
+
+
+def test_baseline_indexes_existing_messages(tmp_path):
+    """Una base anterior a FTS5 queda con sus mensajes en el índice de búsqueda al migrar"""
+    engine = build_engine(f"sqlite:///{tmp_path}/v0.db")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE messages (message_id VARCHAR NOT NULL PRIMARY KEY, session_id VARCHAR, content VARCHAR, "
+            "timestamp DATETIME, sender VARCHAR, message_metadata JSON)"
+        ))
+        conn.execute(text(
+            "INSERT INTO messages (message_id, session_id, content, timestamp, sender) VALUES "
+            "('m1', 's1', 'Hola mundo', '2023-06-15 14:30:00.000000', 'user'), ('m2', 's1', 'Adiós', '2023-06-15 14:31:00.000000', 'system')"
+        ))
+
+    assert ensure_schema(engine) == list(range(1, SCHEMA_VERSION + 1))
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT message_id FROM messages_fts WHERE messages_fts MATCH 'mundo'")).scalars().all() == ["m1"]
+        MIGRATIONS[0](conn) # Idempotente: no vuelve a indexar los mensajes
+        assert conn.execute(text("SELECT count(*) FROM messages_fts")).scalar() == 2
+        assert conn.execute(text("SELECT count(*) FROM messages_fts_rowids")).scalar() == 2
+    engine.dispose()
@@ -0,0 +1,53 @@
+# tests/test_services/test_async_message_service.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.database.database import Base, build_async_engine
+from src.domain.schemas import MessageSchema
+from src.repositories.message_repository import AsyncMessageRepository
+from src.services.message_service import AsyncMessageService
+
+
+def _message(message_id, index=0):
+    return {
+        "message_id": message_id,
+        "session_id": "session-async",
+        "content": f"Mensaje asíncrono {index}",
+        "timestamp": f"2023-06-15T14:30:0{index}Z",
+        "sender": "user"
+    }
+
+
+async def _run(tmp_path, scenario):
+    engine = build_async_engine(f"sqlite:///{tmp_path}/async.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            return await scenario(AsyncMessageService(AsyncMessageRepository(db)))
+    finally:
+        await engine.dispose()
+
+
+def test_async_service_saves_and_reads_messages(tmp_path):
+    """El servicio asíncrono guarda, detecta duplicados y pagina igual que el síncrono"""
+    async def scenario(service):
+        data = await service.process_message(MessageSchema(**_message("async-0")))
+        assert data["message_metadata"]["word_count"] == 3
+
+        with pytest.raises(HTTPException) as exc:
+            await service.process_message(MessageSchema(**_message("async-0")))
+        assert exc.value.status_code == 409
+
+        results = await service.process_batch([_message("async-0"), _message("async-1", 1), _message("async-2", 2)])
+        assert [r["status"] for r in results] == ["duplicate", "created", "created"]
+
+        page = await service.get_messages("session-async", limit=2)
+        assert [m["message_id"] for m in page["messages"]] == ["async-0", "async-1"]
+        page = await service.get_messages("session-async", limit=2, cursor=page["pagination"]["next_cursor"])
+        assert [m["message_id"] for m in page["messages"]] == ["async-2"]
+
+    asyncio.run(_run(tmp_path, scenario))
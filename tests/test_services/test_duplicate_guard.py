@@ -0,0 +1,66 @@
+# tests/test_services/test_duplicate_guard.py
+import pytest
+from fastapi import HTTPException
+
+from src.domain.schemas import MessageSchema
+from src.services.duplicate_guard import DUPLICATE, MAYBE, NEW, DuplicateGuard, ScalableBloomFilter
+from src.services.message_service import MessageService
+
+
+class CountingRepository: # Repositorio en memoria que cuenta las escrituras y lecturas
+    def __init__(self):
+        self.ids = set()
+        self.saves = 0
+        self.lookups = 0
+
+    def exists(self, message_id):
+        self.lookups += 1
+        return message_id in self.ids
+
+    def save_message(self, data):
+        self.saves += 1
+        if data["message_id"] in self.ids:
+            raise ValueError("El message_id ya existe")
+        self.ids.add(data["message_id"])
+
+
+def _message(message_id):
+    return MessageSchema(
+        message_id=message_id, session_id="session-guard", content="Hola", timestamp="2023-06-15T14:30:00Z", sender="user"
+    )
+
+
+def test_scalable_bloom_filter_grows_without_false_negatives():
+    """El filtro agrega capas al llenarse, nunca olvida una clave y mantiene acotados los falsos positivos"""
+    bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"msg-{i}")
+
+    assert len(bloom.filters) > 1
+    assert all(f"msg-{i}" in bloom for i in range(5000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives / 10000 < 0.02
+
+
+def test_guard_rejects_recent_repeats_and_confirms_bloom_hits():
+    """Un id reciente es duplicado seguro; uno que solo está en el filtro se confirma en la base de datos"""
+    guard = DuplicateGuard(capacity=100, error_rate=0.01, recent_size=1)
+    assert guard.check("a") == NEW
+    guard.remember(["a"])
+    assert guard.check("a") == DUPLICATE
+    guard.remember(["b"]) # "a" sale del LRU pero sigue en el filtro
+    assert guard.check("a") == MAYBE
+
+
+def test_service_skips_write_transaction_for_known_duplicates():
+    """Un reintento del mismo message_id se rechaza con 409 sin volver a escribir"""
+    repository = CountingRepository()
+    service = MessageService(repository, guard=DuplicateGuard(capacity=100, recent_size=10))
+
+    service.process_message(_message("msg-1"))
+    with pytest.raises(HTTPException) as exc:
+        service.process_message(_message("msg-1"))
+
+    assert exc.value.status_code == 409
+    assert repository.saves == 1
+    assert repository.lookups == 0
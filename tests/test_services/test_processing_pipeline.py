@@ -0,0 +1,73 @@
+# tests/test_services/test_processing_pipeline.py
+import pytest
+
+from src.services.processing_pipeline import (
+    ProcessingPipeline, build_pipeline, filter_stage, links_stage, metrics_stage, process_batch_content, process_message_content
+)
+
+
+def test_batch_matches_single_message_processing():
+    """Procesar un lote da la misma metadata que procesar mensaje por mensaje"""
+    contents = [
+        "Hola, ¿cómo puedo ayudarte hoy?",
+        "Escríbeme a ana@example.com o visita https://example.com/ayuda",
+        "You idiot",
+        ""
+    ]
+    batch = process_batch_content(contents)
+    for content, metadata in zip(contents, batch):
+        single = process_message_content(content)
+        single.pop("processed_at"), metadata.pop("processed_at")
+        assert single == metadata
+
+    assert batch[0]["word_count"] == 5
+    assert batch[1]["pii_types"] == ["email"]
+    assert batch[1]["links"] == ["https://example.com/ayuda"]
+    assert batch[2]["is_filtered"] is True
+
+
+def test_separator_inside_a_message_does_not_shift_results():
+    """Un \\x1f enviado por el cliente dentro de un mensaje no corre las marcas del lote a otros mensajes"""
+    contents = ["a\x1fb hola", "the cat is here", "you idiot", "hola como estas", "ver https://example.com\x1fhttps://otro.com"]
+    batch = [dict(metadata, processed_at=None) for metadata in process_batch_content(contents)]
+    assert [metadata["is_filtered"] for metadata in batch] == [False, False, True, False, False]
+    assert [metadata["language"] for metadata in batch[:4]] == ["es", "en", "en", "es"]
+    assert batch[4]["links"] == ["https://example.com", "https://otro.com"]
+    assert batch == [dict(process_message_content(content), processed_at=None) for content in contents]
+
+
+def test_custom_stages_and_timings():
+    """Las etapas registradas se combinan en orden y registran sus tiempos"""
+    pipeline = ProcessingPipeline()
+    pipeline.register("metrics", metrics_stage)
+
+    @pipeline.stage("shout")
+    def shout_stage(contents):
+        return [{"is_shouting": content.isupper()} for content in contents]
+
+    result = pipeline.run(["HOLA", "hola"])
+    assert [r["is_shouting"] for r in result] == [True, False]
+    assert result[0]["word_count"] == 1
+    assert pipeline.timings()["shout"]["items"] == 2
+
+
+def test_expensive_stage_runs_in_process_pool():
+    """Una etapa cuyo costo estimado supera el umbral se reparte en el pool de procesos"""
+    pipeline = ProcessingPipeline(offload_threshold_ms=0, workers=2)
+    pipeline.register("filter", filter_stage)
+    pipeline.register("links", links_stage, offload=False)
+    contents = [f"mensaje {i} https://example.com/{i}" for i in range(10)]
+    try:
+        pipeline.run(contents) # Primera ejecución: mide el costo
+        result = pipeline.run(contents) # Segunda: filter supera el umbral y va al pool
+        assert pipeline._executor is not None
+        assert [r["links"] for r in result] == [[f"https://example.com/{i}"] for i in range(10)]
+        assert all(r["is_filtered"] is False for r in result)
+    finally:
+        pipeline.shutdown()
+
+
+def test_unknown_stage_is_a_configuration_error():
+    """Una etapa desconocida en PIPELINE_STAGES falla con un mensaje que lista las válidas"""
+    with pytest.raises(ValueError, match=r"\['lenguaje'\].*'metrics', 'filter', 'language', 'links'"):
+        build_pipeline(["metrics", "lenguaje"])
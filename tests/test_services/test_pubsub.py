@@ -0,0 +1,49 @@
+# tests/test_services/test_pubsub.py
+import asyncio
+import threading
+from datetime import datetime
+
+from src.services.pubsub import SLOW_CONSUMER, SessionHub
+
+
+def _row(index, session_id="session-hub"):
+    return {
+        "message_id": f"msg-{index}", "session_id": session_id, "content": "Hola", "sender": "user",
+        "timestamp": datetime(2023, 6, 15, 14, 30, index), "message_metadata": None
+    }
+
+
+def test_publish_from_worker_thread_reaches_subscribers():
+    """Una publicación desde un hilo del pool llega al suscriptor en el event loop; otras sesiones no serializan nada"""
+    hub = SessionHub(buffer_size=10)
+
+    async def scenario():
+        subscription = hub.subscribe("session-hub")
+        thread = threading.Thread(target=hub.publish, args=([_row(1), _row(2, "otra-sesion")],))
+        thread.start()
+        event = await asyncio.wait_for(subscription.next(), 5)
+        thread.join()
+        return event
+
+    event = asyncio.run(scenario())
+    assert event.message_id == "msg-1"
+    assert hub.counters["published"] == 1
+
+
+def test_slow_consumer_is_evicted_without_affecting_others():
+    """Un suscriptor con el buffer lleno se desaloja; los demás siguen recibiendo"""
+    hub = SessionHub(buffer_size=2)
+
+    async def scenario():
+        slow = hub.subscribe("session-hub")
+        fast = hub.subscribe("session-hub")
+        for index in range(3):
+            hub.publish([_row(index)])
+            await fast.next()
+        return slow, fast
+
+    slow, fast = asyncio.run(scenario())
+    assert slow.closed == SLOW_CONSUMER
+    assert fast.closed is None
+    assert hub.stats()["subscribers"] == 1
+    assert hub.counters["evicted"] == 1
@@ -0,0 +1,36 @@
+# tests/test_services/test_validation_service.py
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from src.services.validation_service import ValidationService
+
+
+def test_validate_batch_validates_once_with_stepwise_error_messages():
+    """La validación consolidada acepta los mensajes válidos y reporta los mismos errores que la validación por pasos"""
+    validator = ValidationService()
+    valid = {"message_id": "m-1", "session_id": "s-1", "content": "Hola", "timestamp": "2023-06-15T14:30:00Z", "sender": "user"}
+    items = [valid, dict(valid, content=""), dict(valid, sender="bot"), {"message_id": "m-4"}, "no es un objeto"]
+
+    checked = validator.validate_batch(items)
+    assert checked == validator.validate_batch(validator.parse_batch(json.dumps({"messages": items}).encode("utf-8"))) # Mismo resultado desde el cuerpo crudo
+    assert checked[0][0].message_id == "m-1" and checked[0][1] is None
+    assert [error for _, error in checked[1:]] == [
+        "El contenido del mensaje es inválido",
+        "sender: Input should be 'user' or 'system'",
+        "session_id: Field required",
+        ": Input should be a valid dictionary or instance of MessageSchema" # Mismo texto que antes para un elemento que no es un objeto
+    ]
+
+
+def test_parse_batch_rejects_oversized_batch_before_validating_items():
+    """Un lote con más de max_items elementos falla con un solo error too_long, sin validar cada mensaje"""
+    validator = ValidationService()
+    valid = {"message_id": "m-1", "session_id": "s-1", "content": "Hola", "timestamp": "2023-06-15T14:30:00Z", "sender": "user"}
+    body = json.dumps({"messages": [valid] * 3}).encode("utf-8")
+
+    assert len(validator.parse_batch(body, max_items=3)) == 3
+    with pytest.raises(ValidationError) as raised:
+        validator.parse_batch(body, max_items=2)
+    assert [(error["type"], error["loc"]) for error in raised.value.errors()] == [("too_long", ("messages",))]
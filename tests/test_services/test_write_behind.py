@@ -0,0 +1,110 @@
+# tests/test_services/test_write_behind.py
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database.database import Base, build_engine
+from src.database.models import MessageModel
+from src.services.write_behind import QueueFullError, WriteBehindQueue
+
+
+def _row(message_id):
+    return {
+        "message_id": message_id,
+        "session_id": "session-wb",
+        "content": "Mensaje en grupo",
+        "timestamp": datetime(2023, 6, 15, 14, 30),
+        "sender": "user",
+        "message_metadata": {"word_count": 3, "character_count": 16}
+    }
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path}/wb.db")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_group_commit_resolves_each_request(session_factory):
+    """Cada Future se resuelve tras el commit; los duplicados fallan con ValueError"""
+    writer = WriteBehindQueue(session_factory, max_batch=100, max_delay_ms=50).start()
+    futures = [writer.submit(_row(f"wb-{i}")) for i in range(10)] + [writer.submit(_row("wb-0"))]
+
+    for future in futures[:10]:
+        assert future.result(timeout=5)["message_id"].startswith("wb-")
+    with pytest.raises(ValueError):
+        futures[10].result(timeout=5)
+
+    writer.close()
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(MessageModel)) == 10
+
+
+def test_full_queue_applies_backpressure_and_close_drains(session_factory):
+    """Con la cola llena submit falla; close escribe lo pendiente antes de terminar"""
+    writer = WriteBehindQueue(session_factory, max_size=2) # Sin iniciar: nada se consume
+    first = writer.submit(_row("bp-1"))
+    writer.submit(_row("bp-2"))
+    with pytest.raises(QueueFullError):
+        writer.submit(_row("bp-3"))
+
+    writer.start()
+    writer.close()
+    assert first.result(timeout=0)["message_id"] == "bp-1"
+    with pytest.raises(QueueFullError):
+        writer.submit(_row("bp-4"))
+
+
+def test_cancelled_request_is_skipped_and_writer_keeps_running(session_factory):
+    """Un Future cancelado por el ack timeout no se escribe ni detiene el hilo escritor"""
+    writer = WriteBehindQueue(session_factory) # Sin iniciar: el Future se cancela antes de que el grupo lo tome
+    cancelled = writer.submit(_row("ack-1"))
+    assert cancelled.cancel()
+
+    writer.start()
+    assert writer.submit(_row("ack-2")).result(timeout=5)["message_id"] == "ack-2"
+    writer.close()
+    with session_factory() as db:
+        assert db.scalars(select(MessageModel.message_id)).all() == ["ack-2"]
+
+
+def test_ack_timeout_responds_503_with_retry_after(session_factory):
+    """Si el grupo no hace commit a tiempo la petición responde 503 con Retry-After (no 500)"""
+    from fastapi import HTTPException
+
+    from src.domain.schemas import MessageSchema
+    from src.services.message_service import MessageService
+
+    writer = WriteBehindQueue(session_factory) # Sin iniciar: el commit nunca llega
+    service = MessageService(None, writer=writer, ack_timeout=0.01)
+    message = MessageSchema(message_id="ack-3", session_id="session-wb", content="Hola", timestamp="2023-06-15T14:30:00Z", sender="user")
+
+    with pytest.raises(HTTPException) as error:
+        service.process_message(message)
+    assert error.value.status_code == 503 and error.value.headers == {"Retry-After": "1"}
+    writer.close()
+
+
+def test_ack_timeout_waits_for_a_group_already_taken(session_factory):
+    """Si el hilo escritor ya tomó el mensaje al vencer el ack timeout, se espera su commit en vez de responder 503"""
+    from src.domain.schemas import MessageSchema
+    from src.services.message_service import MessageService
+
+    def slow_session(): # El grupo ya está en curso cuando vence el ack timeout
+        time.sleep(0.2)
+        return session_factory()
+
+    writer = WriteBehindQueue(slow_session)
+    writer.start()
+    service = MessageService(None, writer=writer, ack_timeout=0.05)
+    message = MessageSchema(message_id="ack-4", session_id="session-wb", content="Hola", timestamp="2023-06-15T14:30:00Z", sender="user")
+
+    assert service.process_message(message)["message_id"] == "ack-4"
+    writer.close()
+    with session_factory() as db:
+        assert db.scalars(select(MessageModel.message_id)).all() == ["ack-4"]
@@ -0,0 +1,72 @@
+# tests/test_tools/test_bulk.py
+import io
+import json
+import uuid
+
+from sqlalchemy import text
+
+from src.database.database import engine
+from src.tools.bulk import export_messages, import_messages
+
+
+def _messages(session_id: str, count: int) -> list:
+    return [
+        {
+            "message_id": f"{session_id}-{i}",
+            "session_id": session_id,
+            "content": f"Mensaje importado {i} clave{session_id[-8:]}",
+            "timestamp": f"2023-06-15T14:30:{i:02d}Z",
+            "sender": "user" if i % 2 else "system"
+        }
+        for i in range(count)
+    ]
+
+
+def test_import_validates_skips_duplicates_and_restores_indexes(client):
+    """La importación rechaza las líneas inválidas, ignora los duplicados y deja la búsqueda, las estadísticas y los índices al día"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    messages = _messages(session_id, 5)
+    client.post("/api/messages", json=messages[0]) # Ya existe antes de importar
+    lines = [json.dumps(message) for message in messages] + [
+        "{no es json",
+        json.dumps(dict(messages[1], message_id=f"{session_id}-vacio", content="")),
+        json.dumps(messages[2]), # Repetido dentro del archivo
+        ""
+    ]
+    errors = io.StringIO()
+
+    summary = import_messages(engine, io.StringIO("\n".join(lines) + "\n"), workers=0, errors=errors)
+
+    assert {key: summary[key] for key in ("read", "inserted", "duplicates", "invalid")} == {"read": 8, "inserted": 4, "duplicates": 2, "invalid": 2}
+    assert [(error["line"], error["message_id"]) for error in map(json.loads, errors.getvalue().splitlines())] == [(6, None), (7, f"{session_id}-vacio")]
+
+    page = client.get(f"/api/messages/{session_id}").json()["data"]["messages"]
+    assert [message["message_id"] for message in page] == [message["message_id"] for message in messages]
+    assert page[3]["metadata"]["word_count"] == 4
+    results = client.get("/api/messages/search", params={"q": f"clave{session_id[-8:]}"}).json()["data"]["results"]
+    assert len(results) == 5
+    assert client.get(f"/api/sessions/{session_id}/stats").json()["data"]["message_count"] == 5
+    with engine.connect() as conn:
+        names = set(conn.scalars(text("SELECT name FROM sqlite_master WHERE tbl_name = 'messages' AND type IN ('index', 'trigger')")))
+    assert {"ix_messages_session_timestamp", "ix_messages_word_count", "messages_fts_ai"} <= names
+
+
+def test_export_round_trips_through_csv(client):
+    """Lo exportado en CSV se vuelve a importar sin cambios (en otra sesión) con el pool de procesos"""
+    session_id = f"session-{uuid.uuid4().hex}"
+    client.post("/api/messages/batch", json={"messages": _messages(session_id, 3)})
+    exported = io.StringIO()
+
+    assert export_messages(engine, exported, "csv", session_id) == 3
+
+    copy_id = f"session-{uuid.uuid4().hex}"
+    copied = exported.getvalue().replace(session_id, copy_id)
+    summary = import_messages(engine, io.StringIO(copied, newline=""), "csv", workers=2)
+    assert summary["inserted"] == 3
+
+    ndjson = io.StringIO()
+    export_messages(engine, ndjson, session_id=copy_id)
+    original = io.StringIO()
+    export_messages(engine, original, session_id=session_id)
+    strip = lambda record: dict(record, message_id=None, session_id=None, message_metadata=dict(record["message_metadata"], processed_at=None))
+    assert [strip(json.loads(line)) for line in ndjson.getvalue().splitlines()] == [strip(json.loads(line)) for line in original.getvalue().splitlines()]